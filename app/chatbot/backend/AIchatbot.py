@@ -2,95 +2,178 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from openai import OpenAI
-import json
-from prompts import get_base_system_prompt_template, get_role_specific_prompt_self, get_role_specific_prompt_relative
+import threading
+from functools import lru_cache
+from prompts import compile_interview_prompt
 from backend import data_store
+from backend.focal_cache import standardize
+from backend.llm_calls import ToolCallLedger
+from backend.model_router import chat_completion, interview_call_type
+from backend.mondo_integration import get_session
+from backend.prefetch import Prefetcher, looks_like_confirmation, opening_key
+from backend.llm_provider import make_client
+from backend.rate_scheduler import http_client
+from backend.tool_schema import check_people, record_turn, schema_stats, stage_tools
+from backend.slot_filling import count_turn, local_turn, missing, new_slots, observe_assistant, observe_user
+from backend.startup import prewarm_connections, OLS_BASE_URL
 from utils import compute_age_from_yyyymmdd, finalize_person
-from tools import get_tools
-from dotenv import load_dotenv
-
-load_dotenv()
-api_key = os.getenv("API_KEY")
-
-# 🔑 Initialize OpenAI API client
-client = OpenAI(api_key=api_key)
-
-def interview_person(messages, tools, relation_label, patient_name=None):
-    # Normalize relation_label for internal use
-    relation_label = relation_label.replace(' ', '_')
-
-    # 🚫 Step 1: Skip if person with same relation already exists
-    if any(p["relation"] == relation_label for p in data_store.people):
-        return
-
-    # 🧠 Step 2: Retrieve patient's age (for biological plausibility checks)
+from tools import assign_relations, is_complete, next_index, next_relation, tool_call_people
+
+# 🔑 OpenAI API client, created on first use (keeps `import AIchatbot` cheap)
+@lru_cache(maxsize=None)
+def get_client():
+    from dotenv import load_dotenv
+    load_dotenv()
+    pooled = http_client()
+    client = make_client(os.getenv("API_KEY"), pooled)
+    prewarm_connections([(pooled, str(client.base_url))])
+    return client
+
+# 🔮 Next relative's opening question, prepared while the user confirms the current one
+prefetcher = Prefetcher()
+
+# 🧮 Turns answered from templates (backend/slot_filling.py) vs by the model
+turn_counts = {"local": 0, "llm": 0}
+
+# 🧾 Tool calls / people already applied, so a retried turn never stores someone twice
+tool_ledger = ToolCallLedger()
+
+GRANDPARENT_SIDES = {
+    "paternal_grandfather": "father's father", "paternal_grandmother": "father's mother",
+    "maternal_grandfather": "mother's father", "maternal_grandmother": "mother's mother",
+}
+
+def stage_context(relation_label, patient_name):
+    """The conversation a relative's interview starts from (None when it cannot be built yet)."""
+    if relation_label in GRANDPARENT_SIDES:
+        return [{"role": "system", "content": f"You are now collecting information about the patient's "
+                                              f"{relation_label.replace('_', ' ')} ({GRANDPARENT_SIDES[relation_label]})."}]
+    intro = f"The patient you are speaking with is named {patient_name}. The visit is focused on '{focal_disease}'. "
+    if relation_label in ("father", "mother", "partner"):
+        return [{"role": "system", "content": intro + f"You will now collect information about the patient's {relation_label}."}]
+    if relation_label.startswith("sibling"):
+        return [{"role": "system", "content": intro + "You will now collect information about one of the patient's siblings."}]
+    if relation_label.startswith("child"):
+        self_person = next((p for p in data_store.people if p["relation"] == "self"), None)
+        partner_person = next((p for p in data_store.people if p["relation"] == "partner"), None)
+        if not self_person or not partner_person:
+            return None
+        return [{"role": "system", "content": (
+            f"The patient is {patient_name} (sex: {'male' if self_person['sex'] == '1' else 'female'}). "
+            f"The visit is focused on '{focal_disease}'. "
+            f"The patient's partner is {partner_person['first_name']} "
+            f"(sex: {'male' if partner_person['sex'] == '1' else 'female'})."
+            "You will now collect information about one of the patient's children"
+        )}]
+    return None
+
+def interview_prompt(relation_label, patient_name=None, missing_slots=None, context=True):
+    """
+    System prompt for interviewing one relative (memory, stage-scoped rules, focal disease guidance).
+    `missing_slots` None compiles the opening prompt; later turns pass the slots still missing.
+    context=False leaves out the memory facts and the pattern hint.
+    """
+    # 🧠 Retrieve patient's age (for biological plausibility checks)
     self_data = next((p for p in data_store.people if p["relation"] == "self"), None)
     patient_age = compute_age_from_yyyymmdd(self_data["birthday"]) if self_data else None
+    if not context:
+        return compile_interview_prompt(relation_label, patient_name, focal_disease, patient_age, missing_slots)
 
-    # Access the global focal_disease
-    global focal_disease # - Declare global focal_disease
-
-    # 🧾 Step 3: Construct system prompt based on who we're interviewing
-    # Replace underscores in relation_label for natural phrasing
-    relation_label_clean = relation_label.replace('_', ' ')
-    base_system_prompt_template = get_base_system_prompt_template(patient_name, relation_label_clean, focal_disease)
-    if relation_label == "self":
-        role_specific_prompt = get_role_specific_prompt_self()
-    else:
-        # Prompt for relatives (e.g., father, mother, child_1)
-        role_specific_prompt = get_role_specific_prompt_relative(patient_age, relation_label)
-
-    # 📌 Step 6: Add system message to conversation
     # 🧠 Load memory facts from CSV
     memory = data_store.seed_memory_from_csv()
 
-    # 🧾 Compose full system prompt
-    combined_prompt = (
+    # 🧾 Compose full system prompt (pattern hint imported here: it pulls in numpy)
+    from backend.inheritance_scan import focal_disease_guidance
+    return (
         memory + "\n\n" +
-        base_system_prompt_template.format(
-            relation_label_clean=relation_label_clean,
-            focal_disease=focal_disease,
-            patient_name=patient_name if patient_name else "the patient"
-        ) +
-        role_specific_prompt
+        compile_interview_prompt(relation_label, patient_name, focal_disease, patient_age, missing_slots,
+                                 focal_disease_guidance(data_store.people, focal_disease, data_store.disease_codes(focal=focal_disease)))
     )
-    # 📌 Add system message to conversation
-    messages.append({
-        "role": "system",
-        "content": combined_prompt
-    })
 
-    # 🚀 Step 7: Start conversation by sending messages to OpenAI
-    response = client.chat.completions.create(
-        model="gpt-4o-mini-2024-07-18",
+def opening_request_key(relation_label, context, patient_name):
+    """
+    Prefetch key of an opening: the relation, its stage context and its instructions. Memory facts and
+    the pattern hint are left out: they change as soon as the confirmed relative is stored, and the
+    live system prompt carries them from the first answer on.
+    """
+    instructions = interview_prompt(relation_label, patient_name, context=False)
+    return opening_key(relation_label, context + [{"role": "system", "content": instructions}])
+
+def create_opening(messages, tools, background=False):
+    """First assistant turn of an interview (also runs on the prefetch pool, as background work)."""
+    return chat_completion(
+        get_client(), "opening", session="cli", background=background,
         messages=messages,
         tools=tools,
         tool_choice="auto"
     )
+
+def prefetch_next(relation_label, patient_name):
+    """Start the opening turn of the relative expected after `relation_label` in the background."""
+    relations = {p["relation"] for p in data_store.people} | {relation_label}
+    upcoming = next_relation(relation_label, relations)
+    context = stage_context(upcoming, patient_name) if upcoming and patient_name else None
+    if context:
+        messages = context + [{"role": "system", "content": interview_prompt(upcoming, patient_name)}]
+        prefetcher.submit(opening_request_key(upcoming, context, patient_name), create_opening, messages,
+                          stage_tools(upcoming), background=True)
+
+def store_tool_calls(tool_calls, relation_label):
+    """
+    Finalize everyone in a reply's tool calls (store_patient_info and store_relatives_info), in
+    interview order: the person being interviewed, plus any other relative whose details are
+    complete. Returns True once relation_label is stored.
+    """
+    people, report = check_people(tool_call_people(tool_ledger.new_calls(tool_calls)), relation_label)
+    stored = store_people(people, relation_label)
+    record_turn(stored, report)
+    return stored
+
+def store_people(people, relation_label):
+    """store_tool_calls for person argument dicts (also used for slots filled locally); repeats are skipped."""
+    for tool_args in tool_ledger.new_people(
+            tool_args for tool_args in assign_relations(people, data_store.people, relation_label)
+            if tool_args["relation"] == relation_label or is_complete(tool_args)):
+        finalize_person(tool_args, tool_args["relation"])
+    return any(p["relation"] == relation_label for p in data_store.people)
+
+def interview_person(messages, relation_label, patient_name=None):
+    # Normalize relation_label for internal use
+    relation_label = relation_label.replace(' ', '_')
+
+    # 🚫 Step 1: Skip if person with same relation already exists (e.g. stored together with another relative)
+    if any(p["relation"] == relation_label for p in data_store.people):
+        print(f"✅ {relation_label.replace('_', ' ').title()} is already recorded, skipping.")
+        return
+
+    # 🧾 Step 2: Add the system prompt for who we're interviewing to the conversation
+    prompt_index, prompt_slots = len(messages), None
+    messages.append({
+        "role": "system",
+        "content": interview_prompt(relation_label, patient_name)
+    })
+
+    slots = new_slots(relation_label)
+    tools = stage_tools(relation_label)  # strict schema pinned to this relative (backend/tool_schema.py)
+
+    # 🚀 Step 3: Start conversation: prefetched while the previous relative was confirmed, or sent now
+    key = opening_request_key(relation_label, messages[:prompt_index], patient_name)
+    response = prefetcher.take(key) or create_opening(messages, tools)
     reply = response.choices[0].message
 
-    # 🛠️ Step 8: If GPT triggers a tool call (i.e., data is complete and structured)
+    # 🛠️ Step 4: If GPT triggers a tool call (i.e., data is complete and structured)
     if reply.tool_calls:
-        for tool_call in reply.tool_calls:
-            tool_args = json.loads(tool_call.function.arguments)
-            # if tool_args.get("relation") != relation_label:
-            #     continue
-            # finalize_person(tool_args, relation_label)
-            # return
-            # Normalize tool_args relation for comparison
-            tool_relation = tool_args.get("relation", "").replace(' ', '_')
-            if tool_relation != relation_label:
-                continue
-            finalize_person(tool_args, relation_label)
+        # Every relative in the reply is stored in one pass (several can arrive in one message)
+        if store_tool_calls(reply.tool_calls, relation_label):
             return
     else:
         # 🤖 If no tool call yet, show the first assistant message (question)
         assistant_message = reply.content.strip()
         print(f"\n👨‍⚕️ {assistant_message}")
         messages.append({"role": "assistant", "content": assistant_message})
+        observe_assistant(slots, assistant_message)
 
-    # 🔁 Step 9: Interactive loop for user to respond and GPT to ask follow-up questions
+    # 🔁 Step 5: Interactive loop for user to respond and GPT to ask follow-up questions
     while True:
         user_input = input("You: ")
         if user_input.lower() == "exit":
@@ -99,54 +182,73 @@ def interview_person(messages, tools, relation_label, patient_name=None):
         # Add user response to conversation
         messages.append({"role": "user", "content": user_input})
 
-        # Send updated messages to GPT
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini-2025-04-14",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"
-        )
+        # 📝 Prompt scoped to what was still missing when the user answered (backend/prompts.py)
+        asked = missing(slots)
+
+        # ⚡ Trivial answers (a date, "male", "alive", "yes" to a template summary) skip the model
+        local = local_turn(slots, user_input)
+        count_turn(turn_counts, local is not None)
+        if local and local["finalize"]:
+            if store_people([local["finalize"]], relation_label):
+                return
+        elif local:
+            print(f"\n👨‍⚕️ {local['reply']}")
+            messages.append({"role": "assistant", "content": local["reply"]})
+            if slots["summary_local"]:
+                prefetch_next(relation_label, patient_name)
+            continue
+        observe_user(slots, user_input)
+        if asked != prompt_slots:
+            messages[prompt_index]["content"] = interview_prompt(relation_label, patient_name, asked)
+            prompt_slots = asked
+
+        # Send updated messages to GPT (retried / rerouted in backend/llm_calls.py until the deadline)
+        try:
+            response = chat_completion(
+                get_client(), interview_call_type(slots), session="cli",
+                messages=messages,
+                tools=tools,
+                tool_choice="auto"
+            )
+        except Exception as e:
+            messages.pop()
+            print(f"\n👨‍⚕️ Sorry, I couldn't get a reply just now ({type(e).__name__}). Could you please send that again?")
+            continue
         reply = response.choices[0].message
 
         # 🛠️ Check if GPT is ready to invoke the function (tool)
         if reply.tool_calls:
-            processed_a_valid_call = False
-            for tool_call in reply.tool_calls:
-                tool_args = json.loads(tool_call.function.arguments)
-
-
-                # --- ADD THIS DEBUG BLOCK --- if needed
-                #print("="*20)
-                #print(f"DEBUG: AI attempted tool call for relation: '{tool_args.get('relation')}'")
-                #print(f"DEBUG: Current target relation is: '{relation_label.replace('_', ' ')}'")
-                #print("="*20)
-                # ✅ Make sure tool call matches the correct relation
-                # if not relation_label.replace('_', ' ').startswith(tool_args.get('relation', "")):
-                #     continue
-                # Normalize both sides to underscores for consistent comparison
-                tool_relation = tool_args.get('relation', '').replace(' ', '_')
-                if relation_label != tool_relation:
-                    continue
-
-                # Finalize and store the collected data
-                processed_a_valid_call = True
-                finalize_person(tool_args, relation_label)
+            # ✅ Store everyone in the reply; done once the current relation is among them
+            stored_before = len(data_store.people)
+            if store_tool_calls(reply.tool_calls, relation_label):
                 return
-            # If the loop finishes and we haven't processed a valid call, it means all calls were wrong.
-            if not processed_a_valid_call:
+            if len(data_store.people) > stored_before:
+                # Other relatives were stored; keep collecting the current one
+                recovery_message = (f"Thanks, I've saved those details. Now, back to your "
+                                    f"{relation_label.replace('_', ' ')} - what else can you tell me?")
+            else:
+                # No usable call, it means all calls were wrong.
                 recovery_message = "I apologize, I seem to have gotten my notes mixed up. Let's get back on track. Could you please repeat the answer?"
-                print(f"\n👨‍⚕️ {recovery_message}")
-                messages.append({"role": "assistant", "content": recovery_message})
+            print(f"\n👨‍⚕️ {recovery_message}")
+            messages.append({"role": "assistant", "content": recovery_message})
+            observe_assistant(slots, recovery_message)
         else:
             # 🤖 Continue the chat with next assistant question
             assistant_message = reply.content.strip()
             messages.append({"role": "assistant", "content": assistant_message})
             print(f"\n👨‍⚕️ {assistant_message}")
+            observe_assistant(slots, assistant_message)
+            # 🔮 While the user checks the summary, prepare the next relative's first question
+            if looks_like_confirmation(assistant_message):
+                prefetch_next(relation_label, patient_name)
 
-def interview_multiple(base_context, tools, relation_base, patient_name=None):
-    count = 1
+def interview_multiple(base_context, relation_base, patient_name=None):
     while True:
-        confirm = input(f"\n🧑‍⚕️ Do you have any {relation_base.replace('_', ' ')} to add? ").strip().lower()
+        # Number after the ones already stored (several may have been given in one message)
+        relations = {p["relation"] for p in data_store.people}
+        count = next_index(relation_base, relations)
+        other = "other " if count > 1 else ""
+        confirm = input(f"\n🧑‍⚕️ Do you have any {other}{relation_base.replace('_', ' ')} to add? ").strip().lower()
         if confirm not in ("yes", "y", "yeah", 'i do'):
             break
         label = f"{relation_base}_{count}"
@@ -155,12 +257,39 @@ def interview_multiple(base_context, tools, relation_base, patient_name=None):
         # by copying the base context.
         person_messages = base_context.copy()
 
-        interview_person(person_messages, tools, label, patient_name)
+        interview_person(person_messages, label, patient_name)
         # # If user says "I don't have..." after assistant asks about a new sibling, let them break
         # last_user_msg = messages[-1]["content"].lower()
         # if "don't have" in last_user_msg or "no more" in last_user_msg:
         #     break
-        count += 1
+
+def llm_standardize_focal_disease(raw_focal_disease_input):
+    """Short standardized medical phrase for a reason for visit (only called on a focal cache miss)."""
+    # Create a specific, isolated message list for this standardization call
+    standardization_messages = [
+        {"role": "system", "content": (
+            "You are a text standardization and summarization assistant. "
+            "Your task is to take a user's input describing a medical concern or reason for a visit "
+            "and output a concise, clear, and standardized medical phrase (2-5 words). "
+            "If the input is vague or describes symptoms, try to infer the most likely general condition. "
+            "Examples:\n"
+            "Input: 'my doctor said something about cancer like my mom had'\nOutput: 'Family history of cancer'\n"
+            "Input: 'I feel tired all the time and gained weight'\nOutput: 'Fatigue and weight gain'\n"
+            "Input: 'heart problems'\nOutput: 'Heart disease concerns'\n"
+            "Input: 'feeling sick'\nOutput: 'General illness'\n"
+            "Output only the standardized phrase, no other text or punctuation."
+        )},
+        {"role": "user", "content": raw_focal_disease_input}
+    ]
+
+    # Call OpenAI API for standardization (no tools needed here)
+    standardization_response = chat_completion(
+        get_client(), "standardization", session="cli",
+        messages=standardization_messages,
+        max_tokens=30, # Keep response very short
+        temperature=0.2 # Make it deterministic
+    )
+    return standardization_response.choices[0].message.content.strip()
 
 def main():
     global focal_disease
@@ -175,7 +304,10 @@ def main():
     "\nYou don’t need to have everything - just share what you know, and we’ll grow your family tree together. \n\n" \
     "Type 'exit' to quit or ask for a summary of your information at any time.\n\n" \
     "Let's begin!")
-    tools = get_tools()
+    # 🔥 Build the client and warm up the OpenAI / OLS connections while the user types the reason for the visit
+    threading.Thread(target=get_client, daemon=True).start()
+    prewarm_connections([(get_session(), OLS_BASE_URL)])
+
     messages = [
         {"role": "system", "content": "You are a medical assistant conducting a patient intake interview. Ask one question at a time. Extract structured data using tool calling when ready."}
     ]
@@ -194,126 +326,74 @@ def main():
         else:
             print("Please provide a reason for the visit to continue.")
 
-    # --- LLM Call to Standardize Focal Disease ---
+    # --- Standardize Focal Disease: cache, then local MONDO, then an LLM call (backend/focal_cache.py) ---
     print("\n🧑‍⚕️ Just a moment, I'm processing that reason to ensure clarity for the interview...")
-    
-    # Create a specific, isolated message list for this standardization call
-    standardization_messages = [
-        {"role": "system", "content": (
-            "You are a text standardization and summarization assistant. "
-            "Your task is to take a user's input describing a medical concern or reason for a visit "
-            "and output a concise, clear, and standardized medical phrase (2-5 words). "
-            "If the input is vague or describes symptoms, try to infer the most likely general condition. "
-            "Examples:\n"
-            "Input: 'my doctor said something about cancer like my mom had'\nOutput: 'Family history of cancer'\n"
-            "Input: 'I feel tired all the time and gained weight'\nOutput: 'Fatigue and weight gain'\n"
-            "Input: 'heart problems'\nOutput: 'Heart disease concerns'\n"
-            "Input: 'feeling sick'\nOutput: 'General illness'\n"
-            "Output only the standardized phrase, no other text or punctuation."
-        )},
-        {"role": "user", "content": raw_focal_disease_input}
-    ]
+    standardized = standardize(raw_focal_disease_input, llm_standardize_focal_disease)
+    focal_disease = standardized["label"]
+    data_store.focal_mondo_code = standardized["mondo_code"]
+    print(f"🧑‍⚕️ Okay, for the interview, we'll focus on: '{focal_disease}'.")
 
-    try:
-        # Call OpenAI API for standardization (no tools needed here)
-        standardization_response = client.chat.completions.create(
-            model="gpt-4.1-mini-2025-04-14", # Use a capable model
-            messages=standardization_messages,
-            max_tokens=30, # Keep response very short
-            temperature=0.2 # Make it deterministic
-        )
-        standardized_focal_disease = standardization_response.choices[0].message.content.strip()
-        
-        # Validate standardization: if LLM generates something nonsensical or too long, revert to raw
-        if not standardized_focal_disease or len(standardized_focal_disease.split()) > 20:
-            print("⚠️ Standardization failed or was too vague. Using original input.")
-            focal_disease = raw_focal_disease_input
-        else:
-            focal_disease = standardized_focal_disease
-        
-        print(f"🧑‍⚕️ Okay, for the interview, we'll focus on: '{focal_disease}'.")
-
-    except Exception as e:
-        print(f"❌ Error during focal disease standardization: {e}. Using original input.")
-        focal_disease = raw_focal_disease_input # Fallback to original input if LLM call fails
+    data_store.focal_disease = focal_disease
 
     # Add the standardized focal disease to the main conversation history
     # This helps the main LLM (in interview_person) to remember it.
     messages.append({"role": "user", "content": f"The reason for this visit is: {focal_disease}"})
     messages.append({"role": "assistant", "content": f"Okay, I understand the visit is about: '{focal_disease}'. Now, let's begin the family history interview."})
 
-    interview_person(messages, tools, "self")
+    interview_person(messages, "self")
 
     self_person = next((p for p in data_store.people if p["relation"] == "self"), None)
     # Use the extracted name, with "you" as a fallback
     patient_name = self_person['first_name'] 
 
 
-    father_context = [
-        {"role": "system", "content": f"The patient you are speaking with is named {patient_name}. The visit is focused on '{focal_disease}'. You will now collect information about the patient's father."}
-    ]
+    father_context = stage_context("father", patient_name)
     print("\n--- Now gathering information about the Father. ---")
-    interview_person(father_context, tools, "father", patient_name)
+    interview_person(father_context, "father", patient_name)
 
-    mother_context = [
-        {"role": "system", "content": f"The patient you are speaking with is named {patient_name}. The visit is focused on '{focal_disease}'. You will now collect information about the patient's mother."}
-    ]
+    mother_context = stage_context("mother", patient_name)
     print("\n--- Now gathering information about the Mother. ---")
-    interview_person(mother_context, tools, "mother", patient_name)
+    interview_person(mother_context, "mother", patient_name)
 
-    sibling_base_context = [
-        {"role": "system", "content": f"The patient you are speaking with is named {patient_name}. The visit is focused on '{focal_disease}'. You will now collect information about one of the patient's siblings."}
-    ]
-    interview_multiple(sibling_base_context, tools, "sibling", patient_name)
+    sibling_base_context = stage_context("sibling", patient_name)
+    interview_multiple(sibling_base_context, "sibling", patient_name)
 
 
-    confirm = input("\n🧑‍⚕️ Do you have a partner? ").strip().lower()
+    # Skip the question when the partner was already given along with another relative
+    has_partner = any(p["relation"] == "partner" for p in data_store.people)
+    confirm = "no" if has_partner else input("\n🧑‍⚕️ Do you have a partner? ").strip().lower()
     if confirm in ("yes", "y", "yeah"):
         has_partner = True
-        partner_context = [
-            {"role": "system", "content": f"The patient you are speaking with is named {patient_name}. The visit is focused on '{focal_disease}'. You will now collect information about the patient's partner."}
-        ]
+        partner_context = stage_context("partner", patient_name)
         print("\n--- Now gathering information about the Partner. ---")
-        interview_person(partner_context, tools, "partner", patient_name)
+        interview_person(partner_context, "partner", patient_name)
 
-    if has_partner:
-        partner_person = next((p for p in data_store.people if p["relation"] == "partner"), None)
-        child_base_context_prompt = (
-        f"The patient is {patient_name} (sex: {'male' if self_person['sex'] == '1' else 'female'}). "
-        f"The visit is focused on '{focal_disease}'. "
-        f"The patient's partner is {partner_person['first_name']} "
-        f"(sex: {'male' if partner_person['sex'] == '1' else 'female'})."
-        "You will now collect information about one of the patient's children"
-        )
-        child_base_context = [{"role": "system", "content": child_base_context_prompt}]
-        interview_multiple(child_base_context, tools, "child", patient_name)
+    child_base_context = stage_context("child", patient_name) if has_partner else None
+    if child_base_context:
+        interview_multiple(child_base_context, "child", patient_name)
 
     # --- Now gathering information about Paternal Grandparents ---
-    paternal_grandfather_context = [
-        {"role": "system", "content": f"You are now collecting information about the patient's paternal grandfather (father's father)."}
-    ]
+    paternal_grandfather_context = stage_context("paternal_grandfather", patient_name)
     print("\n--- Now gathering information about the Paternal Grandfather. ---")
-    interview_person(paternal_grandfather_context, tools, "paternal_grandfather", patient_name)
+    interview_person(paternal_grandfather_context, "paternal_grandfather", patient_name)
 
-    paternal_grandmother_context = [
-        {"role": "system", "content": f"You are now collecting information about the patient's paternal grandmother (father's mother)."}
-    ]
+    paternal_grandmother_context = stage_context("paternal_grandmother", patient_name)
     print("\n--- Now gathering information about the Paternal Grandmother. ---")
-    interview_person(paternal_grandmother_context, tools, "paternal_grandmother", patient_name)
+    interview_person(paternal_grandmother_context, "paternal_grandmother", patient_name)
 
     # --- Now gathering information about Maternal Grandparents ---
-    maternal_grandfather_context = [
-        {"role": "system", "content": f"You are now collecting information about the patient's maternal grandfather (mother's father)."}
-    ]
+    maternal_grandfather_context = stage_context("maternal_grandfather", patient_name)
     print("\n--- Now gathering information about the Maternal Grandfather. ---")
-    interview_person(maternal_grandfather_context, tools, "maternal_grandfather", patient_name)
+    interview_person(maternal_grandfather_context, "maternal_grandfather", patient_name)
 
-    maternal_grandmother_context = [
-        {"role": "system", "content": f"You are now collecting information about the patient's maternal grandmother (mother's mother)."}
-    ]
+    maternal_grandmother_context = stage_context("maternal_grandmother", patient_name)
     print("\n--- Now gathering information about the Maternal Grandmother. ---")
-    interview_person(maternal_grandmother_context, tools, "maternal_grandmother", patient_name)
+    interview_person(maternal_grandmother_context, "maternal_grandmother", patient_name)
 
+    total_turns = turn_counts["local"] + turn_counts["llm"]
+    print(f"\n⚡ {turn_counts['local']} of {total_turns} answers were handled without a model call.")
+    print(f"🧩 Tool calls: {schema_stats['valid']} valid, {schema_stats['recovered']} repaired, "
+          f"{schema_stats['wasted']} unusable.")
     print("\n👋 Interview complete for patient and family. Goodbye!")
 
 if __name__ == "__main__":
@@ -2,6 +2,9 @@ import csv
 import os
 from datetime import datetime
 
+from backend.mondo_xref import code_map_csv
+from backend.pedigree_svg import render_pedigree_svg
+
 # Global list to hold all people (patient + family)
 people = []
 
@@ -12,6 +15,20 @@ person_id_counter = 1
 disease_columns = {}
 # Maps disease labels to formatted column names
 disease_column_names = {}
+# Maps disease labels to their OMIM / ICD-10 / Orphanet codes (backend/mondo_xref.py)
+disease_xrefs = {}
+
+# Standardized reason for the visit (highlighted in the pedigree) and its MONDO code
+focal_disease = None
+focal_mondo_code = None
+
+def disease_codes(columns=None, focal=None, focal_code=None):
+    """Disease label -> MONDO code for every recorded disease plus the focal disease (defaults: this module's state)."""
+    codes = dict(disease_columns if columns is None else columns)
+    focal = focal_disease if focal is None else focal
+    if focal and focal not in codes:
+        codes[focal] = focal_mondo_code if focal_code is None else focal_code
+    return codes
 
 # 📏 Save all people to CSV (overwrite)
 def save_all_to_csv():
@@ -37,6 +54,16 @@ def save_all_to_csv():
                     row[col_name] = "NA"
             writer.writerow(row)
 
+    # Code map for downstream systems that need OMIM / ICD-10 / Orphanet rather than MONDO
+    with open("../results/disease_codes.csv", "w", newline="") as f:
+        f.write(code_map_csv(disease_columns, disease_xrefs))
+
+# 🌳 Save the pedigree as SVG (rendered by the browser / any image viewer)
+def save_pedigree_svg():
+    os.makedirs("../results", exist_ok=True)
+    with open("../results/fam_pedigree.svg", "w") as f:
+        f.write(render_pedigree_svg(people, focal_disease, disease_codes()))
+
 def seed_memory_from_csv():
     try:
         with open("../results/patients.csv", "r") as f:
@@ -0,0 +1,69 @@
+"""
+Generations and adjacency of the family graph.
+
+Shared by the pedigree renderer (backend/pedigree_svg.py) and the numeric engines
+(backend/inheritance_scan.py): plain dicts and a breadth-first walk, no NumPy, so
+importing it stays cheap at startup.
+"""
+from collections import deque
+
+
+def family_links(people):
+    """Return {id: person} plus parent, child and partner adjacency restricted to known ids."""
+    by_id = {p["id"]: p for p in people}
+    parents = {pid: [] for pid in by_id}
+    children = {pid: [] for pid in by_id}
+    partners = {pid: set() for pid in by_id}
+
+    for p in people:
+        pid = p["id"]
+        for key in ("dad_id", "mom_id"):
+            parent_id = p.get(key)
+            if parent_id and parent_id in by_id:
+                parents[pid].append(parent_id)
+                children[parent_id].append(pid)
+        partner_id = p.get("partner_id")
+        if partner_id and partner_id in by_id and partner_id != pid:
+            partners[pid].add(partner_id)
+            partners[partner_id].add(pid)
+
+    # Parents of a shared child are drawn as a couple even without partner_id
+    for pid, parent_ids in parents.items():
+        if len(parent_ids) == 2:
+            dad, mom = parent_ids
+            partners[dad].add(mom)
+            partners[mom].add(dad)
+
+    return by_id, parents, children, partners
+
+
+def assign_generations(people):
+    """
+    Breadth-first walk over the family graph: parents are one row above,
+    children one row below, partners on the same row. Rows start at 0.
+    """
+    by_id, parents, children, partners = family_links(people)
+    generation = {}
+
+    for person in people:
+        start = person["id"]
+        if start in generation:
+            continue
+        component = [start]
+        generation[start] = 0
+        queue = deque([start])
+        while queue:
+            pid = queue.popleft()
+            g = generation[pid]
+            for other, offset in ([(x, -1) for x in parents[pid]] +
+                                  [(x, 1) for x in children[pid]] +
+                                  [(x, 0) for x in partners[pid]]):
+                if other not in generation:
+                    generation[other] = g + offset
+                    component.append(other)
+                    queue.append(other)
+        lowest = min(generation[pid] for pid in component)
+        for pid in component:
+            generation[pid] -= lowest
+
+    return generation
@@ -0,0 +1,289 @@
+"""
+Family CSV import: typed, vectorized parsing with a validation report.
+
+Reads the app's own export format (base columns, one "label (MONDO_code)" 0/1
+column per condition, optional interview-state columns) and multi-family files
+with a leading family_id column. Columns are converted in one pass each
+(pd.to_numeric / isin) instead of per cell, conditions come from a single
+persons x diseases boolean matrix, and large files are streamed in chunks that
+are re-cut at family boundaries, so each block is parsed in one go.
+
+    result = import_family_csv(data)          # bytes, path or file object
+    result["families"]        {family_id: [person dicts]}
+    result["disease_columns"] {label: MONDO code or "N/A"}
+    result["session"]         interview state saved with the export (first row)
+    result["report"]          validation counts and sample problems, including the
+                              whole-pedigree checks of backend/pedigree_checks.py
+    result["hash"]            sha256 of the content (process each upload once)
+"""
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from backend.referral_rules import BASE_COLUMNS
+from backend.retro_code import split_column
+
+SESSION_COLUMNS = ["interview_stage", "interview_index", "focal_disease", "mondo_code"]
+FAMILY_COLUMN = "family_id"
+INT_COLUMNS = ["id", "birthday", "is_dead", "dad_id", "mom_id", "partner_id"]
+TEXT_COLUMNS = ["relation", "first_name", "last_name", "sex"]
+REQUIRED_COLUMNS = ["id", "relation"]
+TRUE_VALUES = ["1", "1.0", "true", "True", "TRUE", "yes", "Yes"]
+SEX_VALUES = ["1", "2"]
+CHUNK_ROWS = 50_000
+MAX_EXAMPLES = 10
+
+
+def content_hash(data):
+    """sha256 hex digest of an upload's bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def disease_specs(columns):
+    """[(column, label, code)] for the condition columns of a header; uncoded ones get 'N/A'."""
+    specs = []
+    for column in columns:
+        if column in BASE_COLUMNS or column in SESSION_COLUMNS or column == FAMILY_COLUMN:
+            continue
+        label, code = split_column(column)
+        specs.append((column, label or column, code or "N/A"))
+    return specs
+
+
+def new_report():
+    return {"rows": 0, "families": 0, "people": 0, "errors": [], "warnings": [], "counts": {}}
+
+
+def _flag(report, kind, key, count, messages):
+    """Count `count` problems of one type and keep the first few messages as examples."""
+    if count:
+        report["counts"][key] = report["counts"].get(key, 0) + int(count)
+        report[kind].extend(list(messages)[:MAX_EXAMPLES - len(report[kind])])
+
+
+# ================ PARSING ================
+def family_ids(frame):
+    """Family id of every row ("1" for single-family files)."""
+    if FAMILY_COLUMN in frame:
+        return frame[FAMILY_COLUMN].to_numpy()
+    return np.full(len(frame), "1", dtype=object)
+
+
+def parse_frame(frame, specs, report):
+    """Person dicts for a block of whole families (all columns read as strings), in row order."""
+    rows = len(frame)
+    if rows == 0:
+        return []
+    families = family_ids(frame)
+    multi = FAMILY_COLUMN in frame
+    line = frame.index.to_numpy() + 2  # 1-based, after the header
+
+    def where(i):
+        return f"family {families[i]}, line {line[i]}" if multi else f"line {line[i]}"
+
+    blank = pd.Series([""] * rows, index=frame.index)
+    ints = {}
+    for column in INT_COLUMNS:
+        raw = frame[column] if column in frame else blank
+        if pd.api.types.is_numeric_dtype(raw):
+            values, bad = raw, []
+        else:
+            # Only columns the parser could not type hold invalid values
+            values = pd.to_numeric(raw, errors="coerce")
+            bad = np.flatnonzero(values.isna().to_numpy() & raw.notna().to_numpy() & (raw != "").to_numpy())
+        _flag(report, "errors", f"invalid_{column}", len(bad),
+              (f"{where(i)}: {column} '{raw.iat[i]}' is not a number" for i in bad))
+        ints[column] = values.fillna(0).astype(np.int64).to_numpy()
+
+    # Missing ids are numbered after the largest one so that rows are never dropped
+    missing_id = np.flatnonzero(ints["id"] <= 0)
+    if len(missing_id):
+        start = max(int(ints["id"].max()), 0) + 1
+        ints["id"][missing_id] = np.arange(start, start + len(missing_id))
+        _flag(report, "warnings", "missing_id", len(missing_id),
+              (f"{where(i)}: no id, numbered {ints['id'][i]}" for i in missing_id))
+    duplicated = np.flatnonzero(pd.DataFrame({"family": families, "id": ints["id"]}).duplicated().to_numpy())
+    _flag(report, "errors", "duplicate_id", len(duplicated),
+          (f"{where(i)}: id {ints['id'][i]} appears more than once" for i in duplicated))
+
+    text = {column: frame[column] if column in frame else blank for column in TEXT_COLUMNS}
+    text["relation"] = text["relation"].str.lower()
+    bad_sex = np.flatnonzero(~text["sex"].isin(SEX_VALUES).to_numpy())
+    _flag(report, "warnings", "invalid_sex", len(bad_sex),
+          (f"{where(i)}: sex '{text['sex'].iat[i]}' is not 1 or 2" for i in bad_sex))
+
+    birthday = ints["birthday"]
+    year, month, day = birthday // 10000, birthday // 100 % 100, birthday % 100
+    bad_birthday = np.flatnonzero((birthday != 0) & ((year < 1800) | (month < 1) | (month > 12) | (day < 1) | (day > 31)))
+    _flag(report, "warnings", "invalid_birthday", len(bad_birthday),
+          (f"{where(i)}: birthday {birthday[i]} is not yyyymmdd" for i in bad_birthday))
+
+    # persons x diseases presence matrix in one vectorized comparison
+    columns = [column for column, _, _ in specs]
+    labels = [label for _, label, _ in specs]
+    present = frame[columns].isin(TRUE_VALUES).to_numpy() if columns else np.zeros((rows, 0), dtype=bool)
+
+    people = [
+        {"id": i, "relation": r, "first_name": f, "last_name": l, "birthday": b, "sex": s,
+         "is_dead": d, "dad_id": dad, "mom_id": mom, "partner_id": partner, "conditions": {}}
+        for i, r, f, l, b, s, d, dad, mom, partner in zip(
+            ints["id"].tolist(), text["relation"].tolist(), text["first_name"].tolist(),
+            text["last_name"].tolist(), ints["birthday"].tolist(), text["sex"].tolist(), ints["is_dead"].tolist(),
+            ints["dad_id"].tolist(), ints["mom_id"].tolist(), ints["partner_id"].tolist())
+    ]
+    for i, j in zip(*np.nonzero(present)):
+        people[i]["conditions"][labels[j]] = True
+    return people
+
+
+def iter_chunks(source, chunk_rows=CHUNK_ROWS):
+    """
+    Stream a CSV as DataFrame chunks (bytes or path). Integer columns are typed by
+    the C parser itself (blank -> NaN); everything else is read as str. Leading
+    blanks are dropped by the reader; values are not stripped again per cell.
+    """
+    def open_source():
+        return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+    header = [str(c) for c in pd.read_csv(open_source(), nrows=0, skipinitialspace=True).columns]
+    dtype = {column: str for column in header if column.strip() not in INT_COLUMNS}
+    na_values = {column: [""] for column in header if column.strip() in INT_COLUMNS}
+    reader = pd.read_csv(open_source(), dtype=dtype, na_values=na_values, keep_default_na=False,
+                         chunksize=chunk_rows, skipinitialspace=True)
+    with reader:
+        yield from reader
+
+
+def iter_blocks(chunks):
+    """
+    Re-cut a chunk stream at family boundaries, so every block holds whole families.
+    Rows of a family must be contiguous: the last family of a chunk is held back
+    until a later chunk shows it has ended. Held-back chunks are kept in a list and
+    concatenated once per block. Single-family files are one block.
+    """
+    pending, held = [], None
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        ids = family_ids(chunk)
+        others = np.flatnonzero(ids != ids[-1])
+        if len(others):
+            cut = others[-1] + 1
+            yield pd.concat(pending + [chunk.iloc[:cut]])
+            pending = [chunk.iloc[cut:]]
+        elif pending and ids[-1] != held:
+            yield pd.concat(pending)
+            pending = [chunk]
+        else:
+            pending.append(chunk)
+        held = ids[-1]
+    if pending:
+        yield pd.concat(pending)
+
+
+def session_fields(frame):
+    """Interview state stored on the export's first row ({} for plain family files)."""
+    fields = {}
+    for column in SESSION_COLUMNS:
+        if column in frame and len(frame):
+            value = str(frame[column].iat[0]).strip()
+            if value and value.lower() not in ("nan", "none", "n/a"):
+                fields[column] = value
+    if "interview_index" in fields:
+        fields["interview_index"] = int(float(fields["interview_index"])) \
+            if fields["interview_index"].replace(".", "", 1).isdigit() else 0
+    return fields
+
+
+def add_pedigree_issues(report, families):
+    """Run the whole-pedigree checks (backend/pedigree_checks.py) and fold them into the report."""
+    from backend.pedigree_checks import check_families
+
+    multi = len(families) > 1
+    for family_id, issues in check_families(families).items():
+        for issue in issues:
+            kind = "errors" if issue["severity"] == "error" else "warnings"
+            _flag(report, kind, issue["check"], 1,
+                  [f"family {family_id}: {issue['message']}" if multi else issue["message"]])
+
+
+def import_family_csv(source, chunk_rows=CHUNK_ROWS, check=True):
+    """
+    Parse and validate a (multi-)family CSV. See the module docstring for the result.
+    check=False skips the whole-pedigree consistency checks.
+    """
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, (bytes, bytearray)):
+        digest = content_hash(source)
+    else:
+        # Paths are hashed and parsed in blocks, never held in memory whole
+        sha = hashlib.sha256()
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+
+    report = new_report()
+    result = {"hash": digest, "families": {}, "disease_columns": {}, "session": {}, "report": report}
+    try:
+        chunks = iter_chunks(source, chunk_rows)
+        first = next(chunks, None)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        report["errors"].append(f"Could not read the CSV: {e}")
+        report["counts"]["unreadable"] = 1
+        return result
+    if first is None:
+        report["errors"].append("The file has no rows")
+        report["counts"]["empty"] = 1
+        return result
+
+    first.columns = [str(c).strip() for c in first.columns]
+    missing = [c for c in REQUIRED_COLUMNS if c not in first]
+    if missing:
+        report["errors"].append(f"Missing required column(s): {', '.join(missing)}")
+        report["counts"]["missing_columns"] = len(missing)
+        return result
+
+    specs = disease_specs(first.columns)
+    result["disease_columns"] = {label: code for _, label, code in specs}
+    result["session"] = session_fields(first)
+
+    def chunks_with_first():
+        yield first
+        for chunk in chunks:
+            chunk.columns = first.columns
+            yield chunk
+
+    for block in iter_blocks(chunks_with_first()):
+        people = parse_frame(block, specs, report)
+        report["rows"] += len(block)
+        ids = family_ids(block)
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]).tolist() + [len(ids)]
+        for start, end in zip(starts[:-1], starts[1:]):
+            key = str(ids[start])
+            if key in result["families"]:
+                _flag(report, "warnings", "split_family", 1, [f"family {key} is not contiguous; its rows were merged"])
+                result["families"][key].extend(people[start:end])
+            else:
+                result["families"][key] = people[start:end]
+    if check:
+        add_pedigree_issues(report, result["families"])
+    report["families"] = len(result["families"])
+    report["people"] = sum(len(p) for p in result["families"].values())
+    return result
+
+
+def format_report(report):
+    """Markdown lines summarising a validation report."""
+    lines = [f"**{report['people']}** people in **{report['families']}** famil"
+             f"{'y' if report['families'] == 1 else 'ies'} ({report['rows']} rows)"]
+    lines += [f"- ❌ {message}" for message in report["errors"]]
+    lines += [f"- ⚠️ {message}" for message in report["warnings"]]
+    shown = len(report["errors"]) + len(report["warnings"])
+    total = sum(report["counts"].values())
+    if total > shown:
+        lines.append(f"- … and {total - shown} more issue(s)")
+    return lines
@@ -0,0 +1,150 @@
+"""
+Focal-disease standardization with a persistent cache.
+
+Every session starts by turning the reason for the visit ("worried about my
+heart", "breast cancer like my mum") into a short label. The same phrases recur,
+so results are resolved through tiers, cheapest first:
+
+    1. cache    normalized input -> {label, mondo_code} in data/focal_cache.json
+    2. mondo    exact MONDO name / synonym, then local TF-IDF search
+                (backend/mondo_closure.py, backend/mondo_search.py), no network
+    3. llm      the caller's standardization call, its answer then coded locally
+                (or through OLS when the local index has not been built)
+
+Resolved inputs are cached, so a phrase costs at most one model call per install.
+
+    result = standardize(raw, llm=lambda text: ask_the_model(text))
+    result  {"label": "breast cancer", "mondo_code": "MONDO_0007254", "source": "mondo"}
+
+The cache file can be moved with FOCAL_CACHE_PATH.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+
+from backend.mondo_closure import CHATBOT_DIR, load_index, normalize_code
+
+CACHE_PATH = os.getenv("FOCAL_CACHE_PATH", os.path.join(CHATBOT_DIR, "data", "focal_cache.json"))
+MAX_ENTRIES = 5000
+ACCEPT_SCORE = 0.85  # local fuzzy match needed to skip the model (same bar as backend/retro_code.py)
+MAX_LABEL_WORDS = 20
+
+# Leading phrases that carry no disease information
+FILLER = re.compile(
+    r"^(?:(?:i am|i'm|im|we are|we're)\s+)?(?:(?:really|very|a bit|quite)\s+)?"
+    r"(?:(?:worried|concerned|anxious|curious)\s+(?:about|over)|concerns?\s+(?:about|over|of|regarding)|"
+    r"(?:my\s+)?doctor\s+(?:said|says|mentioned|recommended|referred me for)|referred\s+for|"
+    r"(?:i\s+)?(?:want|would like)\s+to\s+(?:know|check|learn)\s+about|because\s+of|checking\s+for)\s+"
+)
+
+# Wrappers around the disease in a standardized phrase ("Family history of cancer", "Heart disease concerns")
+WRAPPERS = re.compile(r"^(?:family history of|history of|risk of|possible)\s+|\s+(?:concerns?|risk|screening)$")
+
+_cache = None
+_lock = threading.Lock()
+
+
+def normalize_input(text):
+    """Cache key for a raw reason for visit: lowercased, punctuation and leading filler removed."""
+    text = re.sub(r"[^\w\s'-]", " ", str(text or "").lower())
+    text = re.sub(r"\s+", " ", text).strip()
+    return FILLER.sub("", text).strip()
+
+
+# ================ CACHE ================
+def load_cache():
+    """{normalized input: result}; read once per process."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            try:
+                with open(CACHE_PATH) as f:
+                    _cache = json.load(f)
+            except (OSError, ValueError):
+                _cache = {}
+        return _cache
+
+
+def save_cache():
+    """Write the cache atomically (temp file + replace), keeping the newest MAX_ENTRIES."""
+    with _lock:
+        entries = list((_cache or {}).items())[-MAX_ENTRIES:]
+        directory = os.path.dirname(os.path.abspath(CACHE_PATH))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(dict(entries), f, indent=1)
+            os.replace(tmp_path, CACHE_PATH)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def remember(key, result):
+    cache = load_cache()
+    with _lock:
+        cache.pop(key, None)  # re-insert as newest
+        cache[key] = {"label": result["label"], "mondo_code": result["mondo_code"]}
+    try:
+        save_cache()
+    except OSError as e:
+        print(f"⚠️ Could not save the focal disease cache: {e}")
+
+
+# ================ MONDO TIER ================
+def mondo_match(text, accept=ACCEPT_SCORE, remote=False):
+    """{"label", "mondo_code"} for a phrase via the local index (exact, then fuzzy >= accept), else None."""
+    from backend.retro_code import local_matcher, remote_matcher, resolve_label
+
+    if load_index() is None and not remote:
+        return None
+    matcher = local_matcher() if load_index() is not None else remote_matcher()
+    match = resolve_label(text, matcher) if text else None
+    if match and match["score"] >= accept and normalize_code(match["mondo_code"]):
+        return {"label": match["label"], "mondo_code": normalize_code(match["mondo_code"])}
+    return None
+
+
+def standardize(raw, llm=None, use_cache=True):
+    """
+    Standardized focal disease for a raw reason for visit: {"label", "mondo_code", "source"}.
+    llm(raw) -> short phrase is only called when neither the cache nor MONDO knows the input.
+    Without it, or when it fails or rambles, the raw text is kept (coded when possible) and
+    nothing is cached, so the next session tries again.
+    """
+    raw = str(raw or "").strip()
+    key = normalize_input(raw)
+    cache = load_cache() if use_cache else {}
+    if key in cache:
+        result = dict(cache[key], source="cache")
+        if not normalize_code(result["mondo_code"]):
+            # Uncoded when cached (e.g. OLS unreachable): the local index may exist by now
+            match = mondo_match(WRAPPERS.sub("", normalize_input(result["label"])))
+            if match:
+                result["mondo_code"] = match["mondo_code"]
+                remember(key, result)
+        return result
+
+    result = mondo_match(key)
+    if result:
+        result["source"] = "mondo"
+    else:
+        label = None
+        if llm is not None:
+            try:
+                label = (llm(raw) or "").strip().strip(".'\"")
+            except Exception as e:
+                print(f"❌ Error during focal disease standardization: {e}. Using original input.")
+            if label and len(label.split()) > MAX_LABEL_WORDS:
+                print("⚠️ Standardization failed or was too vague. Using original input.")
+                label = None
+        # Code the phrase; OLS is only asked when there is no local index
+        match = mondo_match(WRAPPERS.sub("", normalize_input(label or raw)), remote=True)
+        result = {"label": label or raw, "mondo_code": match["mondo_code"] if match else "N/A",
+                  "source": "llm" if label else "raw"}
+    if key and result["source"] != "raw":
+        remember(key, result)
+    return result
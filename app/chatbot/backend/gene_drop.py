@@ -0,0 +1,242 @@
+"""
+Monte Carlo gene dropping over the family graph.
+
+Complements backend/peeling.py for pedigrees where exact peeling is awkward
+(marriage/consanguinity loops, lots of missing data). Alleles are dropped from
+founders to descendants for many replicates at once: a (persons x replicates)
+allele array pair is filled one generation per vectorized NumPy step.
+
+    - estimate_carrier_probabilities: likelihood-weighted carrier / affection
+      probabilities given the recorded phenotypes (same models as peeling.py)
+
+The module also holds kinship_permutation_test. It gives an empirical p-value for
+how closely related the affected relatives are: the sum of pairwise kinship among
+the affected is compared with the same number of affected labels permuted over
+the phenotyped relatives. It is a label-permutation test and does not drop
+alleles. Without genotypes there is no observed allele sharing to compare a
+gene-dropping null with. It shares the batching, seeding and process-pool
+machinery below.
+
+Replicates are simulated in bounded batches and only running sums are kept, so
+memory stays flat at millions of replicates. Every batch gets its own child of
+np.random.SeedSequence(seed), which makes results identical for any number of
+worker processes (workers > 1 runs the batches in a ProcessPoolExecutor).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backend.kinship import build_parent_index, generation_levels, kinship_matrix
+from backend.peeling import AFFECTED, UNAFFECTED, UNKNOWN, make_model, model_tables, phenotypes
+
+# Upper bound on replicates x persons cells held in memory per batch
+BATCH_CELLS = 2_000_000
+
+_worker_setup = None
+
+
+def _batches(n_replicates, batch_size, seed):
+    """[(SeedSequence, size), ...] covering n_replicates."""
+    sizes = [batch_size] * (n_replicates // batch_size)
+    if n_replicates % batch_size:
+        sizes.append(n_replicates % batch_size)
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def _init_worker(setup):
+    global _worker_setup
+    _worker_setup = setup
+
+
+def _run_in_worker(task):
+    function, seed_seq, size = task
+    return function(_worker_setup, seed_seq, size)
+
+
+def _map_batches(function, setup, batches, workers):
+    """Yield function(setup, seed_seq, size) per batch, serially or in a process pool."""
+    if workers <= 1:
+        for seed_seq, size in batches:
+            yield function(setup, seed_seq, size)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(setup,)) as pool:
+        yield from pool.map(_run_in_worker, [(function, s, n) for s, n in batches])
+
+
+def _batch_size(batch_size, n_people, n_replicates):
+    if batch_size is None:
+        batch_size = BATCH_CELLS // max(n_people, 1)
+    return max(1, min(batch_size, n_replicates))
+
+
+# ================ GENE DROPPING ================
+def _drop_setup(people, disease, model, disease_codes=None):
+    """Everything a batch needs, as plain arrays (picklable for worker processes)."""
+    _, dad_idx, mom_idx = build_parent_index(people)
+    level = generation_levels(dad_idx, mom_idx)
+    _, penetrances, _ = model_tables(model)
+    is_male = np.array([p.get("sex") == "1" for p in people], dtype=bool)
+    status = phenotypes(people, disease, disease_codes)
+
+    # P(disease status | genotype) per person, and P(affected | genotype) for predictions
+    penetrance = np.where(is_male[:, None], penetrances[1], penetrances[0])
+    likelihood = np.ones_like(penetrance)
+    likelihood[status == AFFECTED] = penetrance[status == AFFECTED]
+    likelihood[status == UNAFFECTED] = 1 - penetrance[status == UNAFFECTED]
+    with np.errstate(divide="ignore"):
+        log_likelihood = np.log(likelihood)
+
+    generations = []
+    for g in range(int(level.max()) + 1 if len(level) else 0):
+        members = np.flatnonzero(level == g)
+        generations.append((members, dad_idx[members], mom_idx[members]))
+
+    return {
+        "n": len(people),
+        "x_linked": model["mode"] == "x_linked",
+        "allele_freq": model["allele_freq"],
+        "is_male": is_male,
+        "generations": generations,
+        "penetrance": penetrance,
+        "log_likelihood": log_likelihood,
+    }
+
+
+def drop_alleles(setup, rng, size):
+    """
+    Simulate genotypes as a (persons x size) array of disease-allele counts (0, 1, 2).
+    Persons are rows so each generation copies whole contiguous parent rows.
+    """
+    n, q = setup["n"], setup["allele_freq"]
+    paternal = np.zeros((n, size), dtype=np.uint8)
+    maternal = np.zeros((n, size), dtype=np.uint8)
+    for members, dads, moms in setup["generations"]:
+        male = setup["is_male"][members]
+
+        # Paternal allele: a random one of the father's (X-linked: his only X to daughters, none to sons)
+        known = dads >= 0
+        founder = members[~known]
+        paternal[founder] = rng.random((len(founder), size)) < q
+        if known.any():
+            d = dads[known]
+            if setup["x_linked"]:
+                paternal[members[known]] = maternal[d]
+            else:
+                paternal[members[known]] = np.where(rng.integers(0, 2, (len(d), size), dtype=bool),
+                                                     paternal[d], maternal[d])
+        if setup["x_linked"]:
+            paternal[members[male]] = 0
+
+        # Maternal allele: a random one of the mother's
+        known = moms >= 0
+        founder = members[~known]
+        maternal[founder] = rng.random((len(founder), size)) < q
+        if known.any():
+            m = moms[known]
+            maternal[members[known]] = np.where(rng.integers(0, 2, (len(m), size), dtype=bool),
+                                                paternal[m], maternal[m])
+    return paternal + maternal
+
+
+def _carrier_batch(setup, seed_seq, size):
+    """Weighted sums for one batch, scaled by exp(-log_max) to stay in floating-point range."""
+    genotypes = drop_alleles(setup, np.random.default_rng(seed_seq), size)
+    log_weight = np.take_along_axis(setup["log_likelihood"], genotypes, axis=1).sum(axis=0)
+    log_max = log_weight.max()
+    if not np.isfinite(log_max):
+        return -np.inf, 0.0, 0.0, np.zeros(setup["n"]), np.zeros(setup["n"])
+    weight = np.exp(log_weight - log_max)
+    return (log_max, weight.sum(), (weight ** 2).sum(),
+            (genotypes > 0) @ weight, np.take_along_axis(setup["penetrance"], genotypes, axis=1) @ weight)
+
+
+def estimate_carrier_probabilities(people, disease, model=None, n_replicates=100_000,
+                                   seed=None, batch_size=None, workers=1, disease_codes=None):
+    """
+    Likelihood-weighted gene-dropping estimate of carrier and affection probabilities.
+    Returns {"people": [{"id", "carrier", "affected", "phenotype"}, ...],
+             "replicates": n, "effective_replicates": ess}.
+    Works on pedigrees with loops; raises ValueError when no replicate fits the phenotypes.
+    """
+    if not people:
+        return {"people": [], "replicates": 0, "effective_replicates": 0.0}
+    model = model or make_model()
+    setup = _drop_setup(people, disease, model, disease_codes)
+    size = _batch_size(batch_size, len(people), n_replicates)
+
+    # Streaming accumulation on a shared log scale
+    scale, total, total_sq = -np.inf, 0.0, 0.0
+    carrier, affected = np.zeros(len(people)), np.zeros(len(people))
+    for log_max, w, w_sq, w_carrier, w_affected in _map_batches(
+            _carrier_batch, setup, _batches(n_replicates, size, seed), workers):
+        if log_max == -np.inf:
+            continue
+        new_scale = max(scale, log_max)
+        old, part = np.exp(scale - new_scale), np.exp(log_max - new_scale)
+        total = total * old + w * part
+        total_sq = total_sq * old ** 2 + w_sq * part ** 2
+        carrier = carrier * old + w_carrier * part
+        affected = affected * old + w_affected * part
+        scale = new_scale
+
+    if total <= 0:
+        raise ValueError(f"No simulated replicate is compatible with the recorded phenotypes "
+                         f"under the {model['mode']} model")
+    status = phenotypes(people, disease, disease_codes)
+    return {
+        "people": [{
+            "id": person["id"],
+            "carrier": float(carrier[i] / total),
+            "affected": float(affected[i] / total) if status[i] == UNKNOWN else float(status[i] == AFFECTED),
+            "phenotype": int(status[i]),
+        } for i, person in enumerate(people)],
+        "replicates": n_replicates,
+        "effective_replicates": float(total ** 2 / total_sq),
+    }
+
+
+# ================ KINSHIP PERMUTATION TEST ================
+def _clustering_batch(setup, seed_seq, size):
+    """Count replicates whose random affected set is at least as related as the observed one."""
+    rng = np.random.default_rng(seed_seq)
+    m, k = setup["phi"].shape[0], setup["k"]
+    chosen = np.argpartition(rng.random((size, m)), k - 1, axis=1)[:, :k]
+    first, second = np.triu_indices(k, 1)
+    statistic = np.take(setup["phi"], chosen[:, first] * m + chosen[:, second]).sum(axis=1, dtype=np.float64)
+    return int(np.count_nonzero(statistic >= setup["observed"] - 1e-12)), float(statistic.sum())
+
+
+def kinship_permutation_test(people, disease, n_replicates=100_000, seed=None, batch_size=None, workers=1,
+                             disease_codes=None):
+    """
+    Label-permutation test for familial clustering of `disease` (no gene dropping involved).
+    Statistic: sum of kinship coefficients over pairs of affected relatives. Null: the affected
+    labels permuted at random among relatives with a known status.
+    Returns {"affected", "statistic", "expected", "p_value", "replicates"}
+    (p_value is None with fewer than two affected relatives).
+    """
+    status = phenotypes(people, disease, disease_codes) if people else np.array([], dtype=np.int64)
+    known = np.flatnonzero(status != UNKNOWN)
+    affected = np.flatnonzero(status[known] == AFFECTED)
+    k = len(affected)
+    result = {"affected": k, "statistic": 0.0, "expected": 0.0, "p_value": None, "replicates": 0}
+    if k < 2 or k == len(known):
+        return result
+
+    _, dad_idx, mom_idx = build_parent_index(people)
+    phi = kinship_matrix(dad_idx, mom_idx)[np.ix_(known, known)]
+    np.fill_diagonal(phi, 0.0)
+    observed = float(phi[np.ix_(affected, affected)].sum() / 2)
+
+    # Kinship coefficients are dyadic fractions, exact in float32 at half the memory traffic
+    setup = {"phi": phi.astype(np.float32), "k": k, "observed": observed}
+    size = _batch_size(batch_size, len(known) + k * k // 2, n_replicates)
+    exceed, total = 0, 0.0
+    for batch_exceed, batch_total in _map_batches(
+            _clustering_batch, setup, _batches(n_replicates, size, seed), workers):
+        exceed += batch_exceed
+        total += batch_total
+
+    result.update(statistic=observed, expected=total / n_replicates,
+                  p_value=(exceed + 1) / (n_replicates + 1), replicates=n_replicates)
+    return result
@@ -0,0 +1,215 @@
+"""
+Inheritance-pattern scanner for the recorded diseases.
+
+For every disease in the family's conditions, checks how affected relatives are
+connected and scores the classic Mendelian signatures:
+
+    - autosomal dominant: vertical transmission, both sexes, male-to-male transmission
+    - autosomal recessive: affected children of unaffected parents, one generation
+    - X-linked recessive: mostly males, no male-to-male transmission, skipped through women
+    - mitochondrial: passed on by affected mothers only, both sexes affected
+
+The family graph is walked once in parent-before-child order to build ancestor
+sets (and once backwards for descendant sets), stored as Python int bitsets, so
+every per-disease check is a handful of bitwise ANDs.
+"""
+from backend.family_graph import assign_generations
+from backend.kinship import build_parent_index, generation_levels
+from backend.peeling import AFFECTED, UNAFFECTED, phenotypes
+
+PATTERNS = {
+    "autosomal_dominant": "Autosomal dominant",
+    "autosomal_recessive": "Autosomal recessive",
+    "x_linked": "X-linked recessive",
+    "mitochondrial": "Mitochondrial",
+}
+
+
+def family_index(people):
+    """
+    One pass over the family graph. Returns a dict with parent indices, sexes,
+    pedigree rows, matrilines and ancestor/descendant bitsets (bit j = person j).
+    """
+    _, dad_idx, mom_idx = build_parent_index(people)
+    order = sorted(range(len(people)), key=generation_levels(dad_idx, mom_idx).__getitem__)
+    dads, moms = dad_idx.tolist(), mom_idx.tolist()
+
+    ancestors = [0] * len(people)
+    matriline = list(range(len(people)))
+    for i in order:
+        for parent in (dads[i], moms[i]):
+            if parent >= 0:
+                ancestors[i] |= ancestors[parent] | (1 << parent)
+        if moms[i] >= 0:
+            matriline[i] = matriline[moms[i]]
+
+    descendants = [0] * len(people)
+    for i in reversed(order):
+        for parent in (dads[i], moms[i]):
+            if parent >= 0:
+                descendants[parent] |= descendants[i] | (1 << i)
+
+    rows = assign_generations(people)
+    return {
+        "dad": dads,
+        "mom": moms,
+        "sex": [p.get("sex") for p in people],
+        "row": [rows[p["id"]] for p in people],
+        "matriline": matriline,
+        "ancestors": ancestors,
+        "descendants": descendants,
+    }
+
+
+def recorded_diseases(people):
+    """Every condition recorded as present for at least one person, sorted."""
+    return sorted({d for p in people if isinstance(p.get("conditions"), dict)
+                   for d, has in p["conditions"].items() if has})
+
+
+def transmission_features(people, disease, index, disease_codes=None):
+    """Counts describing how `disease` moves through the family."""
+    status = phenotypes(people, disease, disease_codes)
+    affected = [i for i, s in enumerate(status) if s == AFFECTED]
+    affected_bits = sum(1 << i for i in affected)
+    dad, mom, sex = index["dad"], index["mom"], index["sex"]
+
+    features = {
+        "affected": len(affected),
+        "affected_male": sum(sex[i] == "1" for i in affected),
+        "affected_female": sum(sex[i] == "2" for i in affected),
+        "father_to_son": 0,
+        "father_to_daughter": 0,
+        "mother_to_child": 0,
+        "unaffected_parents": 0,
+        "skipped_male": 0,
+        "skipped_female": 0,
+        "matriline_share": 0.0,
+        "generations": 0,
+        "consecutive_generations": 0,
+    }
+
+    for i in affected:
+        if dad[i] >= 0 and status[dad[i]] == AFFECTED:
+            features["father_to_son" if sex[i] == "1" else "father_to_daughter"] += 1
+        if mom[i] >= 0 and status[mom[i]] == AFFECTED:
+            features["mother_to_child"] += 1
+        if dad[i] >= 0 and mom[i] >= 0 and status[dad[i]] == UNAFFECTED and status[mom[i]] == UNAFFECTED:
+            features["unaffected_parents"] += 1
+
+    # Unaffected links between an affected ancestor and an affected descendant
+    for i, s in enumerate(status):
+        if s == UNAFFECTED and index["ancestors"][i] & affected_bits and index["descendants"][i] & affected_bits:
+            features["skipped_male" if sex[i] == "1" else "skipped_female"] += 1
+
+    if affected:
+        lines = {}
+        for i in affected:
+            lines[index["matriline"][i]] = lines.get(index["matriline"][i], 0) + 1
+        features["matriline_share"] = max(lines.values()) / len(affected)
+
+        rows = sorted({index["row"][i] for i in affected})
+        features["generations"] = len(rows)
+        run = best = 1
+        for previous, current in zip(rows, rows[1:]):
+            run = run + 1 if current == previous + 1 else 1
+            best = max(best, run)
+        features["consecutive_generations"] = best
+    return features
+
+
+def score_patterns(features):
+    """{pattern: {"score": int, "evidence": [str, ...]}} from transmission_features."""
+    f = features
+    vertical = f["father_to_son"] + f["father_to_daughter"] + f["mother_to_child"]
+    skipped = f["skipped_male"] + f["skipped_female"]
+    both_sexes = f["affected_male"] > 0 and f["affected_female"] > 0
+    scores = {name: {"score": 0, "evidence": []} for name in PATTERNS}
+
+    def note(pattern, points, text):
+        scores[pattern]["score"] += points
+        scores[pattern]["evidence"].append(f"{'+' if points > 0 else '−'} {text}")
+
+    # Autosomal dominant
+    if vertical:
+        note("autosomal_dominant", 2, f"vertical transmission ({vertical} affected parent-child pair(s))")
+    if f["consecutive_generations"] >= 3:
+        note("autosomal_dominant", 1, f"{f['consecutive_generations']} consecutive generations affected")
+    if f["father_to_son"]:
+        note("autosomal_dominant", 2, "male-to-male transmission")
+    if skipped:
+        note("autosomal_dominant", -1, "skipped generation (reduced penetrance?)")
+    if f["unaffected_parents"] and not vertical:
+        note("autosomal_dominant", -1, "affected only among children of unaffected parents")
+
+    # Autosomal recessive
+    if f["unaffected_parents"]:
+        note("autosomal_recessive", 2, f"{f['unaffected_parents']} affected with two unaffected parents")
+    if f["generations"] == 1 and f["affected"] > 1:
+        note("autosomal_recessive", 1, "affected relatives confined to one generation")
+    if both_sexes:
+        note("autosomal_recessive", 1, "both sexes affected")
+    if vertical:
+        note("autosomal_recessive", -2, "vertical transmission")
+
+    # X-linked recessive
+    if f["affected_male"] > f["affected_female"]:
+        note("x_linked", 1, f"male excess ({f['affected_male']} male vs {f['affected_female']} female)")
+    if f["affected_male"] > 1 and not f["affected_female"]:
+        note("x_linked", 1, "only males affected")
+    if f["skipped_female"] and not f["skipped_male"]:
+        note("x_linked", 2, "transmitted through unaffected women")
+    if f["father_to_son"]:
+        note("x_linked", -3, "male-to-male transmission excludes X-linkage")
+    if f["affected_female"] > f["affected_male"]:
+        note("x_linked", -1, "more affected women than men")
+
+    # Mitochondrial
+    if f["mother_to_child"] and not (f["father_to_son"] or f["father_to_daughter"]):
+        note("mitochondrial", 2, "passed on only by affected mothers")
+        if both_sexes:
+            note("mitochondrial", 1, "both sexes affected")
+    if f["affected"] > 1 and f["matriline_share"] == 1.0:
+        note("mitochondrial", 1, "all affected share one maternal line")
+    if f["father_to_son"] or f["father_to_daughter"]:
+        note("mitochondrial", -3, "transmission from an affected father")
+
+    return scores
+
+
+def scan_diseases(people, diseases=None, disease_codes=None):
+    """
+    Scan every recorded disease (or `diseases`). Returns
+    {disease: {"features", "patterns", "best"}}; "best" is None when fewer than two
+    relatives are affected or no pattern has a positive score.
+    """
+    if not people:
+        return {}
+    index = family_index(people)
+    results = {}
+    for disease in diseases if diseases is not None else recorded_diseases(people):
+        features = transmission_features(people, disease, index, disease_codes)
+        patterns = score_patterns(features)
+        best = max(patterns, key=lambda name: patterns[name]["score"])
+        if features["affected"] < 2 or patterns[best]["score"] <= 0:
+            best = None
+        results[disease] = {"features": features, "patterns": patterns, "best": best}
+    return results
+
+
+def focal_disease_guidance(people, focal_disease, disease_codes=None):
+    """Short prompt paragraph on the focal disease's pattern so far ('' when there is nothing to say)."""
+    if not people or not focal_disease:
+        return ""
+    try:
+        result = scan_diseases(people, [focal_disease], disease_codes)[focal_disease]
+    except ValueError:
+        return ""
+    if result["best"] is None:
+        return ""
+    pattern = result["patterns"][result["best"]]
+    evidence = "; ".join(e[2:] for e in pattern["evidence"] if e.startswith("+"))
+    return (f"\n**Family pattern so far for '{focal_disease}':** {result['features']['affected']} affected relatives, "
+            f"most consistent with {PATTERNS[result['best']].lower()} inheritance ({evidence}). "
+            "Keep this in mind when asking about the remaining relatives, especially those who connect "
+            "affected family members.\n")
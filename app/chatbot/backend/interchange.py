@@ -0,0 +1,413 @@
+"""
+Pedigree interchange: GEDCOM 5.5, PLINK .fam / .ped and LINKAGE (pre-makeped).
+
+Everything is a generator over lines / records, so files with hundreds of
+thousands of individuals convert with memory bounded by one family (PLINK,
+LINKAGE) or by a few integers per person (GEDCOM, whose parent links live in
+separate FAM records and need a first pass).
+
+Records are (family_id, person) pairs with the app's person fields:
+id, relation, first_name, last_name, birthday (yyyymmdd), sex ('1'/'2'/''),
+is_dead, dad_id, mom_id, partner_id, conditions.
+
+    PLINK / LINKAGE:  FID IID PID MID SEX PHENOTYPE [genotypes ignored]
+                      phenotype 2 = affected with `disease`, 1 = unaffected, 0 / -9 = unknown
+    GEDCOM:           INDI (NAME, SEX, BIRT/DATE, DEAT, FAMC, FAMS) and FAM (HUSB, WIFE, CHIL);
+                      conditions and relations travel in the custom _COND / _REL tags
+
+Convert from the command line (from app/chatbot); csv is the app's own export:
+    python3 -m backend.interchange family.ged family.fam --disease "breast cancer"
+    python3 -m backend.interchange study.ped families.csv
+"""
+import argparse
+import csv
+import io
+import os
+import re
+
+from backend.mondo_closure import is_affected
+
+FORMATS = {".ged": "gedcom", ".fam": "plink", ".ped": "plink", ".pre": "linkage", ".csv": "csv"}
+BASE_COLUMNS = ["id", "relation", "first_name", "last_name", "birthday", "sex", "is_dead",
+                "dad_id", "mom_id", "partner_id"]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+DEFAULT_DISEASE = "affected"
+
+
+def opener(source):
+    """Zero-argument callable returning a fresh text stream for a path or bytes (for multi-pass readers)."""
+    if isinstance(source, (bytes, bytearray)):
+        return lambda: io.TextIOWrapper(io.BytesIO(source), encoding="utf-8-sig", errors="replace")
+    return lambda: open(source, encoding="utf-8-sig", errors="replace")
+
+
+class IdNumbers:
+    """Stable ints for external ids: numeric ids keep their value, others get the next free number."""
+
+    def __init__(self):
+        self.numbers, self.used, self.next = {}, set(), 1
+
+    def __call__(self, name, digits=None):
+        if name not in self.numbers:
+            number = int(digits) if digits else 0
+            if not number or number in self.used:
+                while self.next in self.used:
+                    self.next += 1
+                number = self.next
+            self.numbers[name] = number
+            self.used.add(number)
+        return self.numbers[name]
+
+
+def new_person(person_id):
+    return {"id": person_id, "relation": "", "first_name": "", "last_name": "", "birthday": 0, "sex": "",
+            "is_dead": 0, "dad_id": 0, "mom_id": 0, "partner_id": 0, "conditions": {}}
+
+
+def format_of(path):
+    """Format name from a file extension (see FORMATS)."""
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+# ================ PLINK / LINKAGE ================
+def link_partners(people):
+    """Parents of a shared child become partners (the formats have no partner column)."""
+    by_id = {p["id"]: p for p in people}
+    for person in people:
+        dad, mom = by_id.get(person["dad_id"]), by_id.get(person["mom_id"])
+        if dad and mom and not dad["partner_id"] and not mom["partner_id"]:
+            dad["partner_id"], mom["partner_id"] = mom["id"], dad["id"]
+    return people
+
+
+def read_ped(stream, disease=DEFAULT_DISEASE):
+    """
+    Yield (family_id, [people]) per contiguous family of a .fam / .ped / LINKAGE file.
+    Alphanumeric individual ids are numbered per family in order of first appearance.
+    """
+    family_id, people, numbers = None, [], IdNumbers()
+
+    def number(name):
+        return 0 if name in ("0", "", ".") else numbers(name, name if name.isdigit() else None)
+
+    for line in stream:
+        fields = line.split()
+        if len(fields) < 6 or fields[0].startswith("#"):
+            continue
+        if fields[0] != family_id:
+            if people:
+                yield family_id, link_partners(people)
+            family_id, people, numbers = fields[0], [], IdNumbers()
+        person = new_person(number(fields[1]))
+        person["dad_id"], person["mom_id"] = number(fields[2]), number(fields[3])
+        person["sex"] = fields[4] if fields[4] in ("1", "2") else ""
+        if fields[5] == "2":
+            person["conditions"] = {disease: True}
+        person["first_name"] = fields[1] if not fields[1].isdigit() else ""
+        people.append(person)
+    if people:
+        yield family_id, link_partners(people)
+
+
+def ped_line(family_id, person, disease=DEFAULT_DISEASE, disease_codes=None, missing="0"):
+    """One PLINK / LINKAGE line (six columns, no genotypes)."""
+    if is_affected(person, disease, disease_codes):
+        phenotype = "2"
+    elif person.get("is_dead") in (1, "1", True) and not person.get("conditions"):
+        phenotype = missing
+    else:
+        phenotype = "1"
+    sex = str(person.get("sex") or "")
+    return " ".join([str(family_id), str(person["id"]), str(person.get("dad_id") or 0),
+                     str(person.get("mom_id") or 0), sex if sex in ("1", "2") else "0", phenotype]) + "\n"
+
+
+def write_ped(records, out, disease=DEFAULT_DISEASE, disease_codes=None, fmt="plink"):
+    """Stream (family_id, person) records to a .fam / .ped (fmt="plink") or LINKAGE file. Returns the count."""
+    missing = "-9" if fmt == "plink" else "0"
+    count = 0
+    for family_id, person in records:
+        out.write(ped_line(family_id, person, disease, disease_codes, missing))
+        count += 1
+    return count
+
+
+# ================ GEDCOM ================
+def gedcom_lines(stream):
+    """(level, tag, value) per GEDCOM line; pointers like @I1@ come back as the tag's xref."""
+    for line in stream:
+        parts = line.strip().split(" ", 2)
+        if len(parts) < 2 or not parts[0].isdigit():
+            continue
+        level = int(parts[0])
+        if parts[1].startswith("@") and len(parts) > 2:
+            # "0 @I1@ INDI" -> tag INDI, value @I1@
+            tag, value = parts[2].split(" ", 1)[0], parts[1]
+        else:
+            tag, value = parts[1], parts[2] if len(parts) > 2 else ""
+        yield level, tag, value
+
+
+def gedcom_records(stream):
+    """Group lines into level-0 records: (tag, xref, [(level, tag, value), ...])."""
+    record = None
+    for level, tag, value in gedcom_lines(stream):
+        if level == 0:
+            if record:
+                yield record
+            record = (tag, value, [])
+        elif record:
+            record[2].append((level, tag, value))
+    if record:
+        yield record
+
+
+def xref_number(xref, numbers):
+    """@I123@ -> 123 (via an IdNumbers); pointers without digits get the next free number."""
+    return numbers(xref, re.sub(r"\D", "", xref))
+
+
+def parse_gedcom_date(value):
+    """'12 MAR 1980' / 'MAR 1980' / 'ABT 1980' -> yyyymmdd (day / month default to 01); 0 if unknown."""
+    year, month, day = 0, 1, 1
+    for token in value.upper().split():
+        if token in MONTHS:
+            month = MONTHS.index(token) + 1
+        elif token.isdigit():
+            if len(token) == 4:
+                year = int(token)
+            elif int(token) <= 31:
+                day = int(token)
+    return year * 10000 + month * 100 + day if year else 0
+
+
+def format_gedcom_date(birthday):
+    """yyyymmdd -> '12 MAR 1980' ('' for unknown)."""
+    birthday = int(birthday or 0)
+    year, month, day = birthday // 10000, birthday // 100 % 100, birthday % 100
+    if year < 1000 or not 1 <= month <= 12:
+        return ""
+    return f"{day} {MONTHS[month - 1]} {year}" if day else f"{MONTHS[month - 1]} {year}"
+
+
+def read_gedcom(open_stream, disease_codes=None):
+    """
+    Yield person dicts from a GEDCOM file. open_stream() must return a fresh text
+    stream: pass 1 reads only FAM records (couples and children), pass 2 streams
+    the INDI records and attaches parents and partners. Condition codes (_COND /
+    _CODE) are collected into `disease_codes` when a dict is given.
+    """
+    numbers = IdNumbers()
+    parents, partner = {}, {}
+    with open_stream() as stream:
+        for tag, xref, lines in gedcom_records(stream):
+            if tag != "FAM":
+                continue
+            husband = wife = 0
+            children = []
+            for level, sub, value in lines:
+                if level == 1 and sub == "HUSB":
+                    husband = xref_number(value, numbers)
+                elif level == 1 and sub == "WIFE":
+                    wife = xref_number(value, numbers)
+                elif level == 1 and sub == "CHIL":
+                    children.append(xref_number(value, numbers))
+            for child in children:
+                parents.setdefault(child, (husband, wife))
+            if husband and wife:
+                partner.setdefault(husband, wife)
+                partner.setdefault(wife, husband)
+
+    with open_stream() as stream:
+        for tag, xref, lines in gedcom_records(stream):
+            if tag != "INDI":
+                continue
+            person = new_person(xref_number(xref, numbers))
+            event = condition = None
+            for level, sub, value in lines:
+                if level == 1:
+                    event = sub
+                    if sub == "NAME":
+                        given, _, rest = value.partition("/")
+                        person["first_name"] = given.strip()
+                        person["last_name"] = rest.split("/")[0].strip()
+                    elif sub == "SEX":
+                        person["sex"] = {"M": "1", "F": "2"}.get(value.strip().upper(), "")
+                    elif sub == "DEAT":
+                        person["is_dead"] = 1
+                    elif sub == "_COND" and value.strip():
+                        condition = value.strip()
+                        person["conditions"][condition] = True
+                    elif sub == "_REL":
+                        person["relation"] = value.strip().lower()
+                elif level == 2 and event == "BIRT" and sub == "DATE":
+                    person["birthday"] = parse_gedcom_date(value)
+                elif level == 2 and event == "_COND" and sub == "_CODE" and disease_codes is not None:
+                    disease_codes.setdefault(condition, value.strip())
+            person["dad_id"], person["mom_id"] = parents.get(person["id"], (0, 0))
+            person["partner_id"] = partner.get(person["id"], 0)
+            yield person
+
+
+def write_gedcom(people, out, disease_codes=None):
+    """
+    Stream people to GEDCOM 5.5. INDI records are written as they come; the FAM
+    records (one per couple) are collected as (dad, mom) -> children ids and written
+    last. Conditions go in _COND tags as 'label (code)'. Returns the count.
+    """
+    disease_codes = disease_codes or {}
+    out.write("0 HEAD\n1 SOUR ROOTS\n1 GEDC\n2 VERS 5.5\n2 FORM LINEAGE-LINKED\n1 CHAR UTF-8\n")
+    couples = {}
+    count = 0
+    for person in people:
+        pid = person["id"]
+        out.write(f"0 @I{pid}@ INDI\n1 NAME {person.get('first_name', '')} /{person.get('last_name', '')}/\n")
+        sex = {"1": "M", "2": "F"}.get(str(person.get("sex")))
+        if sex:
+            out.write(f"1 SEX {sex}\n")
+        date = format_gedcom_date(person.get("birthday"))
+        if date:
+            out.write(f"1 BIRT\n2 DATE {date}\n")
+        if person.get("is_dead") in (1, "1", True):
+            out.write("1 DEAT Y\n")
+        if person.get("relation"):
+            out.write(f"1 _REL {person['relation']}\n")
+        for label, has in (person.get("conditions") or {}).items():
+            if has:
+                out.write(f"1 _COND {label}\n")
+                code = disease_codes.get(label)
+                if code and code != "N/A":
+                    out.write(f"2 _CODE {code}\n")
+        dad, mom = int(person.get("dad_id") or 0), int(person.get("mom_id") or 0)
+        if dad or mom:
+            couples.setdefault((dad, mom), []).append(pid)
+            out.write(f"1 FAMC @F{dad}_{mom}@\n")
+        partner = int(person.get("partner_id") or 0)
+        if partner:
+            couple = (pid, partner) if sex == "M" else (partner, pid)
+            couples.setdefault(couple, [])
+            out.write(f"1 FAMS @F{couple[0]}_{couple[1]}@\n")
+        count += 1
+    for (dad, mom), children in couples.items():
+        out.write(f"0 @F{dad}_{mom}@ FAM\n")
+        if dad:
+            out.write(f"1 HUSB @I{dad}@\n")
+        if mom:
+            out.write(f"1 WIFE @I{mom}@\n")
+        for child in children:
+            out.write(f"1 CHIL @I{child}@\n")
+    out.write("0 TRLR\n")
+    return count
+
+
+# ================ APP CSV ================
+def write_csv(families, out, disease_codes=None):
+    """
+    Write {family_id: [people]} in the app's CSV layout (family_id column added for
+    more than one family). Disease columns are collected in a first pass over the families.
+    """
+    disease_codes = disease_codes or {}
+    labels = sorted({d for people in families.values() for p in people
+                     for d, has in (p.get("conditions") or {}).items() if has})
+    columns = {label: f"{label} ({disease_codes.get(label) or 'N/A'})" for label in labels}
+    multi = len(families) > 1
+    writer = csv.writer(out)
+    writer.writerow((["family_id"] if multi else []) + BASE_COLUMNS + list(columns.values()))
+    for family_id, people in families.items():
+        for p in people:
+            conditions = p.get("conditions") or {}
+            writer.writerow(([family_id] if multi else []) + [p.get(c, 0) for c in BASE_COLUMNS]
+                            + [1 if conditions.get(label) else 0 for label in labels])
+
+
+# ================ PIPELINES ================
+def read_records(source, fmt=None, disease=DEFAULT_DISEASE, disease_codes=None):
+    """
+    Yield (family_id, person) from a path or bytes in any supported format.
+    Condition codes found on the way are added to `disease_codes` when a dict is given.
+    """
+    fmt = fmt or format_of(source)
+    if fmt == "gedcom":
+        for person in read_gedcom(opener(source), disease_codes):
+            yield "1", person
+    elif fmt in ("plink", "linkage"):
+        with opener(source)() as stream:
+            for family_id, people in read_ped(stream, disease):
+                for person in people:
+                    yield family_id, person
+    elif fmt == "csv":
+        from backend.family_import import import_family_csv
+        imported = import_family_csv(source, check=False)
+        if disease_codes is not None:
+            disease_codes.update(imported["disease_columns"])
+        for family_id, people in imported["families"].items():
+            for person in people:
+                yield family_id, person
+    else:
+        raise ValueError(f"Unsupported pedigree format: {fmt}")
+
+
+def group_families(records):
+    """{family_id: [people]} from (family_id, person) records."""
+    families = {}
+    for family_id, person in records:
+        families.setdefault(str(family_id), []).append(person)
+    return families
+
+
+def import_pedigree_file(data, filename, disease=DEFAULT_DISEASE):
+    """
+    Import uploaded GEDCOM / PLINK / LINKAGE bytes into the same result shape as
+    family_import.import_family_csv (families, disease_columns, session, report, hash).
+    """
+    from backend.family_import import add_pedigree_issues, content_hash, new_report
+
+    report = new_report()
+    codes = {}
+    result = {"hash": content_hash(data), "families": {}, "disease_columns": {}, "session": {}, "report": report}
+    try:
+        result["families"] = group_families(read_records(data, format_of(filename), disease, codes))
+    except (ValueError, UnicodeDecodeError) as e:
+        report["errors"].append(f"Could not read {filename}: {e}")
+        report["counts"]["unreadable"] = 1
+        return result
+    labels = {d for people in result["families"].values() for p in people for d in p["conditions"]}
+    result["disease_columns"] = {label: codes.get(label, "N/A") for label in sorted(labels)}
+    add_pedigree_issues(report, result["families"])
+    report["rows"] = report["people"] = sum(len(p) for p in result["families"].values())
+    report["families"] = len(result["families"])
+    return result
+
+
+def convert(source, target, disease=DEFAULT_DISEASE, source_format=None, target_format=None):
+    """Convert between formats, streaming wherever the target allows. Returns the number of people written."""
+    target_format = target_format or format_of(target)
+    codes = {}
+    records = read_records(source, source_format, disease, codes)
+    with open(target, "w", newline="") as out:
+        if target_format == "gedcom":
+            return write_gedcom((person for _, person in records), out, codes)
+        if target_format in ("plink", "linkage"):
+            return write_ped(records, out, disease, codes, fmt=target_format)
+        if target_format == "csv":
+            families = group_families(records)
+            write_csv(families, out, codes)
+            return sum(len(p) for p in families.values())
+    raise ValueError(f"Unsupported pedigree format: {target_format}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pedigrees between GEDCOM, PLINK, LINKAGE and the app CSV.")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--disease", default=DEFAULT_DISEASE,
+                        help="condition label behind the PLINK / LINKAGE affection status")
+    parser.add_argument("--from", dest="source_format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--to", dest="target_format", choices=sorted(set(FORMATS.values())))
+    args = parser.parse_args()
+    count = convert(args.source, args.target, args.disease, args.source_format, args.target_format)
+    print(f"✅ {count} people -> {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Kinship and relatedness over the family graph.
+
+Builds parent-index arrays from the dad_id/mom_id links of the person dicts and
+computes the full kinship coefficient matrix with NumPy, one generation at a time:
+
+    phi[i, j] = (phi[dad(i), j] + phi[mom(i), j]) / 2      for j not a descendant of i
+    phi[i, i] = (1 + phi[dad(i), mom(i)]) / 2
+
+Unknown parents are founders (kinship 0 with everyone). Degree of relationship
+follows from the coefficient: parent/child and full siblings are 1st degree
+(phi = 1/4), grandparents, aunts/uncles and half-siblings 2nd degree (phi = 1/8), ...
+"""
+import numpy as np
+
+from backend.mondo_closure import is_affected
+
+
+def build_parent_index(people):
+    """
+    Return (ids, dad_idx, mom_idx) as arrays aligned with `people`.
+    Parent indices are -1 when the parent is unknown or not in the family.
+    """
+    ids = np.array([p["id"] for p in people], dtype=np.int64)
+    position = {pid: i for i, pid in enumerate(ids.tolist())}
+    dad_idx = np.array([position.get(p.get("dad_id") or 0, -1) for p in people], dtype=np.int64)
+    mom_idx = np.array([position.get(p.get("mom_id") or 0, -1) for p in people], dtype=np.int64)
+    return ids, dad_idx, mom_idx
+
+
+def generation_levels(dad_idx, mom_idx):
+    """
+    Depth of each person below the founders: 0 for founders, else 1 + deepest parent.
+    Raises ValueError if the parent links contain a cycle.
+    """
+    n = len(dad_idx)
+    level = np.zeros(n, dtype=np.int64)
+    has_dad = dad_idx >= 0
+    has_mom = mom_idx >= 0
+    for _ in range(n + 1):
+        new = np.zeros(n, dtype=np.int64)
+        new[has_dad] = level[dad_idx[has_dad]] + 1
+        new[has_mom] = np.maximum(new[has_mom], level[mom_idx[has_mom]] + 1)
+        if np.array_equal(new, level):
+            return level
+        level = new
+    raise ValueError("Parent links contain a cycle")
+
+
+def kinship_matrix(dad_idx, mom_idx, dtype=np.float64):
+    """
+    Kinship coefficients (n x n) for parent-index arrays from build_parent_index.
+    Coefficients are dyadic fractions, so dtype=np.float32 is exact for ordinary
+    pedigrees and halves the memory traffic on very large ones.
+    """
+    n = len(dad_idx)
+    level = generation_levels(dad_idx, mom_idx)
+
+    # Work in generation order so earlier generations are always a leading slice
+    order = np.argsort(level, kind="stable")
+    rank = np.empty(n + 1, dtype=np.int64)
+    rank[order] = np.arange(n)
+    rank[n] = n  # row/column n stands in for every unknown parent (all zeros)
+    dad = rank[np.where(dad_idx >= 0, dad_idx, n)[order]]
+    mom = rank[np.where(mom_idx >= 0, mom_idx, n)[order]]
+    bounds = np.searchsorted(level[order], np.arange(level.max() + 2))
+
+    phi = np.zeros((n + 1, n + 1), dtype=dtype)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        d, m = dad[start:end], mom[start:end]
+
+        # Against everyone in earlier generations
+        if start:
+            rows = 0.5 * (phi[d, :start] + phi[m, :start])
+            phi[start:end, :start] = rows
+            phi[:start, start:end] = rows.T
+
+        # Within this generation (parents' rows against the block are known now)
+        within = 0.5 * (phi[d, start:end] + phi[m, start:end])
+        within = 0.5 * (within + within.T)
+        within[np.diag_indices_from(within)] = 0.5 * (1.0 + phi[d, m])
+        phi[start:end, start:end] = within
+
+    # Back to the caller's order (free when people were already listed oldest generation first)
+    back = rank[:n]
+    if np.array_equal(back, np.arange(n)):
+        return phi[:n, :n]
+    return np.take(np.take(phi, back, axis=0), back, axis=1)
+
+
+def relationship_degree(phi):
+    """
+    Degree of relationship from kinship coefficients: 0 self, 1 first-degree,
+    2 second-degree, ...; -1 where unrelated (phi == 0).
+    """
+    phi = np.asarray(phi, dtype=float)
+    degree = np.full(phi.shape, -1, dtype=np.int64)
+    related = phi > 0
+    degree[related] = np.rint(-np.log2(2 * phi[related])).astype(np.int64)
+    return np.maximum(degree, -1)
+
+
+def compute_kinship(people, dtype=np.float64):
+    """Convenience wrapper: (ids, phi) for a list of person dicts."""
+    ids, dad_idx, mom_idx = build_parent_index(people)
+    return ids, kinship_matrix(dad_idx, mom_idx, dtype)
+
+
+def find_proband(people):
+    """Index of the patient (relation 'self'), or 0 when there is none."""
+    return next((i for i, p in enumerate(people) if p.get("relation") == "self"), 0)
+
+
+def affected_mask(people, disease, disease_codes=None):
+    """Boolean array: person has `disease` (or, via the MONDO closure, a subtype) recorded as present."""
+    return np.array([is_affected(p, disease, disease_codes) for p in people], dtype=bool)
+
+
+def affected_relative_counts(people, diseases=None, proband_index=None, disease_codes=None):
+    """
+    For each disease, count affected first- and second-degree relatives of the proband.
+    Returns {disease: {"first_degree": n, "second_degree": n}}.
+    """
+    if not people:
+        return {}
+    if diseases is None:
+        diseases = sorted({d for p in people if isinstance(p.get("conditions"), dict)
+                           for d, has in p["conditions"].items() if has})
+    if proband_index is None:
+        proband_index = find_proband(people)
+
+    _, phi = compute_kinship(people)
+    degree = relationship_degree(phi[proband_index])
+    degree[proband_index] = 0
+
+    counts = {}
+    for disease in diseases:
+        affected = affected_mask(people, disease, disease_codes)
+        counts[disease] = {
+            "first_degree": int(np.count_nonzero(affected & (degree == 1))),
+            "second_degree": int(np.count_nonzero(affected & (degree == 2))),
+        }
+    return counts
@@ -0,0 +1,211 @@
+"""
+Deadlines, retries and hedging for chat completions, plus tool-call idempotency.
+
+backend/model_router.py picks the model; this module makes one model's call
+dependable:
+
+    - deadline   every routed call has an overall budget; each attempt's timeout is
+                 the smaller of the route's attempt timeout and what is left of it
+    - retries    429 and 5xx / connection failures are retried on the same model with
+                 exponential backoff (full jitter, Retry-After honoured) while the
+                 deadline allows; a timeout is left to the router, which moves on to
+                 the next model; request errors (400, 401, ...) are raised at once
+    - hedging    with ROOTS_HEDGE=1, a duplicate request is sent when the first has
+                 not answered after the model's recent p95 latency, and whichever
+                 answers first is used (costs tokens, cuts the slow tail)
+
+The client's own retries are switched off so the two policies do not stack.
+Every request (hedges included) first waits for a slot from the process-wide
+rate-limit scheduler (backend/rate_scheduler.py), within the same deadline.
+
+Retried or hedged turns can repeat a tool call the app already applied, so each
+session keeps a ToolCallLedger: a tool call id is applied once, and a person
+(first name, last name, birthday) already stored is not finalized again under a
+new relation label.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend.rate_scheduler import BACKGROUND, INTERACTIVE, MAX_CONNECTIONS, estimate_tokens, scheduler
+from tools import person_identity
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5   # seconds, doubled per attempt
+BACKOFF_CAP = 8.0
+HEDGE_ENABLED = os.getenv("ROOTS_HEDGE", "0") == "1"
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+_latencies = {}
+_executor = None
+_lock = threading.Lock()
+call_stats = {"attempts": 0, "retries": 0, "timeouts": 0, "hedged": 0, "hedge_wins": 0}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's overall deadline passed before a model answered."""
+
+
+# ================ CLASSIFICATION ================
+def classify(error):
+    """'timeout', 'rate_limit', 'server' (connection / 5xx) or 'fatal' for an exception from a call."""
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, DeadlineExceeded, TimeoutError)):
+        return "timeout"
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return "server"
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return "server"
+    return "fatal"
+
+
+def backoff_delay(attempt, error=None):
+    """Seconds to wait before retry `attempt` (1-based): Retry-After when given, else full-jitter backoff."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(float(retry_after), 0.0)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+# ================ LATENCY / HEDGING ================
+def record_latency(model, seconds):
+    with _lock:
+        _latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(model):
+    """The model's recent p95 latency, or None while there are too few samples."""
+    with _lock:
+        samples = sorted(_latencies.get(model, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(HEDGE_QUANTILE * len(samples)))]
+
+
+def executor():
+    """
+    Pool for hedged requests (both copies run here so the first can be abandoned). Sized
+    to the HTTP client's connection limit, so requests queue in the rate-limit scheduler
+    (by session and priority) rather than in front of it.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_CONNECTIONS, thread_name_prefix="roots-hedge")
+        return _executor
+
+
+def call_once(client, model, timeout, kwargs, deadline=None, session=None, priority=INTERACTIVE):
+    """One attempt (after a rate-limit slot), hedged after the p95 latency when ROOTS_HEDGE=1."""
+    tokens = estimate_tokens(kwargs.get("messages"), kwargs.get("tools"), kwargs.get("max_tokens"))
+
+    def create(priority=priority):
+        ticket = scheduler().acquire(session, priority, tokens, deadline)
+        start = time.perf_counter()
+        try:
+            response = client.with_options(max_retries=0).chat.completions.create(model=model, timeout=timeout,
+                                                                                    **kwargs)
+        except Exception as e:
+            if classify(e) == "rate_limit":
+                scheduler().pause(backoff_delay(1, e))
+            raise
+        record_latency(model, time.perf_counter() - start)
+        usage = getattr(response, "usage", None)
+        scheduler().settle(ticket, getattr(usage, "total_tokens", None))
+        return response
+
+    call_stats["attempts"] += 1
+    delay = hedge_delay(model) if HEDGE_ENABLED else None
+    if delay is None or delay >= timeout:
+        return create()
+    end = deadline if deadline is not None else time.monotonic() + timeout
+    first = executor().submit(create)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    call_stats["hedged"] += 1
+    pending = {first, executor().submit(create, BACKGROUND)}
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=max(end - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded(f"{model}: no answer from the request or its hedge before the deadline")
+        for future in done:
+            if future.exception() is None:
+                call_stats["hedge_wins"] += future is not first
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def complete(client, model, kwargs, timeout, deadline, session=None, priority=INTERACTIVE):
+    """
+    client.chat.completions.create(model=model, **kwargs) with retries on 429 / 5xx until
+    `deadline` (a time.monotonic() value). Timeouts and request errors are raised to the caller.
+    `session` and `priority` place the request in the rate-limit scheduler's queues.
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{model}: deadline passed after {attempt - 1} attempts")
+        try:
+            return call_once(client, model, min(timeout, remaining), kwargs, deadline, session, priority)
+        except Exception as e:
+            kind = classify(e)
+            if kind == "timeout":
+                call_stats["timeouts"] += 1
+            if kind in ("timeout", "fatal") or attempt == MAX_ATTEMPTS:
+                raise
+            delay = backoff_delay(attempt, e)
+            if time.monotonic() + delay >= deadline:
+                raise
+            call_stats["retries"] += 1
+            print(f"⏳ {model} {kind.replace('_', ' ')} error, retrying in {delay:.1f}s ({attempt}/{MAX_ATTEMPTS - 1}).")
+            time.sleep(delay)
+
+
+# ================ IDEMPOTENCY ================
+class ToolCallLedger:
+    """Tool calls and people already applied in a session, so repeated turns are applied once."""
+
+    def __init__(self):
+        self.call_ids, self.people = set(), set()
+        self.skipped = 0
+
+    def new_calls(self, tool_calls):
+        """The tool calls not applied before (by id); marks them as applied."""
+        fresh = []
+        for tool_call in tool_calls or []:
+            if tool_call.id and tool_call.id in self.call_ids:
+                self.skipped += 1
+                continue
+            self.call_ids.add(tool_call.id)
+            fresh.append(tool_call)
+        return fresh
+
+    def new_people(self, people):
+        """The people not finalized before (by tools.person_identity); marks them as applied."""
+        fresh = []
+        for args in people:
+            key = person_identity(args)
+            if key is not None and key in self.people:
+                self.skipped += 1
+                continue
+            if key is not None:
+                self.people.add(key)
+            fresh.append(args)
+        return fresh
+
+    def forget(self, args):
+        """Allow a person to be applied again (their details were rejected and will be re-collected)."""
+        self.people.discard(person_identity(args))
@@ -0,0 +1,127 @@
+"""
+Chat-completions providers: OpenAI's hosted API or a local OpenAI-compatible server.
+
+Both entry points build their client here instead of calling OpenAI(...) directly,
+so the app can run against a local server (Ollama, llama.cpp, vLLM, LM Studio, ...)
+with its own model names, without WAN round trips and offline:
+
+    ROOTS_LLM_PROVIDER=local                                   # default: openai
+    ROOTS_LLM_BASE_URL=http://localhost:11434/v1               # default for local
+    ROOTS_LLM_FAST_MODEL=llama3.1:8b ROOTS_LLM_STRONG_MODEL=qwen2.5:14b
+    ROOTS_LLM_TOOL_MODE=json                                   # native | json
+
+The fast / strong model names feed backend/model_router.py's routes. Servers
+whose models have no native tool calling use tool mode "json": the tool schemas
+are described in a system message, the model answers with a JSON object
+({"tool": ..., "arguments": {...}}) or plain text, and the JSON is turned back
+into regular tool calls, so the rest of the app cannot tell the difference.
+"""
+import json
+import os
+import re
+import uuid
+
+PROVIDERS = {
+    "openai": {"base_url": None, "api_key": None, "fast_model": "gpt-4o-mini-2024-07-18",
+               "strong_model": "gpt-4.1-mini-2025-04-14", "tool_mode": "native"},
+    "local": {"base_url": "http://localhost:11434/v1", "api_key": "local", "fast_model": "llama3.1:8b",
+              "strong_model": "qwen2.5:14b", "tool_mode": "json"},
+}
+
+ENV_OVERRIDES = {"base_url": "ROOTS_LLM_BASE_URL", "api_key": "ROOTS_LLM_API_KEY", "fast_model": "ROOTS_LLM_FAST_MODEL",
+                 "strong_model": "ROOTS_LLM_STRONG_MODEL", "tool_mode": "ROOTS_LLM_TOOL_MODE"}
+
+TOOL_INSTRUCTIONS = (
+    "You can call the tools below. To call one, reply with ONLY a JSON object of the form "
+    '{{"tool": "<tool name>", "arguments": {{...}}}} matching its parameters, and nothing else. '
+    "When you are not calling a tool, reply in plain text without any JSON.\n\nTools:\n{tools}"
+)
+
+
+def provider_config(name=None):
+    """Settings of the named provider (default ROOTS_LLM_PROVIDER), with ROOTS_LLM_* overrides applied."""
+    name = name or os.getenv("ROOTS_LLM_PROVIDER", "openai")
+    if name not in PROVIDERS:
+        print(f"⚠️ Unknown LLM provider '{name}', using openai.")
+        name = "openai"
+    config = dict(PROVIDERS[name], name=name)
+    if name == os.getenv("ROOTS_LLM_PROVIDER", "openai"):
+        config.update({key: os.environ[env] for key, env in ENV_OVERRIDES.items() if os.getenv(env)})
+    return config
+
+
+def make_client(api_key=None, http_client=None, name=None):
+    """An OpenAI-protocol client for the provider (wrapped for JSON tool calls when tool_mode is json)."""
+    from openai import OpenAI
+
+    config = provider_config(name)
+    client = OpenAI(api_key=config["api_key"] or api_key, base_url=config["base_url"], http_client=http_client)
+    return JsonToolClient(client) if config["tool_mode"] == "json" else client
+
+
+# ================ JSON TOOL FALLBACK ================
+def tool_instructions(tools):
+    """System message describing the tools and the JSON reply format."""
+    described = "\n".join(
+        f"- {t['function']['name']}: {t['function'].get('description', '')}\n"
+        f"  parameters: {json.dumps(t['function']['parameters'], separators=(',', ':'))}"
+        for t in tools)
+    return TOOL_INSTRUCTIONS.format(tools=described)
+
+
+def extract_json(text):
+    """The first JSON object or array in a model reply (fenced or bare), or None."""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", (text or "").strip())
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"[\[{]", text):
+        try:
+            return decoder.raw_decode(text[match.start():])[0]
+        except ValueError:
+            continue
+    return None
+
+
+def parse_tool_reply(message, tools):
+    """Turn a JSON tool request in message.content into message.tool_calls (in place)."""
+    from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall, Function
+
+    names = {t["function"]["name"] for t in tools}
+    found = extract_json(message.content)
+    calls = []
+    for item in found if isinstance(found, list) else [found]:
+        if not isinstance(item, dict):
+            continue
+        name = item.get("tool") or item.get("name") or item.get("function")
+        arguments = item.get("arguments", item.get("parameters"))
+        if name in names and isinstance(arguments, dict):
+            calls.append(ChatCompletionMessageToolCall(
+                id=f"call_{uuid.uuid4().hex[:24]}", type="function",
+                function=Function(name=name, arguments=json.dumps(arguments))))
+    if calls:
+        message.tool_calls, message.content = calls, None
+    return message
+
+
+class JsonToolClient:
+    """Wraps an OpenAI-protocol client whose models lack tool calling; same create() interface."""
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = self.completions = self
+
+    @property
+    def base_url(self):
+        return self._client.base_url
+
+    def with_options(self, **options):
+        return JsonToolClient(self._client.with_options(**options))
+
+    def create(self, **kwargs):
+        tools = kwargs.pop("tools", None)
+        kwargs.pop("tool_choice", None)
+        if tools:
+            kwargs["messages"] = list(kwargs["messages"]) + [{"role": "system", "content": tool_instructions(tools)}]
+        response = self._client.chat.completions.create(**kwargs)
+        if tools and response.choices:
+            parse_tool_reply(response.choices[0].message, tools)
+        return response
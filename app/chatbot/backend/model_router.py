@@ -0,0 +1,143 @@
+"""
+Per-call-type model routing.
+
+Every chat completion names what it is for instead of hardcoding a model:
+
+    opening          first question for a relative        interactive, fastest candidate
+    clarification    follow-up turn of an interview        interactive, fastest candidate
+    extraction       turn expected to end in a tool call   strongest candidate first
+    standardization  focal-disease phrase                  fastest candidate
+
+Each call type has an ordered list of candidate models, a per-attempt timeout and
+an overall deadline (retries and backoff: backend/llm_calls.py). "fastest"
+routes pick the candidate with the lowest recent latency (exponentially weighted,
+per model, shared by every session of the process); "ordered" routes keep the
+configured order. Either way a model whose recent error rate is too high is tried
+last. When a model times out or keeps failing (connection, rate limit, 5xx) the
+next candidate is tried; other errors (a bad request) are raised as before.
+
+    response = chat_completion(client, "clarification", session=session_id,
+                               messages=messages, tools=tools, tool_choice="auto")
+
+`session` and `background=True` (speculative calls) are passed on to the
+rate-limit scheduler (backend/rate_scheduler.py).
+
+The default candidates are the configured provider's fast and strong models
+(backend/llm_provider.py). Routes can be overridden with ROOTS_MODEL_ROUTES, a JSON object such as
+{"extraction": {"models": ["gpt-4.1-mini-2025-04-14"], "timeout": 40, "deadline": 90}}.
+"""
+import json
+import os
+import threading
+import time
+
+from backend.llm_provider import provider_config
+
+FAST_MODEL = provider_config()["fast_model"]
+STRONG_MODEL = provider_config()["strong_model"]
+
+ROUTES = {
+    "opening": {"models": [FAST_MODEL, STRONG_MODEL], "policy": "fastest", "timeout": 20, "deadline": 45},
+    "clarification": {"models": [FAST_MODEL, STRONG_MODEL], "policy": "fastest", "timeout": 20, "deadline": 45},
+    "extraction": {"models": [STRONG_MODEL, FAST_MODEL], "policy": "ordered", "timeout": 30, "deadline": 60},
+    "standardization": {"models": [FAST_MODEL, STRONG_MODEL], "policy": "fastest", "timeout": 10, "deadline": 20},
+}
+
+EWMA_ALPHA = 0.3       # weight of the newest call in the latency / error averages
+MAX_ERROR_RATE = 0.5   # above this a model is only used when every other candidate is worse
+MIN_SAMPLES = 3        # calls before a model's latency is trusted over the configured order
+
+
+def load_routes():
+    """ROUTES with the ROOTS_MODEL_ROUTES overrides applied (unknown or malformed values are ignored)."""
+    routes = {name: dict(route) for name, route in ROUTES.items()}
+    try:
+        overrides = json.loads(os.getenv("ROOTS_MODEL_ROUTES", "") or "{}")
+    except ValueError:
+        print("⚠️ ROOTS_MODEL_ROUTES is not valid JSON, using the default model routes.")
+        overrides = {}
+    for name, override in overrides.items() if isinstance(overrides, dict) else ():
+        if name in routes and isinstance(override, dict):
+            routes[name].update({k: v for k, v in override.items() if k in ("models", "policy", "timeout", "deadline") and v})
+    return routes
+
+
+routes = load_routes()
+
+_stats = {}
+_lock = threading.Lock()
+
+
+# ================ METRICS ================
+def record(model, latency, error):
+    """Fold one call's latency (seconds) and outcome into the model's running averages."""
+    with _lock:
+        stats = _stats.setdefault(model, {"latency": None, "error_rate": 0.0, "calls": 0, "errors": 0})
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["error_rate"] += EWMA_ALPHA * (float(error) - stats["error_rate"])
+        if not error:
+            stats["latency"] = latency if stats["latency"] is None else (
+                stats["latency"] + EWMA_ALPHA * (latency - stats["latency"]))
+
+
+def model_stats():
+    """{model: {latency, error_rate, calls, errors}} for every model called so far."""
+    with _lock:
+        return {model: dict(stats) for model, stats in _stats.items()}
+
+
+def candidates(call_type):
+    """The models to try for a call type, best first."""
+    route = routes.get(call_type, routes["clarification"])
+    models = list(route["models"])
+    stats = model_stats()
+
+    def rank(index_model):
+        index, model = index_model
+        s = stats.get(model, {})
+        unhealthy = s.get("error_rate", 0.0) > MAX_ERROR_RATE
+        if route.get("policy") == "fastest" and s.get("calls", 0) >= MIN_SAMPLES and s.get("latency") is not None:
+            return unhealthy, s["latency"], index
+        # Untried (or ordered) models keep their configured position, after measured faster ones
+        return unhealthy, float("inf"), index
+
+    return [model for _, model in sorted(enumerate(models), key=rank)]
+
+
+# ================ CALLS ================
+def chat_completion(client, call_type, session=None, background=False, **kwargs):
+    """
+    client.chat.completions.create(**kwargs) on the routed model, falling back to the next
+    candidate on a timeout or provider failure. Raises the last error when every candidate fails
+    or the route's deadline passes.
+    """
+    from backend.llm_calls import DeadlineExceeded, classify, complete
+    from backend.rate_scheduler import BACKGROUND, INTERACTIVE
+
+    route = routes.get(call_type, routes["clarification"])
+    timeout = kwargs.pop("timeout", None) or route.get("timeout")
+    deadline = time.monotonic() + route.get("deadline", timeout)
+    error = None
+    for model in candidates(call_type):
+        if time.monotonic() >= deadline:
+            break
+        start = time.perf_counter()
+        try:
+            response = complete(client, model, kwargs, timeout, deadline, session,
+                                BACKGROUND if background else INTERACTIVE)
+        except Exception as e:
+            if classify(e) == "fatal":
+                raise
+            record(model, time.perf_counter() - start, True)
+            print(f"⚠️ {model} failed for {call_type} ({type(e).__name__}), trying the next model.")
+            error = e
+            continue
+        record(model, time.perf_counter() - start, False)
+        return response
+    raise error or DeadlineExceeded(f"{call_type}: no model answered within {route.get('deadline')}s")
+
+
+def interview_call_type(slots):
+    """'extraction' when the user is answering a summary (a tool call is expected), else 'clarification'."""
+    return "extraction" if slots and slots.get("pending") == "confirm" else "clarification"
@@ -0,0 +1,241 @@
+"""
+Precomputed MONDO is_a closure for hierarchy-aware disease matching.
+
+Built offline from mondo.obo (see backend/mondo_obo.py) and stored compactly as
+interval labels: every term gets a post-order number over a spanning tree of the
+is_a DAG, plus a short sorted list of number ranges covering all of its
+descendants (tree ranges merged with those inherited through extra parents).
+"A is a B" is then a binary search over B's (usually one or two) ranges, i.e.
+effectively O(1), instead of a string scan over labels.
+
+Build (from app/chatbot):
+    python3 -m backend.mondo_closure build                  # downloads mondo.obo
+    python3 -m backend.mondo_closure build path/to/mondo.obo
+
+The index lives in data/mondo/ (override with MONDO_INDEX_DIR). Without it every
+lookup quietly returns False / None and callers keep their substring matching.
+"""
+import os
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+INDEX_DIR = os.getenv("MONDO_INDEX_DIR", os.path.join(CHATBOT_DIR, "data", "mondo"))
+INDEX_FILE = "mondo_closure.npz"
+
+
+def normalize_code(code):
+    """'MONDO:0007254' / 'mondo_0007254' -> 'MONDO_0007254'; None for missing/'N/A'."""
+    code = str(code or "").strip().upper()
+    if not code or code in ("N/A", "NA", "NAN", "NONE"):
+        return None
+    if code.isdigit():
+        return f"MONDO_{code.zfill(7)}"
+    return code.replace(":", "_")
+
+
+# ================ BUILD ================
+def _merge(intervals):
+    """Sort and coalesce overlapping or adjacent (lo, hi) ranges."""
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1][1] = hi
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def build_closure(terms):
+    """
+    Interval-labelled closure for an iterable of term dicts (mondo_obo.iter_terms).
+    Returns plain lists: codes, names, post, ptr, lo, hi, label_keys, label_codes.
+    """
+    terms = [t for t in terms if not t["obsolete"]]
+    position = {t["id"]: i for i, t in enumerate(terms)}
+    n = len(terms)
+    children = [[] for _ in range(n)]
+    has_parent = [False] * n
+    for i, term in enumerate(terms):
+        for parent in term["is_a"]:
+            if parent in position and position[parent] != i:
+                children[position[parent]].append(i)
+                has_parent[i] = True
+
+    # Post-order numbers and subtree ranges over a spanning tree (first visit wins)
+    post = [-1] * n
+    low = [0] * n
+    visited = [False] * n
+    finished = []
+    counter = 0
+    for root in [i for i in range(n) if not has_parent[i]] + list(range(n)):
+        if visited[root]:
+            continue
+        visited[root] = True
+        stack = [(root, iter(children[root]), counter)]
+        while stack:
+            node, pending, start = stack[-1]
+            child = next(pending, None)
+            if child is None:
+                stack.pop()
+                post[node], low[node] = counter, start
+                counter += 1
+                finished.append(node)
+            elif not visited[child]:
+                visited[child] = True
+                stack.append((child, iter(children[child]), counter))
+
+    # Ranges: own tree range plus everything reachable through other parents' links.
+    # DFS finishing order on a DAG puts every child before its parents.
+    ranges = [None] * n
+    for node in finished:
+        collected = [(low[node], post[node])]
+        for child in children[node]:
+            collected.extend(ranges[child] or [])  # None only on an (invalid) is_a cycle
+        ranges[node] = [tuple(r) for r in _merge(collected)]
+
+    ptr, lo, hi = [0], [], []
+    for node in range(n):
+        lo.extend(r[0] for r in ranges[node])
+        hi.extend(r[1] for r in ranges[node])
+        ptr.append(len(lo))
+
+    # Synonyms first so that on load a term's own name wins over another term's synonym
+    label_keys, label_codes = [], []
+    for field in ("synonyms", "name"):
+        for i, term in enumerate(terms):
+            for label in term[field] if field == "synonyms" else [term[field]]:
+                if label:
+                    label_keys.append(label.lower())
+                    label_codes.append(i)
+
+    return {
+        "codes": [t["id"] for t in terms],
+        "names": [t["name"] for t in terms],
+        "post": post, "ptr": ptr, "lo": lo, "hi": hi,
+        "label_keys": label_keys, "label_codes": label_codes,
+    }
+
+
+def build_index(source=None, index_dir=None):
+    """Parse mondo.obo (path or URL), build the closure and save it as a compressed .npz."""
+    import numpy as np
+    from backend.mondo_obo import MONDO_OBO_URL, iter_terms
+
+    index_dir = index_dir or INDEX_DIR
+    os.makedirs(index_dir, exist_ok=True)
+    closure = build_closure(iter_terms(source or MONDO_OBO_URL))
+    path = os.path.join(index_dir, INDEX_FILE)
+    np.savez_compressed(
+        path,
+        codes=np.array(closure["codes"]),
+        names=np.array(closure["names"]),
+        post=np.array(closure["post"], dtype=np.int32),
+        ptr=np.array(closure["ptr"], dtype=np.int32),
+        lo=np.array(closure["lo"], dtype=np.int32),
+        hi=np.array(closure["hi"], dtype=np.int32),
+        label_keys=np.array(closure["label_keys"]),
+        label_codes=np.array(closure["label_codes"], dtype=np.int32),
+    )
+    load_index.cache_clear()
+    print(f"✅ {len(closure['codes'])} MONDO terms, {len(closure['lo'])} intervals -> {path}")
+    return path
+
+
+# ================ LOOKUPS ================
+@lru_cache(maxsize=None)
+def load_index(index_dir=None):
+    """The closure index as plain Python containers, or None when it has not been built."""
+    path = os.path.join(index_dir or INDEX_DIR, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    import numpy as np
+    with np.load(path) as data:
+        codes = data["codes"].tolist()
+        ptr = data["ptr"].tolist()
+        lo, hi = data["lo"].tolist(), data["hi"].tolist()
+        label_codes = data["label_codes"].tolist()
+        return {
+            "position": {code: i for i, code in enumerate(codes)},
+            "codes": codes,
+            "names": data["names"].tolist(),
+            "post": data["post"].tolist(),
+            # Per-term range lists, sliced once so each query is a single bisect
+            "lo": [lo[ptr[i]:ptr[i + 1]] for i in range(len(codes))],
+            "hi": [hi[ptr[i]:ptr[i + 1]] for i in range(len(codes))],
+            "labels": {key: codes[c] for key, c in zip(data["label_keys"].tolist(), label_codes)},
+        }
+
+
+def is_descendant(code, ancestor, index=None):
+    """True if `code` is `ancestor` or (transitively) is_a `ancestor`. False when either is unknown."""
+    index = index or load_index()
+    code, ancestor = normalize_code(code), normalize_code(ancestor)
+    if index is None or code is None or ancestor is None:
+        return False
+    a, b = index["position"].get(code), index["position"].get(ancestor)
+    if a is None or b is None:
+        return False
+    number = index["post"][a]
+    lows = index["lo"][b]
+    k = bisect_right(lows, number) - 1
+    return k >= 0 and index["hi"][b][k] >= number
+
+
+def code_for_label(label, index=None):
+    """MONDO code for an exact (case-insensitive) term name or exact synonym, else None."""
+    index = index or load_index()
+    if index is None or not label:
+        return None
+    return index["labels"].get(str(label).strip().lower())
+
+
+def resolve_code(label, code=None):
+    """Best known MONDO code for a disease: its recorded code, else a name/synonym lookup."""
+    return normalize_code(code) or code_for_label(label)
+
+
+def is_related(code_a, code_b, index=None):
+    """True if either code is the other or one of its subtypes."""
+    return is_descendant(code_a, code_b, index) or is_descendant(code_b, code_a, index)
+
+
+def same_or_related(condition, existing, existing_code=None, condition_code=None):
+    """
+    Should `condition` reuse the already recorded disease `existing`? True on the old
+    substring match, or when one's MONDO code is the other's code or one of its subtypes.
+    """
+    lowered, existing_lowered = condition.lower(), existing.lower()
+    if lowered in existing_lowered or existing_lowered in lowered:
+        return True
+    return is_related(resolve_code(condition, condition_code), resolve_code(existing, existing_code))
+
+
+def is_affected(person, focal_disease, disease_codes=None):
+    """
+    True if any of the person's recorded conditions matches the focal disease: by label
+    substring, or (with the MONDO closure index built) by being the focal term or a subtype.
+    disease_codes maps disease labels (including the focal disease) to MONDO codes.
+    """
+    conditions = person.get("conditions", {})
+    if not focal_disease or not isinstance(conditions, dict):
+        return False
+    disease_codes = disease_codes or {}
+    focal = focal_disease.lower()
+    focal_code = resolve_code(focal_disease, disease_codes.get(focal_disease))
+    return any(has and (focal in condition.lower() or
+                        (focal_code and is_descendant(resolve_code(condition, disease_codes.get(condition)), focal_code)))
+               for condition, has in conditions.items())
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Usage: python3 -m backend.mondo_closure build [mondo.obo path or URL]")
+        sys.exit(1)
+    build_index(sys.argv[2] if len(sys.argv) > 2 else None)
+
+
+if __name__ == "__main__":
+    main()
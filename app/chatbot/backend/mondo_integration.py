@@ -1,5 +1,16 @@
-import requests
 from backend import data_store
+from backend.mondo_closure import same_or_related
+from backend.mondo_xref import xrefs_for
+
+# Pooled HTTP session for OLS (requests is imported on first use)
+_session = None
+
+def get_session():
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+    return _session
 
 # --- MONDO API Search Utilities ---
 
@@ -29,7 +40,7 @@ def get_mondo_matches(disease_name, max_results=10):
         "ontology": "mondo"
     }
 
-    response = requests.get(url, params=params)
+    response = get_session().get(url, params=params)
     if response.status_code != 200:
         print(f"[MONDO API ERROR] Status code: {response.status_code}")
         return []
@@ -60,7 +71,7 @@ def process_medical_conditions(input_text, person_relation=""):
         # Check if this disease was already mentioned by another family member
         existing_match = None
         for existing_disease in data_store.disease_columns.keys():
-            if condition.lower() in existing_disease.lower() or existing_disease.lower() in condition.lower():
+            if same_or_related(condition, existing_disease, data_store.disease_columns[existing_disease]):
                 confirm = input(f"Is this the same condition as the {existing_disease} that another family member has? ").strip().lower()
                 if confirm in ("yes", "y", "yeah"):
                     existing_match = existing_disease
@@ -100,6 +111,7 @@ def process_medical_conditions(input_text, person_relation=""):
         if disease_label not in data_store.disease_columns:
             data_store.disease_columns[disease_label] = mondo_code
             data_store.disease_column_names[disease_label] = f"{disease_label} ({mondo_code})"
+            data_store.disease_xrefs[disease_label] = xrefs_for(mondo_code)
         
         person_diseases[disease_label] = True
     
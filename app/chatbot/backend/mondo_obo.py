@@ -0,0 +1,83 @@
+"""
+Streaming parser for the MONDO ontology in OBO format.
+
+Reads mondo.obo (plain or .gz, local path or URL) line by line and yields one
+dict per [Term] stanza, so the 50+ MB release never has to sit in memory:
+
+    {"id": "MONDO_0007254", "name": "breast cancer", "is_a": ["MONDO_0004989", ...],
+     "synonyms": ["breast carcinoma", ...], "xrefs": ["OMIMPS:114480", ...], "obsolete": False}
+
+Download: http://purl.obolibrary.org/obo/mondo.obo
+"""
+import gzip
+import io
+
+MONDO_OBO_URL = "http://purl.obolibrary.org/obo/mondo.obo"
+
+
+def to_code(curie):
+    """'MONDO:0007254' -> 'MONDO_0007254' (the form stored in the app's disease columns)."""
+    return curie.strip().replace(":", "_")
+
+
+def open_obo(source):
+    """Text stream for a local path (.obo or .obo.gz) or an http(s) URL."""
+    if source.startswith(("http://", "https://")):
+        import requests
+        response = requests.get(source, stream=True, timeout=60)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        raw = response.raw
+        if source.endswith(".gz"):
+            raw = gzip.GzipFile(fileobj=raw)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    if source.endswith(".gz"):
+        return gzip.open(source, "rt", encoding="utf-8")
+    return open(source, encoding="utf-8")
+
+
+def _quoted(value):
+    """Text between the first pair of double quotes (OBO synonym values)."""
+    start = value.find('"')
+    end = value.find('"', start + 1)
+    return value[start + 1:end] if start >= 0 and end > start else ""
+
+
+def iter_terms(source, prefix="MONDO_"):
+    """Yield term dicts for every [Term] whose id starts with `prefix` (after to_code)."""
+    stream = open_obo(source) if isinstance(source, str) else source
+    term = None
+    try:
+        for line in stream:
+            line = line.rstrip("\n")
+            if line.startswith("["):
+                if term and term["id"].startswith(prefix):
+                    yield term
+                term = {"id": "", "name": "", "is_a": [], "synonyms": [], "xrefs": [], "obsolete": False} \
+                    if line == "[Term]" else None
+                continue
+            if term is None or ": " not in line:
+                continue
+
+            tag, value = line.split(": ", 1)
+            if tag == "id":
+                term["id"] = to_code(value)
+            elif tag == "name":
+                term["name"] = value.strip()
+            elif tag == "is_a":
+                parent = to_code(value.split("!")[0].split("{")[0])
+                if parent.startswith(prefix):
+                    term["is_a"].append(parent)
+            elif tag == "synonym" and " EXACT" in value:
+                synonym = _quoted(value)
+                if synonym:
+                    term["synonyms"].append(synonym)
+            elif tag == "xref":
+                term["xrefs"].append(value.split("{")[0].split("!")[0].strip())
+            elif tag == "is_obsolete":
+                term["obsolete"] = value.strip() == "true"
+        if term and term["id"].startswith(prefix):
+            yield term
+    finally:
+        if stream is not source:
+            stream.close()
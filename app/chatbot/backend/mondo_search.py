@@ -0,0 +1,162 @@
+"""
+Local fuzzy search over MONDO term names and exact synonyms.
+
+Character n-gram TF-IDF with an inverted index held in NumPy arrays (CSR
+postings: n-gram -> label rows and weights). A query is turned into its n-gram
+weights and scored against every label with a single np.bincount over the
+matching postings, so thousands of labels resolve per second without any
+network round trips to OLS.
+
+Built from the closure index (backend/mondo_closure.py) and cached next to it:
+    python3 -m backend.mondo_search build
+"""
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+from backend.mondo_closure import INDEX_DIR, load_index
+
+SEARCH_FILE = "mondo_search.npz"
+NGRAM = 3
+
+
+def ngrams(text, n=NGRAM):
+    """Character n-grams of a padded, lower-cased, whitespace-normalized label."""
+    text = f" {' '.join(str(text).lower().split())} "
+    return [text[i:i + n] for i in range(max(len(text) - n + 1, 1))]
+
+
+def _ngram_counts(text):
+    counts = {}
+    for gram in ngrams(text):
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def build_search_index(index_dir=None):
+    """Build the TF-IDF inverted index from the closure index's labels and save it. Returns the path."""
+    closure = load_index(index_dir)
+    if closure is None:
+        raise FileNotFoundError("MONDO closure index not built (python3 -m backend.mondo_closure build)")
+
+    labels = list(closure["labels"].items())  # (label, code), name wins over synonyms
+    vocabulary = {}
+    rows, columns, counts = [], [], []
+    for row, (label, _) in enumerate(labels):
+        for gram, count in _ngram_counts(label).items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(gram, len(vocabulary)))
+            counts.append(count)
+    rows = np.array(rows, dtype=np.int32)
+    columns = np.array(columns, dtype=np.int32)
+
+    # tf-idf with smooth idf, rows L2-normalized
+    document_frequency = np.bincount(columns, minlength=len(vocabulary))
+    idf = np.log((1 + len(labels)) / (1 + document_frequency)) + 1
+    weights = np.array(counts, dtype=np.float32) * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(labels)))
+    weights /= norms[rows]
+
+    # Postings sorted by n-gram (CSR)
+    order = np.argsort(columns, kind="stable")
+    ptr = np.concatenate([[0], np.cumsum(document_frequency)]).astype(np.int64)
+
+    path = os.path.join(index_dir or INDEX_DIR, SEARCH_FILE)
+    np.savez_compressed(
+        path,
+        vocabulary=np.array(list(vocabulary)),
+        idf=idf.astype(np.float32),
+        ptr=ptr,
+        postings=rows[order],
+        weights=weights[order].astype(np.float32),
+        labels=np.array([label for label, _ in labels]),
+        codes=np.array([code for _, code in labels]),
+        names=np.array([closure["names"][closure["position"][code]] for _, code in labels]),
+    )
+    load_search_index.cache_clear()
+    print(f"✅ {len(labels)} labels, {len(vocabulary)} {NGRAM}-grams -> {path}")
+    return path
+
+
+@lru_cache(maxsize=None)
+def load_search_index(index_dir=None):
+    """The search index (built on first use when only the closure index exists), or None."""
+    path = os.path.join(index_dir or INDEX_DIR, SEARCH_FILE)
+    if not os.path.exists(path):
+        if load_index(index_dir) is None:
+            return None
+        build_search_index(index_dir)
+    with np.load(path) as data:
+        return {
+            "vocabulary": {gram: i for i, gram in enumerate(data["vocabulary"].tolist())},
+            "idf": data["idf"],
+            "ptr": data["ptr"],
+            "postings": data["postings"],
+            "weights": data["weights"],
+            "labels": data["labels"].tolist(),
+            "codes": data["codes"].tolist(),
+            "names": data["names"].tolist(),
+        }
+
+
+def label_similarity(a, b):
+    """Cosine similarity of two labels' n-gram counts (no idf; for scoring remote matches)."""
+    x, y = _ngram_counts(a), _ngram_counts(b)
+    dot = sum(count * y.get(gram, 0) for gram, count in x.items())
+    norm = np.sqrt(sum(c * c for c in x.values()) * sum(c * c for c in y.values()))
+    return float(dot / norm) if norm else 0.0
+
+
+def search(query, top_k=5, index=None):
+    """
+    Best MONDO matches for a free-text label: [{"label", "mondo_code", "matched", "score"}, ...]
+    (label is the term name, matched the name or synonym that scored), one entry per code,
+    highest cosine similarity first. [] without an index.
+    """
+    index = index or load_search_index()
+    if index is None:
+        return []
+    grams = [(index["vocabulary"][g], c) for g, c in _ngram_counts(query).items() if g in index["vocabulary"]]
+    if not grams:
+        return []
+
+    ids = np.array([g for g, _ in grams])
+    query_weights = np.array([c for _, c in grams], dtype=np.float32) * index["idf"][ids]
+    query_weights /= np.linalg.norm(query_weights)
+
+    starts, ends = index["ptr"][ids], index["ptr"][ids + 1]
+    lengths = ends - starts
+    positions = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths) + np.arange(lengths.sum())
+    scores = np.bincount(index["postings"][positions],
+                         weights=index["weights"][positions] * np.repeat(query_weights, lengths),
+                         minlength=len(index["labels"]))
+
+    candidates = np.argpartition(-scores, min(top_k * 4, len(scores) - 1))[:top_k * 4]
+    results, seen = [], set()
+    for row in candidates[np.argsort(-scores[candidates])]:
+        code = index["codes"][row]
+        if code in seen or scores[row] <= 0:
+            continue
+        seen.add(code)
+        results.append({"label": index["names"][row], "mondo_code": code,
+                        "matched": index["labels"][row], "score": float(scores[row])})
+        if len(results) == top_k:
+            break
+    return results
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "query"):
+        print("Usage: python3 -m backend.mondo_search build | query <label>")
+        sys.exit(1)
+    if sys.argv[1] == "build":
+        build_search_index()
+    else:
+        for match in search(" ".join(sys.argv[2:])):
+            print(f"{match['score']:.3f}  {match['mondo_code']}  {match['label']}")
+
+
+if __name__ == "__main__":
+    main()
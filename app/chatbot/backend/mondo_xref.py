@@ -0,0 +1,145 @@
+"""
+MONDO -> OMIM / ICD-10 / Orphanet code mapping, precomputed from mondo.obo.
+
+The xrefs of every MONDO term (parsed by backend/mondo_obo.py) are stored as
+three flat, uncompressed .npy arrays sorted by MONDO number:
+
+    xref_keys.npy     int32   MONDO number (MONDO_0007254 -> 7254)
+    xref_systems.npy  uint8   index into SYSTEMS
+    xref_values.npy   bytes   the xref as written in MONDO ('OMIM:114480', 'ICD10CM:C50')
+
+They are opened with mmap_mode="r", so loading is instant and a lookup is one
+binary search that touches a few pages, with no network call.
+
+Build (from app/chatbot), next to the closure index in data/mondo/:
+    python3 -m backend.mondo_xref build                  # downloads mondo.obo
+    python3 -m backend.mondo_xref build path/to/mondo.obo
+"""
+import csv
+import io
+import os
+import sys
+from functools import lru_cache
+
+from backend.mondo_closure import INDEX_DIR, normalize_code
+
+# System name -> xref prefixes used by MONDO
+SYSTEMS = {
+    "OMIM": ("OMIM:", "OMIMPS:"),
+    "ICD10": ("ICD10CM:", "ICD10WHO:", "ICD10EXP:"),
+    "Orphanet": ("Orphanet:",),
+}
+SYSTEM_NAMES = list(SYSTEMS)
+XREF_FILES = ("xref_keys.npy", "xref_systems.npy", "xref_values.npy")
+CODE_MAP_COLUMNS = ["label", "mondo_code"] + SYSTEM_NAMES
+
+
+def mondo_number(code):
+    """'MONDO_0007254' / 'MONDO:0007254' -> 7254; None for missing or non-MONDO codes."""
+    code = normalize_code(code)
+    if not code or not code.startswith("MONDO_"):
+        return None
+    digits = code[len("MONDO_"):]
+    return int(digits) if digits.isdigit() else None
+
+
+def xref_system(xref):
+    """Index into SYSTEM_NAMES for an xref ('OMIM:114480' -> 0), or None for other sources."""
+    for i, prefixes in enumerate(SYSTEMS.values()):
+        if xref.startswith(prefixes):
+            return i
+    return None
+
+
+# ================ BUILD ================
+def build_xrefs(source=None, index_dir=None):
+    """Parse mondo.obo (path or URL) and save the sorted xref arrays. Returns the number of xrefs."""
+    import numpy as np
+    from backend.mondo_obo import MONDO_OBO_URL, iter_terms
+
+    index_dir = index_dir or INDEX_DIR
+    os.makedirs(index_dir, exist_ok=True)
+    rows = set()
+    for term in iter_terms(source or MONDO_OBO_URL):
+        number = mondo_number(term["id"])
+        if term["obsolete"] or number is None:
+            continue
+        for xref in term["xrefs"]:
+            system = xref_system(xref)
+            if system is not None:
+                rows.add((number, system, xref))
+    rows = sorted(rows)
+
+    keys, systems, values = XREF_FILES
+    np.save(os.path.join(index_dir, keys), np.array([r[0] for r in rows], dtype=np.int32))
+    np.save(os.path.join(index_dir, systems), np.array([r[1] for r in rows], dtype=np.uint8))
+    np.save(os.path.join(index_dir, values), np.array([r[2].encode() for r in rows], dtype=bytes))
+    load_xrefs.cache_clear()
+    print(f"✅ {len(rows)} OMIM / ICD-10 / Orphanet xrefs -> {index_dir}")
+    return len(rows)
+
+
+# ================ LOOKUPS ================
+@lru_cache(maxsize=None)
+def load_xrefs(index_dir=None):
+    """(keys, systems, values) as read-only memory maps, or None when they have not been built."""
+    paths = [os.path.join(index_dir or INDEX_DIR, name) for name in XREF_FILES]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    import numpy as np
+    return tuple(np.load(path, mmap_mode="r") for path in paths)
+
+
+def xrefs_for(code, index=None):
+    """{"OMIM": [...], "ICD10": [...], "Orphanet": [...]} for a MONDO code; {} when unknown or unbuilt."""
+    index = index or load_xrefs()
+    number = mondo_number(code)
+    if index is None or number is None:
+        return {}
+    keys, systems, values = index
+    start, end = keys.searchsorted(number, "left"), keys.searchsorted(number, "right")
+    mapped = {}
+    for system, value in zip(systems[start:end].tolist(), values[start:end].tolist()):
+        mapped.setdefault(SYSTEM_NAMES[system], []).append(value.decode())
+    return mapped
+
+
+def map_codes(disease_codes):
+    """{label: xrefs_for(code)} for a label -> MONDO code dict (e.g. disease_columns)."""
+    index = load_xrefs()
+    return {label: xrefs_for(code, index) for label, code in (disease_codes or {}).items()}
+
+
+def format_xrefs(xrefs):
+    """'OMIM:114480, ICD10CM:C50, Orphanet:180250' (or '' when nothing is mapped)."""
+    return ", ".join(value for name in SYSTEM_NAMES for value in xrefs.get(name, []))
+
+
+def code_map_csv(disease_codes, disease_xrefs=None):
+    """
+    CSV text with one row per disease: label, MONDO code and its OMIM / ICD-10 / Orphanet
+    codes (taken from disease_xrefs when recorded there, else looked up).
+    """
+    disease_xrefs = disease_xrefs or {}
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CODE_MAP_COLUMNS)
+    for label in sorted(disease_codes or {}):
+        xrefs = disease_xrefs[label] if label in disease_xrefs else xrefs_for(disease_codes[label])
+        writer.writerow([label, disease_codes[label]] + [";".join(xrefs.get(name, [])) for name in SYSTEM_NAMES])
+    return buffer.getvalue()
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "lookup"):
+        print("Usage: python3 -m backend.mondo_xref build [mondo.obo path or URL] | lookup <MONDO code>")
+        sys.exit(1)
+    if sys.argv[1] == "build":
+        build_xrefs(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        for code in sys.argv[2:]:
+            print(f"{code}: {format_xrefs(xrefs_for(code)) or 'no mapped codes'}")
+
+
+if __name__ == "__main__":
+    main()
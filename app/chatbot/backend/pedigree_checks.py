@@ -0,0 +1,232 @@
+"""
+Whole-pedigree consistency checks.
+
+Every family is flattened into NumPy arrays (many families are concatenated and
+checked together), parent / partner ids are resolved with one searchsorted over
+(family, id) keys, and each check is a handful of array operations:
+
+    parent_age_gap     parent born after, or implausibly close to / far from, the child
+    sex_role           relation or parent slot disagrees with the recorded sex
+    cycle              parent links loop back on themselves
+    dangling_id        dad_id / mom_id / partner_id pointing at nobody in the family
+    duplicate          the same id twice, or a one-per-family relation recorded twice
+    sibling_spacing    children of one mother born 2 days to ~9 months apart
+
+    issues = check_pedigree(people)              # one family
+    results = check_families({fid: people})      # batch: {fid: [issue, ...]}
+
+An issue is {"check", "severity" ("error" / "warning"), "ids", "message"}.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tools import RELATION_SEX
+
+MIN_PARENT_AGE = 12
+MAX_MOTHER_AGE = 55
+MAX_FATHER_AGE = 80
+SIBLING_GAP_DAYS = (2, 270)  # twins are born within a day; closer than ~9 months is suspicious
+
+# Relations a family can only have once
+UNIQUE_RELATIONS = ("self", "father", "mother", "partner", "paternal_grandfather", "paternal_grandmother",
+                    "maternal_grandfather", "maternal_grandmother")
+
+
+def _int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def flatten(families):
+    """Concatenated arrays for a list of families (lists of person dicts)."""
+    people = [p for family in families for p in family]
+    return {
+        "family": np.repeat(np.arange(len(families)), [len(f) for f in families]),
+        "id": np.array([_int(p.get("id")) for p in people], dtype=np.int64),
+        "dad": np.array([_int(p.get("dad_id")) for p in people], dtype=np.int64),
+        "mom": np.array([_int(p.get("mom_id")) for p in people], dtype=np.int64),
+        "partner": np.array([_int(p.get("partner_id")) for p in people], dtype=np.int64),
+        "birthday": np.array([_int(p.get("birthday")) for p in people], dtype=np.int64),
+        "sex": np.array([str(p.get("sex") or "") for p in people], dtype=object),
+        "relation": np.array([str(p.get("relation") or "").lower() for p in people], dtype=object),
+    }
+
+
+def birth_days(birthdays):
+    """Approximate day numbers for yyyymmdd ints (NaN when missing or malformed)."""
+    year, month, day = birthdays // 10000, birthdays // 100 % 100, birthdays % 100
+    valid = (year > 1800) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    days = year * 365.25 + (month - 1) * 30.44 + day
+    return np.where(valid, days, np.nan)
+
+
+def resolve(arrays, column):
+    """Row index of each person's `column` id within their own family, -1 when absent (non-empty arrays)."""
+    family, ids = arrays["family"], arrays["id"]
+    span = int(max(ids.max(initial=0), arrays[column].max(initial=0))) + 1
+    keys = family * span + ids
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    wanted = family * span + arrays[column]
+    position = np.minimum(np.searchsorted(sorted_keys, wanted), len(keys) - 1)
+    found = (arrays[column] > 0) & (sorted_keys[position] == wanted)
+    return np.where(found, order[position], -1)
+
+
+def cycle_members(dad, mom):
+    """Boolean mask of people on (or between) parent-link cycles."""
+    n = len(dad)
+    # Peel from the top: a person is resolved once both parents are
+    resolved = np.append(np.zeros(n, dtype=bool), True)  # index -1 -> sentinel
+    while True:
+        new = resolved[dad] & resolved[mom]
+        if np.array_equal(new, resolved[:n]):
+            break
+        resolved[:n] = new
+    stuck = ~resolved[:n]
+    # Peel from the bottom: drop stuck people without stuck children (descendants of a cycle)
+    while stuck.any():
+        children = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(children, np.where(stuck, dad, n), 1)
+        np.add.at(children, np.where(stuck, mom, n), 1)
+        leaves = stuck & (children[:n] == 0)
+        if not leaves.any():
+            break
+        stuck &= ~leaves
+    return stuck
+
+
+def _issues(arrays):
+    """[(row, check, severity, ids, message)] for the flattened families."""
+    ids, sex, relation = arrays["id"], arrays["sex"], arrays["relation"]
+    n = len(ids)
+    found = []
+    if n == 0:
+        return found
+
+    dad, mom, partner = resolve(arrays, "dad"), resolve(arrays, "mom"), resolve(arrays, "partner")
+
+    # Dangling ids
+    for column, index in (("dad", dad), ("mom", mom), ("partner", partner)):
+        for i in np.flatnonzero((arrays[column] > 0) & (index < 0)):
+            found.append((i, "dangling_id", "error", (int(ids[i]), int(arrays[column][i])),
+                          f"{relation[i] or 'person'} {ids[i]}: {column}_id {arrays[column][i]} is not in the family"))
+
+    # Duplicate ids and one-per-family relations
+    relations, relation_code = np.unique(relation, return_inverse=True)
+    unique_relation = np.isin(relations, UNIQUE_RELATIONS)[relation_code]
+    for what, values, rows in (("id", ids, np.arange(n)), ("relation", relation_code, np.flatnonzero(unique_relation))):
+        if not len(rows):
+            continue
+        keys = arrays["family"][rows] * (int(values.max()) + 1) + values[rows]
+        _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        for group in np.flatnonzero(counts > 1):
+            members = rows[inverse == group]
+            label = ids[members[0]] if what == "id" else relation[members[0]]
+            found.append((members[0], "duplicate", "error", tuple(int(ids[m]) for m in members),
+                          f"{what} '{label}' recorded {counts[group]} times"))
+
+    # Sex / role conflicts
+    expected = np.array([next((s for r, s in RELATION_SEX.items() if rel.startswith(r)), "") for rel in relations],
+                        dtype=object)[relation_code]
+    for i in np.flatnonzero((expected != "") & np.isin(sex, ["1", "2"]) & (sex != expected)):
+        found.append((i, "sex_role", "error", (int(ids[i]),),
+                      f"{relation[i]} {ids[i]} is recorded as {'male' if sex[i] == '1' else 'female'}"))
+    for index, wrong, slot in ((dad, "2", "dad_id"), (mom, "1", "mom_id")):
+        for i in np.flatnonzero((index >= 0) & (sex[np.maximum(index, 0)] == wrong)):
+            found.append((i, "sex_role", "error", (int(ids[i]), int(ids[index[i]])),
+                          f"{relation[i] or 'person'} {ids[i]}: {slot} points at "
+                          f"{'female' if wrong == '2' else 'male'} {relation[index[i]] or 'person'} {ids[index[i]]}"))
+
+    # Cycles
+    on_cycle = cycle_members(dad, mom)
+    for family in np.unique(arrays["family"][on_cycle]):
+        members = np.flatnonzero(on_cycle & (arrays["family"] == family))
+        found.append((members[0], "cycle", "error", tuple(int(ids[m]) for m in members),
+                      f"parent links form a cycle through ids {', '.join(str(ids[m]) for m in members)}"))
+
+    # Parent-child age gaps (years)
+    born = birth_days(arrays["birthday"])
+    for index, limit, role in ((dad, MAX_FATHER_AGE, "father"), (mom, MAX_MOTHER_AGE, "mother")):
+        has = index >= 0
+        gap = np.full(n, np.nan)
+        gap[has] = (born[has] - born[index[has]]) / 365.25
+        for i in np.flatnonzero(gap < MIN_PARENT_AGE):
+            severity = "error" if gap[i] <= 0 else "warning"
+            found.append((i, "parent_age_gap", severity, (int(ids[i]), int(ids[index[i]])),
+                          f"{relation[i] or 'person'} {ids[i]} was born {abs(gap[i]):.0f} years "
+                          f"{'before' if gap[i] <= 0 else 'after'} their {role} ({relation[index[i]] or role} {ids[index[i]]})"))
+        for i in np.flatnonzero(gap > limit):
+            found.append((i, "parent_age_gap", "warning", (int(ids[i]), int(ids[index[i]])),
+                          f"{relation[i] or 'person'} {ids[i]}: {role} was {gap[i]:.0f} at the birth"))
+
+    # Sibling spacing: children of the same mother (father when the mother is unknown)
+    parent = np.where(mom >= 0, mom, np.where(dad >= 0, dad + n, -1))
+    rows = np.flatnonzero((parent >= 0) & ~np.isnan(born))
+    rows = rows[np.lexsort((born[rows], parent[rows]))]
+    same = parent[rows[1:]] == parent[rows[:-1]]
+    gaps = born[rows[1:]] - born[rows[:-1]]
+    low, high = SIBLING_GAP_DAYS
+    for k in np.flatnonzero(same & (gaps >= low) & (gaps < high)):
+        a, b = rows[k], rows[k + 1]
+        found.append((b, "sibling_spacing", "warning", (int(ids[a]), int(ids[b])),
+                      f"{relation[a] or 'person'} {ids[a]} and {relation[b] or 'person'} {ids[b]} "
+                      f"were born {gaps[k]:.0f} days apart"))
+    return found
+
+
+def check_families(families, workers=1, chunk_size=2000):
+    """
+    Check many families at once. families: {family_id: [person dicts]}.
+    Returns {family_id: [issue, ...]} (an empty list for clean families).
+    """
+    keys = list(families)
+    if workers > 1 and len(keys) > chunk_size:
+        chunks = [{k: families[k] for k in keys[i:i + chunk_size]} for i in range(0, len(keys), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = {}
+            for part in pool.map(check_families, chunks):
+                results.update(part)
+            return results
+
+    arrays = flatten([families[k] for k in keys])
+    results = {k: [] for k in keys}
+    for row, check, severity, ids, message in _issues(arrays):
+        results[keys[arrays["family"][row]]].append(
+            {"check": check, "severity": severity, "ids": list(ids), "message": message})
+    return results
+
+
+def check_pedigree(people):
+    """Issues for one family (list of person dicts)."""
+    return check_families({0: people})[0]
+
+
+def issues_for(issues, person_id):
+    """The issues that involve a given person id."""
+    return [issue for issue in issues if person_id in issue["ids"]]
+
+
+def summarize(results):
+    """{check: number of issues} over check_families results."""
+    counts = {}
+    for issues in results.values():
+        for issue in issues:
+            counts[issue["check"]] = counts.get(issue["check"], 0) + 1
+    return counts
+
+
+def check_directory(directory, workers=os.cpu_count() or 1):
+    """Check every *.csv family file in `directory` (backend/family_import.py format), keyed by file name."""
+    from backend.family_import import import_family_csv
+
+    families = {}
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".csv"):
+            for family_id, people in import_family_csv(os.path.join(directory, name))["families"].items():
+                families[name if family_id == "1" else f"{name}:{family_id}"] = people
+    return check_families(families, workers)
@@ -0,0 +1,184 @@
+"""
+Lightweight SVG pedigree renderer.
+
+Builds compact vector markup straight from the family graph (the person dicts
+kept in data_store.people / st.session_state.people) so the browser does the
+rasterising instead of matplotlib or R on the server.
+
+Layout:
+    - generations come from the dad_id/mom_id/partner_id links (parents sit one
+      row above their children, partners share a row)
+    - within a row, children are ordered under their parents and by birthday,
+      partners who married into the family sit next to their partner
+"""
+from html import escape
+
+from backend.family_graph import assign_generations, family_links
+from backend.mondo_closure import is_affected
+
+# Drawing constants (SVG user units)
+SYMBOL = 36
+COL_WIDTH = 96
+ROW_HEIGHT = 120
+MARGIN = 48
+TITLE_HEIGHT = 32
+
+FILL_MALE = "#add8e6"
+FILL_FEMALE = "#ffc0cb"
+FILL_UNKNOWN = "#e0e0e0"
+FILL_AFFECTED = "#d62728"
+
+
+def layout_pedigree(people):
+    """Return {id: (x, y)} in SVG units (before margins) for every person."""
+    by_id, parents, children, partners = family_links(people)
+    generation = assign_generations(people)
+    appearance = {p["id"]: i for i, p in enumerate(people)}
+
+    rows = {}
+    for p in people:
+        rows.setdefault(generation[p["id"]], []).append(p["id"])
+
+    positions = {}
+    widest = max(len(r) for r in rows.values())
+
+    for g in sorted(rows):
+        keys = {}
+        attached = {}
+        for pid in rows[g]:
+            placed = [positions[x][0] for x in parents[pid] if x in positions]
+            if placed:
+                keys[pid] = sum(placed) / len(placed)
+        for pid in sorted(rows[g], key=appearance.get):
+            if pid in keys:
+                continue
+            anchor = next((x for x in partners[pid] if x in keys or x in attached), None)
+            if anchor is not None:
+                attached[pid] = anchor
+            else:
+                keys[pid] = 1e6 + appearance[pid]
+
+        # Sibships in parent order (oldest first), partners slotted in right after their partner
+        followers = {}
+        for pid, anchor in attached.items():
+            followers.setdefault(anchor, []).append(pid)
+        ordered = []
+        stack = sorted(keys, key=lambda x: (keys[x], by_id[x].get("birthday") or 0), reverse=True)
+        while stack:
+            pid = stack.pop()
+            ordered.append(pid)
+            stack.extend(reversed(followers.get(pid, [])))
+        offset = (widest - len(ordered)) * COL_WIDTH / 2
+        for slot, pid in enumerate(ordered):
+            positions[pid] = (offset + slot * COL_WIDTH, g * ROW_HEIGHT)
+
+    return positions
+
+
+def _symbol(person, x, y, affected):
+    sex = person.get("sex")
+    half = SYMBOL // 2
+    if affected:
+        fill = FILL_AFFECTED
+    else:
+        fill = FILL_MALE if sex == "1" else FILL_FEMALE if sex == "2" else FILL_UNKNOWN
+
+    if sex == "1":
+        shape = f'<rect x="{x - half}" y="{y - half}" width="{SYMBOL}" height="{SYMBOL}" fill="{fill}"/>'
+    elif sex == "2":
+        shape = f'<circle cx="{x}" cy="{y}" r="{half}" fill="{fill}"/>'
+    else:
+        shape = (f'<polygon points="{x},{y - half} {x + half},{y} {x},{y + half} {x - half},{y}" '
+                 f'fill="{fill}"/>')
+
+    if person.get("is_dead") in (1, "1", True):
+        shape += f'<line x1="{x - half - 6}" y1="{y + half + 6}" x2="{x + half + 6}" y2="{y - half - 6}"/>'
+    if person.get("relation") == "self":
+        # Proband arrow
+        shape += (f'<path d="M{x - half - 18} {y + half + 14}L{x - half - 4} {y + half}" '
+                  f'marker-end="url(#a)"/>')
+    return shape
+
+
+def _label(person):
+    first = person.get("first_name") or person.get("relation", "").replace("_", " ").title()
+    birthday = str(person.get("birthday") or "")
+    year = f"b. {birthday[:4]}" if len(birthday) >= 4 and birthday[:4] != "0" else ""
+    return escape(first), escape(year)
+
+
+def render_pedigree_svg(people, focal_disease=None, disease_codes=None):
+    """Render the family as a standalone SVG string (no external assets)."""
+    title = "Family Pedigree" + (f" - {focal_disease}" if focal_disease else "")
+
+    if not people:
+        return ('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 400 80" width="100%">'
+                '<text x="200" y="45" text-anchor="middle" font-size="16">No family data to display</text></svg>')
+
+    by_id, parents, children, partners = family_links(people)
+    positions = layout_pedigree(people)
+    half = SYMBOL // 2
+
+    def at(pid):
+        x, y = positions[pid]
+        return round(x + MARGIN + half), round(y + MARGIN + half + TITLE_HEIGHT)
+
+    lines = []
+
+    # 💞 Partner lines (each couple once)
+    drawn = set()
+    for pid, others in partners.items():
+        for other in others:
+            pair = (min(pid, other), max(pid, other))
+            if pair in drawn:
+                continue
+            drawn.add(pair)
+            (x1, y1), (x2, y2) = sorted([at(pid), at(other)])
+            lines.append(f"M{x1 + half} {y1}H{x2 - half}" if y1 == y2 else f"M{x1} {y1}L{x2} {y2}")
+
+    # 👨‍👩‍👧 Sibship lines: drop from the couple (or single parent), bar, then down to each child
+    sibships = {}
+    for pid in by_id:
+        if parents[pid]:
+            sibships.setdefault(tuple(sorted(parents[pid])), []).append(pid)
+    for parent_ids, kids in sibships.items():
+        parent_points = [at(x) for x in parent_ids]
+        drop_x = round(sum(pt[0] for pt in parent_points) / len(parent_points))
+        drop_y = max(pt[1] for pt in parent_points)
+        if len(parent_points) == 1:
+            drop_y += half
+        kid_points = [at(k) for k in kids]
+        bar_y = round(min(pt[1] for pt in kid_points) - half - ROW_HEIGHT * 0.25)
+        xs = [pt[0] for pt in kid_points] + [drop_x]
+        path = f"M{drop_x} {drop_y}V{bar_y}M{min(xs)} {bar_y}H{max(xs)}"
+        for kx, ky in kid_points:
+            path += f"M{kx} {bar_y}V{ky - half}"
+        lines.append(path)
+
+    shapes = [f'<path d="{"".join(lines)}" fill="none"/>']
+    labels = []
+    for person in people:
+        x, y = at(person["id"])
+        shapes.append(_symbol(person, x, y, is_affected(person, focal_disease, disease_codes)))
+        name, year = _label(person)
+        labels.append(f'<text x="{x}" y="{y + half + 16}">{name}</text>')
+        if year:
+            labels.append(f'<text x="{x}" y="{y + half + 30}" fill="#555">{year}</text>')
+
+    width = round(max(x for x, _ in positions.values()) + SYMBOL + 2 * MARGIN)
+    height = round(max(y for _, y in positions.values()) + SYMBOL + 2 * MARGIN + TITLE_HEIGHT + 24)
+
+    legend = (f'<g transform="translate(8 {height - 18})" font-size="10" text-anchor="start">'
+              f'<rect width="10" height="10" fill="{FILL_MALE}"/><text x="14" y="9">Male</text>'
+              f'<circle cx="59" cy="5" r="5" fill="{FILL_FEMALE}"/><text x="68" y="9">Female</text>'
+              f'<rect x="112" width="10" height="10" fill="{FILL_AFFECTED}"/><text x="126" y="9">Affected</text></g>')
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%" '
+        f'font-family="sans-serif" font-size="11" text-anchor="middle">'
+        '<defs><marker id="a" viewBox="0 0 10 10" refX="9" refY="5" markerWidth="6" markerHeight="6" orient="auto">'
+        '<path d="M0 0L10 5L0 10z"/></marker></defs>'
+        f'<text x="{width // 2}" y="{MARGIN // 2 + 8}" font-size="15" font-weight="bold">{escape(title)}</text>'
+        '<g stroke="#000" stroke-width="2">' + "".join(shapes) + "</g>"
+        + "".join(labels) + legend + "</svg>"
+    )
@@ -0,0 +1,267 @@
+"""
+Exact carrier / affection probabilities by pedigree peeling.
+
+Elston-Stewart style peeling over the family graph for a single diallelic locus.
+The pedigree is split into individuals and nuclear families (dad, mom, children);
+in a pedigree without marriage or consanguinity loops that bipartite graph is a
+forest, so every partial likelihood ("message") between an individual and a
+nuclear family is computed exactly once - first peeling towards a root, then
+back out again - and each person's genotype posterior is read off in linear time.
+
+Genotypes are the number of disease alleles (0, 1, 2). For the X-linked model
+males are hemizygous and only take 0 or 1; people of unknown sex are treated as
+female. Missing parents are replaced by unphenotyped virtual founders, children
+who share one known parent and no recorded other parent are treated as full sibs.
+
+Phenotypes come from the recorded conditions: affected if the disease is listed,
+unaffected if other answers were recorded, unknown for deceased relatives with
+nothing recorded (their cause of death was usually not known to the patient).
+"""
+import numpy as np
+
+from backend.kinship import build_parent_index
+from backend.mondo_closure import is_affected
+
+MODES = ("dominant", "recessive", "x_linked")
+
+AFFECTED, UNAFFECTED, UNKNOWN = 1, 0, -1
+
+
+def make_model(mode="dominant", penetrance=0.8, phenocopy=0.01, allele_freq=0.001):
+    """
+    Single-locus model as a plain dict.
+    penetrance: P(affected | disease genotype); phenocopy: P(affected | no disease genotype).
+    x_linked is X-linked recessive (hemizygous males are affected like homozygous females).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown inheritance mode '{mode}' (expected one of {', '.join(MODES)})")
+    for name, value in (("penetrance", penetrance), ("phenocopy", phenocopy), ("allele_freq", allele_freq)):
+        if not 0 <= value <= 1:
+            raise ValueError(f"{name} must be between 0 and 1, got {value}")
+    return {"mode": mode, "penetrance": penetrance, "phenocopy": phenocopy, "allele_freq": allele_freq}
+
+
+def model_tables(model):
+    """Priors, penetrance vectors and transmission tables for (female, male), indexed [is_male]."""
+    q = model["allele_freq"]
+    pen, phen = model["penetrance"], model["phenocopy"]
+    hwe = np.array([(1 - q) ** 2, 2 * q * (1 - q), q * q])
+    t = np.array([0.0, 0.5, 1.0])  # P(parent transmits the disease allele | genotype)
+
+    def offspring(p, r):
+        # Genotype distribution of a child receiving independent alleles with probabilities p, r
+        return np.stack([(1 - p) * (1 - r), p * (1 - r) + r * (1 - p), p * r], axis=-1)
+
+    autosomal = offspring(t[:, None], t[None, :])  # [g_dad, g_mom, g_child]
+
+    if model["mode"] == "x_linked":
+        priors = (hwe, np.array([1 - q, q, 0.0]))
+        penetrances = (np.array([phen, phen, pen]), np.array([phen, pen, 0.0]))
+        # Daughters get the father's only X, sons get one of the mother's
+        daughter = offspring(np.array([0.0, 1.0, 1.0])[:, None], t[None, :])
+        son = np.zeros((3, 3, 3))
+        son[:, :, 0] = 1 - t[None, :]
+        son[:, :, 1] = t[None, :]
+        transmissions = (daughter, son)
+    else:
+        priors = (hwe, hwe)
+        if model["mode"] == "dominant":
+            vector = np.array([phen, pen, pen])
+        else:
+            vector = np.array([phen, phen, pen])
+        penetrances = (vector, vector)
+        transmissions = (autosomal, autosomal)
+    return priors, penetrances, transmissions
+
+
+def phenotypes(people, disease, disease_codes=None):
+    """Array of AFFECTED / UNAFFECTED / UNKNOWN for `disease` (matched like the pedigree highlight)."""
+    status = []
+    for person in people:
+        conditions = person.get("conditions")
+        if is_affected(person, disease, disease_codes):
+            status.append(AFFECTED)
+        elif person.get("is_dead") in (1, "1", True) and not conditions:
+            status.append(UNKNOWN)
+        else:
+            status.append(UNAFFECTED)
+    return np.array(status, dtype=np.int64)
+
+
+def nuclear_families(people):
+    """
+    Return (n_total, is_male, families) where families is a list of (dad, mom, [children])
+    over person indices; indices >= len(people) are virtual founders for missing parents.
+    """
+    n = len(people)
+    _, dad_idx, mom_idx = build_parent_index(people)
+    is_male = [p.get("sex") == "1" for p in people]
+
+    virtual = {}
+    by_parents = {}
+    for child in range(n):
+        dad, mom = int(dad_idx[child]), int(mom_idx[child])
+        if dad < 0 and mom < 0:
+            continue
+        if dad < 0:
+            dad = virtual.setdefault(("dad", mom), n + len(virtual))
+        if mom < 0:
+            mom = virtual.setdefault(("mom", dad), n + len(virtual))
+        by_parents.setdefault((dad, mom), []).append(child)
+
+    for role, _ in sorted(virtual, key=virtual.get):
+        is_male.append(role == "dad")
+
+    families = [(dad, mom, children) for (dad, mom), children in by_parents.items()]
+    return n + len(virtual), np.array(is_male, dtype=bool), families
+
+
+def _peeling_order(n_total, families):
+    """
+    Depth-first order over the individual/family forest.
+    Nodes are ("p", i) and ("f", k); returns (order, tree_parent, member_of).
+    Raises ValueError on loops.
+    """
+    member_of = [[] for _ in range(n_total)]
+    for k, (dad, mom, children) in enumerate(families):
+        for i in (dad, mom, *children):
+            member_of[i].append(k)
+
+    tree_parent = {}
+    order = []
+    for root in range(n_total):
+        if ("p", root) in tree_parent:
+            continue
+        tree_parent[("p", root)] = None
+        stack = [("p", root)]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            kind, index = node
+            neighbours = ([("f", k) for k in member_of[index]] if kind == "p"
+                          else [("p", i) for i in (families[index][0], families[index][1], *families[index][2])])
+            for other in neighbours:
+                if other == tree_parent[node]:
+                    continue
+                if other in tree_parent:
+                    raise ValueError("Pedigree contains a loop (consanguinity or a duplicated link); "
+                                     "peeling needs a loop-free family graph")
+                tree_parent[other] = node
+                stack.append(other)
+    return order, tree_parent, member_of
+
+
+def _normalize(vector):
+    total = vector.sum()
+    return vector / total if total > 0 else vector
+
+
+def carrier_probabilities(people, disease, model=None, disease_codes=None):
+    """
+    Posterior genotype distribution for everyone given all recorded phenotypes.
+    Returns a list of {"id", "carrier", "affected", "phenotype"} aligned with `people`:
+    carrier = P(at least one disease allele), affected = P(affected) (observed phenotypes are 0/1).
+    Raises ValueError for pedigrees with loops or phenotypes impossible under the model.
+    """
+    if not people:
+        return []
+    model = model or make_model()
+    priors, penetrances, transmissions = model_tables(model)
+    n = len(people)
+    n_total, is_male, families = nuclear_families(people)
+    status = np.concatenate([phenotypes(people, disease, disease_codes), np.full(n_total - n, UNKNOWN)])
+
+    # Local evidence: founder prior x penetrance of the observed phenotype
+    has_parents = np.zeros(n_total, dtype=bool)
+    for _, _, children in families:
+        has_parents[children] = True
+    local = np.ones((n_total, 3))
+    for i in range(n_total):
+        sex = int(is_male[i])
+        if not has_parents[i]:
+            local[i] *= priors[sex]
+        if status[i] == AFFECTED:
+            local[i] *= penetrances[sex]
+        elif status[i] == UNAFFECTED:
+            local[i] *= 1 - penetrances[sex]
+        if sex and model["mode"] == "x_linked":
+            local[i, 2] = 0.0
+
+    child_tables = [[transmissions[int(is_male[c])] for c in children] for _, _, children in families]
+    order, tree_parent, member_of = _peeling_order(n_total, families)
+
+    # Memoized partial likelihoods: to_family[(i, k)] and to_person[(k, i)]
+    to_family, to_person = {}, {}
+    ones = np.ones(3)
+
+    def person_message(i, k):
+        message = local[i].copy()
+        for other in member_of[i]:
+            if other != k:
+                message *= to_person[(other, i)]
+        return _normalize(message)
+
+    def family_messages(k, targets):
+        dad, mom, children = families[k]
+        mu_dad = to_family.get((dad, k), ones)
+        mu_mom = to_family.get((mom, k), ones)
+        # S_c[g_dad, g_mom] = sum over the child's genotype of transmission x child's message
+        sums = [table @ to_family.get((c, k), ones) for c, table in zip(children, child_tables[k])]
+        prefix = [np.ones((3, 3))]
+        for s in sums:
+            prefix.append(prefix[-1] * s)
+        suffix = [np.ones((3, 3))]
+        for s in reversed(sums):
+            suffix.append(suffix[-1] * s)
+        suffix.reverse()
+        everything = prefix[-1]
+
+        for i in targets:
+            if i == dad:
+                to_person[(k, i)] = _normalize(everything @ mu_mom)
+            elif i == mom:
+                to_person[(k, i)] = _normalize(mu_dad @ everything)
+            else:
+                c = children.index(i)
+                weight = np.outer(mu_dad, mu_mom) * prefix[c] * suffix[c + 1]
+                to_person[(k, i)] = _normalize(np.einsum("dm,dmc->c", weight, child_tables[k][c]))
+
+    # Peel inwards (leaves to roots), then back outwards
+    for node in reversed(order):
+        parent = tree_parent[node]
+        if parent is None:
+            continue
+        kind, index = node
+        if kind == "p":
+            to_family[(index, parent[1])] = person_message(index, parent[1])
+        else:
+            family_messages(index, [parent[1]])
+    for node in order:
+        kind, index = node
+        if kind == "p":
+            for k in member_of[index]:
+                if tree_parent[("f", k)] == node:
+                    to_family[(index, k)] = person_message(index, k)
+        else:
+            dad, mom, children = families[index]
+            family_messages(index, [i for i in (dad, mom, *children) if tree_parent[("p", i)] == node])
+
+    results = []
+    for i, person in enumerate(people):
+        posterior = local[i].copy()
+        for k in member_of[i]:
+            posterior *= to_person[(k, i)]
+        if posterior.sum() <= 0:
+            raise ValueError(f"Recorded phenotypes are impossible under the {model['mode']} model")
+        posterior /= posterior.sum()
+        if status[i] == UNKNOWN:
+            affected = float(posterior @ penetrances[int(is_male[i])])
+        else:
+            affected = float(status[i] == AFFECTED)
+        results.append({
+            "id": person["id"],
+            "carrier": float(posterior[1:].sum()),
+            "affected": affected,
+            "phenotype": int(status[i]),
+        })
+    return results
@@ -0,0 +1,94 @@
+"""
+Speculative prefetch of the next relative's opening question.
+
+While the user reads the current relative's summary ("is everything correct?")
+or picks a MONDO match, the next interview stage is predictable, so its first
+model turn can be generated in the background. Siblings and children are not
+guessed: whether there is one is asked (yes / no) first.
+
+The result is kept under a key of the request's stable part (see opening_key):
+the next relation, its stage context and its instructions, with the patient's
+name and age as they will be once the relative being confirmed is stored. The
+memory facts and family-pattern hint are left out of the key: they change as soon
+as that relative is stored, which is exactly when the opening is taken, and the
+interview's own messages carry the fresh prompt from the first answer on. When
+the interview asks for that opening it takes the result (waiting for it if still
+in flight); any other key discards it.
+
+    prefetcher = Prefetcher()
+    prefetcher.submit(opening_key("father", instructions), create_opening, messages)
+    reply = prefetcher.take(opening_key("father", instructions)) or create_opening(messages)
+
+Set ROOTS_PREFETCH=0 to disable (every opening is then a blocking call).
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PREFETCH_ENABLED = os.getenv("ROOTS_PREFETCH", "1") != "0"
+
+# An assistant turn containing one of these is asking the user to confirm a summary
+CONFIRMATION_HINTS = ("correct", "confirm", "accurate", "right?", "anything to change", "anything to update")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Process-wide pool for speculative calls (shared by every session)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="roots-prefetch")
+        return _executor
+
+
+def opening_key(relation, messages):
+    """Key of an opening request: the relation and a digest of `messages` (its context and instructions)."""
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()
+    return relation, digest
+
+
+def looks_like_confirmation(text):
+    """True when an assistant message asks the user to confirm what was collected."""
+    text = (text or "").lower()
+    return "?" in text and any(hint in text for hint in CONFIRMATION_HINTS)
+
+
+class Prefetcher:
+    """One speculative call in flight at a time, with counts of how often it paid off."""
+
+    def __init__(self):
+        self.key, self.future = None, None
+        self.stats = {"submitted": 0, "used": 0, "discarded": 0, "failed": 0}
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Start fn(*args, **kwargs) in the background for `key` (no-op when already prefetching it)."""
+        if not PREFETCH_ENABLED or key is None or key == self.key:
+            return
+        self.discard()
+        self.key, self.future = key, executor().submit(fn, *args, **kwargs)
+        self.stats["submitted"] += 1
+
+    def take(self, key, timeout=None):
+        """The prefetched result for `key`, or None (nothing prefetched, another key, or the call failed)."""
+        if self.future is None or key != self.key:
+            self.discard()
+            return None
+        future, self.key, self.future = self.future, None, None
+        try:
+            result = future.result(timeout)
+        except Exception:
+            self.stats["failed"] += 1
+            return None
+        self.stats["used"] += 1
+        return result
+
+    def discard(self):
+        """Drop the pending result (a call already running finishes in the background, unused)."""
+        if self.future is not None:
+            self.future.cancel()
+            self.stats["discarded"] += 1
+        self.key, self.future = None, None
@@ -0,0 +1,202 @@
+"""
+Process-wide scheduling of chat completions under the API key's rate limits.
+
+Every Streamlit session of a server shares one API key, so a burst of sessions
+can exhaust the provider's requests-per-minute (RPM) and tokens-per-minute (TPM)
+limits at once and make every session fail together. Each HTTP request therefore
+takes a ticket from one scheduler first:
+
+    - budgets    two token buckets refilled continuously (ROOTS_RPM requests and
+                 ROOTS_TPM tokens per minute); a request is charged its estimated
+                 prompt tokens plus its completion budget, corrected with the real
+                 usage once it returns
+    - priority   interactive turns are always served before background work
+                 (prefetched openings)
+    - fairness   within a priority, sessions take turns (round robin), so one busy
+                 session cannot starve the others
+    - 429s       a rate-limit reply pauses the buckets for its Retry-After
+
+Waiting counts against the call's deadline (backend/llm_calls.py). The shared
+HTTP client keeps a bounded keep-alive pool for all sessions.
+
+    ticket = scheduler().acquire("session-1", INTERACTIVE, estimate_tokens(messages, tools), deadline)
+    ...
+    scheduler().settle(ticket, response.usage.total_tokens)
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+INTERACTIVE, BACKGROUND = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+RPM_LIMIT = int(os.getenv("ROOTS_RPM", "500"))
+TPM_LIMIT = int(os.getenv("ROOTS_TPM", "200000"))
+COMPLETION_TOKENS = 500   # charged for the reply when max_tokens is not given
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE = 20
+WAIT_WINDOW = 500
+
+
+def estimate_tokens(messages, tools=None, max_tokens=None):
+    """Rough prompt + completion tokens for a request (about 4 characters per token, plus framing)."""
+    chars = sum(len(str(m.get("content") or "")) for m in messages or [])
+    chars += len(json.dumps(tools)) if tools else 0
+    return chars // 4 + 4 * len(messages or []) + (max_tokens or COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """`capacity` units per minute, refilled continuously; may go negative after a correction."""
+
+    def __init__(self, capacity):
+        self.capacity = float(capacity)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (0 when it is now)."""
+        self.refill(now)
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket, not forever
+        pause = max(0.0, self.paused_until - now)
+        return max(pause, (amount - self.level) * 60.0 / self.capacity if self.level < amount else 0.0)
+
+    def take(self, amount):
+        self.level -= amount
+
+
+class Ticket:
+    def __init__(self, session, priority, tokens):
+        self.session, self.priority, self.tokens = session, priority, tokens
+        self.enqueued = time.monotonic()
+
+
+class Scheduler:
+    """Priority + round-robin admission of requests against the RPM / TPM buckets."""
+
+    def __init__(self, rpm=RPM_LIMIT, tpm=TPM_LIMIT):
+        self.requests, self.tokens = TokenBucket(rpm), TokenBucket(tpm)
+        self.queues = {}      # (priority, session) -> deque of waiting tickets
+        self.rotation = deque()  # sessions in round-robin order
+        self.cond = threading.Condition()
+        self.waits = deque(maxlen=WAIT_WINDOW)
+        self.stats = {"granted": 0, "timed_out": 0, "max_depth": 0, "pauses": 0,
+                      "granted_by_priority": {name: 0 for name in PRIORITY_NAMES.values()}}
+
+    def depth(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def head(self):
+        """The ticket served next: highest priority, then the session whose turn it is."""
+        for priority in sorted({p for p, _ in self.queues}):
+            for session in self.rotation:
+                queue = self.queues.get((priority, session))
+                if queue:
+                    return queue[0]
+        return None
+
+    def acquire(self, session, priority, tokens, deadline=None):
+        """
+        Block until the request may be sent and charge it to the buckets. Raises TimeoutError when
+        `deadline` (a time.monotonic() value) passes first.
+        """
+        ticket = Ticket(session or "default", priority, tokens)
+        with self.cond:
+            self.queues.setdefault((priority, ticket.session), deque()).append(ticket)
+            if ticket.session not in self.rotation:
+                self.rotation.append(ticket.session)
+            self.stats["max_depth"] = max(self.stats["max_depth"], self.depth())
+            while True:
+                now = time.monotonic()
+                wait = None
+                if self.head() is ticket:
+                    wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                    if wait == 0:
+                        self._grant(ticket, now)
+                        return ticket
+                if deadline is not None and now >= deadline:
+                    self._remove(ticket)
+                    self.stats["timed_out"] += 1
+                    raise TimeoutError(f"rate limit queue: no slot before the deadline ({self.depth()} waiting)")
+                timeout = wait if wait is not None else 1.0
+                if deadline is not None:
+                    timeout = min(timeout, deadline - now)
+                self.cond.wait(max(timeout, 0.001))
+
+    def _grant(self, ticket, now):
+        self.requests.take(1)
+        self.tokens.take(ticket.tokens)
+        self._remove(ticket)
+        # The session goes to the back of the rotation once served
+        if ticket.session in self.rotation:
+            self.rotation.remove(ticket.session)
+            self.rotation.append(ticket.session)
+        self.waits.append(now - ticket.enqueued)
+        self.stats["granted"] += 1
+        self.stats["granted_by_priority"][PRIORITY_NAMES.get(ticket.priority, str(ticket.priority))] += 1
+        self.cond.notify_all()
+
+    def _remove(self, ticket):
+        key = (ticket.priority, ticket.session)
+        queue = self.queues.get(key)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+        if queue is not None and not queue:
+            del self.queues[key]
+        if ticket.session in self.rotation and not any(s == ticket.session for _, s in self.queues):
+            self.rotation.remove(ticket.session)
+        self.cond.notify_all()
+
+    def settle(self, ticket, used_tokens):
+        """Correct the token bucket with the tokens the request really used."""
+        if used_tokens is None:
+            return
+        with self.cond:
+            self.tokens.take(used_tokens - ticket.tokens)
+            self.cond.notify_all()
+
+    def pause(self, seconds):
+        """Stop admitting requests for `seconds` (the provider answered 429)."""
+        with self.cond:
+            until = time.monotonic() + max(seconds, 0.0)
+            self.requests.paused_until = max(self.requests.paused_until, until)
+            self.stats["pauses"] += 1
+            self.cond.notify_all()
+
+    def metrics(self):
+        """Queue depth and wait times (seconds) for display."""
+        with self.cond:
+            waits = sorted(self.waits)
+            return {"depth": self.depth(), "max_depth": self.stats["max_depth"], "granted": self.stats["granted"],
+                    "timed_out": self.stats["timed_out"], "pauses": self.stats["pauses"],
+                    "by_priority": dict(self.stats["granted_by_priority"]),
+                    "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+                    "p95_wait": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0}
+
+
+_scheduler = None
+_lock = threading.Lock()
+
+
+def scheduler():
+    """The process-wide scheduler (one per API key in practice: the app uses one key)."""
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def http_client():
+    """The pooled HTTP client shared by every session's OpenAI client."""
+    import httpx
+    from openai import DefaultHttpxClient
+
+    return DefaultHttpxClient(limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                                  max_keepalive_connections=MAX_KEEPALIVE))
@@ -0,0 +1,293 @@
+"""
+Referral-criteria rule engine.
+
+Family-history referral criteria are written as plain dicts, e.g.
+
+    {
+        "name": "breast_2_fdr_under_50",
+        "description": "Two first-degree relatives with breast cancer diagnosed before 50",
+        "codes": ["MONDO_0007254"],      # MONDO codes (either MONDO_ or MONDO: form)
+        "labels": ["breast cancer"],     # and/or condition label substrings
+        "degrees": [1],                  # relationship degree(s) to the patient (0 = patient)
+        "min_count": 2,                  # at least this many matching relatives
+        "max_onset_age": 50,             # optional: diagnosed before this age
+        "sex": "2",                      # optional: '1' male / '2' female relatives only
+    }
+
+compile_rules() turns a rule list into one vectorized predicate over an indexed
+family (index_family: relationship degree, sex, age and a persons x conditions
+matrix), so a whole rule set costs a few NumPy operations per family.
+evaluate_families() runs it over thousands of stored families, optionally in a
+process pool.
+
+Age at onset comes from a person's "onset_ages" ({condition label: age}) when
+recorded; otherwise the person's current age is used as an upper bound, and
+affected relatives of unknown age do not count towards age-limited criteria.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+
+from backend.kinship import compute_kinship, find_proband, relationship_degree
+from backend.mondo_closure import is_descendant, normalize_code, resolve_code
+
+RULE_KEYS = {"name", "description", "codes", "labels", "degrees", "min_count", "max_onset_age", "sex"}
+BASE_COLUMNS = ["id", "relation", "first_name", "last_name", "birthday", "sex", "is_dead", "dad_id", "mom_id", "partner_id"]
+
+# Degrees are looked up in a table, anything further than this is "unrelated"
+MAX_DEGREE = 8
+
+DEFAULT_RULES = [
+    {
+        "name": "breast_2_fdr_under_50",
+        "description": "Two or more first-degree relatives with breast cancer diagnosed before 50",
+        "codes": ["MONDO_0007254"], "labels": ["breast cancer"],
+        "degrees": [1], "min_count": 2, "max_onset_age": 50,
+    },
+    {
+        "name": "male_breast_cancer",
+        "description": "Male breast cancer in a first-, second- or third-degree relative",
+        "codes": ["MONDO_0007254"], "labels": ["breast cancer"],
+        "degrees": [1, 2, 3], "min_count": 1, "sex": "1",
+    },
+    {
+        "name": "ovarian_cancer_relative",
+        "description": "Ovarian cancer in a first- or second-degree relative",
+        "codes": ["MONDO_0008170"], "labels": ["ovarian cancer"],
+        "degrees": [1, 2], "min_count": 1,
+    },
+    {
+        "name": "colorectal_fdr_under_50",
+        "description": "First-degree relative with colorectal cancer diagnosed before 50",
+        "codes": ["MONDO_0005575"], "labels": ["colorectal cancer", "colon cancer", "bowel cancer"],
+        "degrees": [1], "min_count": 1, "max_onset_age": 50,
+    },
+    {
+        "name": "lynch_3_relatives",
+        "description": "Three or more first- or second-degree relatives with Lynch syndrome associated cancers",
+        "codes": ["MONDO_0005575"],
+        "labels": ["colorectal cancer", "colon cancer", "bowel cancer", "endometrial cancer",
+                   "uterine cancer", "ovarian cancer", "stomach cancer", "gastric cancer"],
+        "degrees": [1, 2], "min_count": 3,
+    },
+    {
+        "name": "prostate_2_relatives",
+        "description": "Two or more first- or second-degree relatives with prostate cancer",
+        "codes": ["MONDO_0008315"], "labels": ["prostate cancer"],
+        "degrees": [1, 2], "min_count": 2,
+    },
+    {
+        "name": "sudden_cardiac_death_under_40",
+        "description": "First-degree relative with sudden cardiac death or cardiomyopathy before 40",
+        "labels": ["sudden cardiac death", "sudden death", "cardiomyopathy"],
+        "degrees": [1], "min_count": 1, "max_onset_age": 40,
+    },
+]
+
+
+# ================ INDEXED FAMILY DATA ================
+def ages_from_birthdays(birthdays, today=None):
+    """Vectorized whole-year ages from yyyymmdd ints; NaN where unknown."""
+    today = today or date.today()
+    birthdays = np.asarray(birthdays, dtype=np.int64)
+    year, month_day = birthdays // 10000, birthdays % 10000
+    age = today.year - year - (today.month * 100 + today.day < month_day)
+    return np.where((year > 1800) & (year <= today.year), age, np.nan).astype(float)
+
+
+def index_family(people, disease_codes=None, today=None):
+    """
+    Arrays the rules run on, aligned with `people`:
+    degree (to the patient), sex, age, conditions (labels), codes, affected and onset
+    (persons x conditions). disease_codes maps condition label -> MONDO code.
+    """
+    disease_codes = disease_codes or {}
+    conditions = sorted({d for p in people if isinstance(p.get("conditions"), dict)
+                         for d, has in p["conditions"].items() if has})
+    column = {label: j for j, label in enumerate(conditions)}
+
+    if people:
+        _, phi = compute_kinship(people)
+        proband = find_proband(people)
+        degree = relationship_degree(phi[proband])
+        degree[proband] = 0
+    else:
+        degree = np.zeros(0, dtype=np.int64)
+
+    affected = np.zeros((len(people), len(conditions)), dtype=bool)
+    onset = np.full((len(people), len(conditions)), np.nan)
+    for i, person in enumerate(people):
+        person_conditions = person.get("conditions")
+        if not isinstance(person_conditions, dict):
+            continue
+        onset_ages = person.get("onset_ages") or {}
+        for label, has in person_conditions.items():
+            if has:
+                affected[i, column[label]] = True
+                if onset_ages.get(label) is not None:
+                    onset[i, column[label]] = float(onset_ages[label])
+
+    return {
+        "degree": degree,
+        "sex": np.array([str(p.get("sex", "")) for p in people]),
+        "age": ages_from_birthdays([int(p.get("birthday") or 0) for p in people], today),
+        "conditions": tuple(c.lower() for c in conditions),
+        "codes": tuple(resolve_code(c, disease_codes.get(c)) for c in conditions),
+        "affected": affected,
+        "onset": onset,
+    }
+
+
+# ================ RULE COMPILATION ================
+def validate_rule(rule):
+    """Raise ValueError for malformed rules."""
+    unknown = set(rule) - RULE_KEYS
+    if unknown:
+        raise ValueError(f"Rule '{rule.get('name')}' has unknown keys: {', '.join(sorted(unknown))}")
+    if not rule.get("name"):
+        raise ValueError("Every rule needs a name")
+    if not rule.get("codes") and not rule.get("labels"):
+        raise ValueError(f"Rule '{rule['name']}' needs codes or labels")
+    if not rule.get("degrees") or any(not 0 <= d <= MAX_DEGREE for d in rule["degrees"]):
+        raise ValueError(f"Rule '{rule['name']}' needs degrees between 0 and {MAX_DEGREE}")
+    if int(rule.get("min_count", 1)) < 1:
+        raise ValueError(f"Rule '{rule['name']}' needs min_count >= 1")
+    if rule.get("sex") not in (None, "1", "2"):
+        raise ValueError(f"Rule '{rule['name']}' has sex '{rule['sex']}' (expected '1' or '2')")
+
+
+def compile_rules(rules=None):
+    """
+    Compile rule dicts into evaluate(index) -> [{"name", "description", "count"}, ...]
+    listing the matching criteria. Rule codes also match their MONDO subtypes when the
+    closure index is built. Per-family condition matching is cached by vocabulary.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    for rule in rules:
+        validate_rule(rule)
+
+    names = [r["name"] for r in rules]
+    descriptions = [r.get("description", r["name"]) for r in rules]
+    codes = [{normalize_code(c) for c in r.get("codes", [])} for r in rules]
+    labels = [[l.lower() for l in r.get("labels", [])] for r in rules]
+    min_count = np.array([int(r.get("min_count", 1)) for r in rules])
+    max_onset = np.array([float(r.get("max_onset_age") or np.inf) for r in rules])
+    sex = np.array([r.get("sex") or "" for r in rules])
+
+    # degree_ok[d + 1, r]: relatives of degree d count for rule r (row 0 = unrelated)
+    degree_ok = np.zeros((MAX_DEGREE + 2, len(rules)), dtype=bool)
+    for r, rule in enumerate(rules):
+        degree_ok[np.asarray(rule["degrees"]) + 1, r] = True
+
+    matches_cache = {}
+
+    def condition_matches(conditions, condition_codes):
+        """(rules x conditions) bool: which recorded conditions each rule is about."""
+        key = (conditions, condition_codes)
+        if key not in matches_cache:
+            matches_cache[key] = np.array([
+                [code in codes[r] or any(l in label for l in labels[r])
+                 or any(is_descendant(code, ancestor) for ancestor in codes[r])
+                 for label, code in zip(conditions, condition_codes)]
+                for r in range(len(rules))
+            ], dtype=bool).reshape(len(rules), len(conditions))
+        return matches_cache[key]
+
+    def evaluate(index):
+        if not len(index["degree"]) or not index["conditions"]:
+            return []
+        matches = condition_matches(index["conditions"], index["codes"])
+
+        # Earliest known (or bounded) onset per person and rule, inf where not affected
+        onset = np.where(np.isnan(index["onset"]), index["age"][:, None], index["onset"])
+        onset = np.where(index["affected"] & ~np.isnan(onset), onset, np.inf)
+        affected = index["affected"][:, None, :] & matches[None, :, :]
+        earliest = np.where(affected, onset[:, None, :], np.inf).min(axis=2)
+        qualifies = affected.any(axis=2) & ((max_onset == np.inf)[None, :] | (earliest < max_onset[None, :]))
+
+        degree = np.clip(index["degree"], -1, MAX_DEGREE) + 1
+        qualifies &= degree_ok[degree]
+        qualifies &= (sex == "")[None, :] | (index["sex"][:, None] == sex[None, :])
+
+        counts = qualifies.sum(axis=0)
+        return [{"name": names[r], "description": descriptions[r], "count": int(counts[r])}
+                for r in np.flatnonzero(counts >= min_count)]
+
+    return evaluate
+
+
+def evaluate_family(people, rules=None, disease_codes=None):
+    """Matching criteria for one family (list of person dicts)."""
+    return compile_rules(rules)(index_family(people, disease_codes))
+
+
+# ================ STORED FAMILIES ================
+def load_family_csv(path):
+    """
+    Read a family CSV as exported by the app (base columns + 'label (MONDO_code)' columns).
+    Returns (people, disease_codes).
+    """
+    people, disease_codes = [], {}
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        disease_columns = {}
+        for column in reader.fieldnames or []:
+            if column in BASE_COLUMNS or " (" not in column or not column.endswith(")"):
+                continue
+            label, code = column[:-1].rsplit(" (", 1)
+            disease_columns[column] = label
+            disease_codes[label] = code
+        for row in reader:
+            person = {}
+            for key in BASE_COLUMNS:
+                value = row.get(key, "")
+                person[key] = int(value) if key in ("id", "birthday", "is_dead", "dad_id", "mom_id", "partner_id") \
+                    and str(value).strip().lstrip("-").isdigit() else value
+            person["conditions"] = {label: True for column, label in disease_columns.items()
+                                    if str(row.get(column, "")).strip() in ("1", "1.0", "True")}
+            people.append(person)
+    return people, disease_codes
+
+
+_worker_rules = None
+
+
+def _init_worker(rules):
+    global _worker_rules
+    _worker_rules = compile_rules(rules)
+
+
+def _evaluate_chunk(chunk):
+    results = []
+    for family_id, family in chunk:
+        try:
+            people, disease_codes = load_family_csv(family) if isinstance(family, str) else family
+            results.append((family_id, _worker_rules(index_family(people, disease_codes))))
+        except (OSError, ValueError, KeyError) as e:
+            results.append((family_id, {"error": str(e)}))
+    return results
+
+
+def evaluate_families(families, rules=None, workers=1, chunk_size=64):
+    """
+    Evaluate a rule set against many families.
+    families: {family_id: (people, disease_codes)} or {family_id: path to a family CSV}.
+    Returns {family_id: [matching criteria]} ({"error": ...} for families that fail to load).
+    """
+    items = list(families.items())
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    if workers <= 1:
+        _init_worker(rules)
+        return dict(pair for chunk in chunks for pair in _evaluate_chunk(chunk))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+        return dict(pair for result in pool.map(_evaluate_chunk, chunks) for pair in result)
+
+
+def evaluate_directory(directory, rules=None, workers=os.cpu_count() or 1):
+    """Evaluate every *.csv family file in `directory`, keyed by file name."""
+    paths = {name: os.path.join(directory, name) for name in sorted(os.listdir(directory))
+             if name.lower().endswith(".csv")}
+    return evaluate_families(paths, rules, workers)
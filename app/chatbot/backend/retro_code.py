@@ -0,0 +1,265 @@
+"""
+Bulk retro-coding of free-text conditions in stored families.
+
+Conditions the user kept as typed (or that OLS had no match for) are stored as
+"label (N/A)" columns. This job scans the family CSVs, collects the distinct
+uncoded labels across all of them, resolves each label once and rewrites the
+column headers in place:
+
+    1. exact MONDO name / synonym (backend/mondo_closure.py)      score 1.0
+    2. local TF-IDF fuzzy search (backend/mondo_search.py), or the OLS API with
+       --remote (rate-limited, scored with the same n-gram similarity)
+
+Matches scoring at least --accept are written back as "label (MONDO_x)"; the rest
+go to a review CSV with the best suggestion, so nothing is coded on a guess.
+
+Usage (from app/chatbot):
+    python3 -m backend.retro_code                          # results/*.csv
+    python3 -m backend.retro_code families/ one.csv --dry-run
+    python3 -m backend.retro_code families/ --remote --rate 5 --workers 4
+"""
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.mondo_closure import CHATBOT_DIR, code_for_label, load_index, normalize_code
+from backend.referral_rules import BASE_COLUMNS
+
+RESULTS_DIR = os.path.join(CHATBOT_DIR, "results")
+REVIEW_FILE = "retro_code_review.csv"
+ACCEPT_SCORE = 0.85
+
+
+# ================ SCAN ================
+def family_paths(paths):
+    """Family CSV files from a mix of files and directories (directories are not recursed)."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(".csv") and name != REVIEW_FILE)
+        elif path.lower().endswith(".csv"):
+            found.append(path)
+    return found
+
+
+def split_column(column):
+    """'label (code)' -> (label, code); (None, None) for base and other columns."""
+    if column in BASE_COLUMNS or " (" not in column or not column.endswith(")"):
+        return None, None
+    label, code = column[:-1].rsplit(" (", 1)
+    return label, code
+
+
+def read_header(path):
+    with open(path, newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def uncoded_labels(paths):
+    """{label: [paths]} for every disease column without a MONDO code. Reads header rows only."""
+    labels = {}
+    for path in paths:
+        for column in read_header(path):
+            label, code = split_column(column)
+            if label and normalize_code(code) is None:
+                labels.setdefault(label, []).append(path)
+    return labels
+
+
+# ================ RESOLVE ================
+class RateLimiter:
+    """At most `rate` calls per second across threads (evenly spaced)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def local_matcher(top_k=3):
+    """Resolver backed by the local search index, or None when it has not been built."""
+    from backend.mondo_search import load_search_index, search
+
+    index = load_search_index()
+    if index is None:
+        return None
+    return lambda label: search(label, top_k, index)
+
+
+def remote_matcher(rate=5.0, top_k=3):
+    """Resolver backed by OLS, at most `rate` requests per second."""
+    from backend.mondo_integration import get_mondo_matches
+    from backend.mondo_search import label_similarity
+
+    limiter = RateLimiter(rate)
+
+    def match(label):
+        limiter.wait()
+        try:
+            matches = get_mondo_matches(label, max_results=10)
+        except Exception as e:
+            print(f"[MONDO API ERROR] {label}: {e}")
+            return []
+        scored = [dict(m, matched=m["label"], score=label_similarity(label, m["label"]))
+                  for m in matches if normalize_code(m.get("mondo_code"))]
+        return sorted(scored, key=lambda m: -m["score"])[:top_k]
+
+    return match
+
+
+def resolve_label(label, matcher):
+    """Best match for one label: {"label", "mondo_code", "matched", "score", "source"} or None."""
+    code = code_for_label(label)
+    if code:
+        index = load_index()
+        return {"label": index["names"][index["position"][code]], "mondo_code": code,
+                "matched": label.lower(), "score": 1.0, "source": "exact"}
+    matches = matcher(label) if matcher else []
+    if not matches:
+        return None
+    return dict(matches[0], source="search")
+
+
+def resolve_labels(labels, matcher, workers=4):
+    """{label: best match or None}, resolved in parallel threads."""
+    labels = list(labels)
+    if workers <= 1 or len(labels) < 2:
+        return {label: resolve_label(label, matcher) for label in labels}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(labels, pool.map(lambda label: resolve_label(label, matcher), labels)))
+
+
+# ================ REWRITE ================
+def rewrite_header(path, renames):
+    """Rename columns of one CSV in place (temp file + atomic replace). Returns the number renamed."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        header = next(csv.reader(f), [])
+        new_header = [renames.get(column, column) for column in header]
+        changed = sum(a != b for a, b in zip(header, new_header))
+        if not changed:
+            return 0
+        fd, tmp_path = tempfile.mkstemp(suffix=".csv", dir=directory)
+        try:
+            with os.fdopen(fd, "w", newline="") as out:
+                csv.writer(out).writerow(new_header)
+                shutil.copyfileobj(f, out)
+            shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return changed
+
+
+def write_review(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["label", "suggested_code", "suggested_label", "matched", "score", "source", "files"])
+        for label, match, files in rows:
+            match = match or {}
+            writer.writerow([label, match.get("mondo_code", ""), match.get("label", ""), match.get("matched", ""),
+                             f"{match['score']:.3f}" if match else "", match.get("source", "none"),
+                             ";".join(os.path.basename(p) for p in files)])
+
+
+def retro_code(paths=None, remote=False, accept=ACCEPT_SCORE, workers=4, rate=5.0,
+               dry_run=False, review_path=None):
+    """
+    Scan, resolve and rewrite. Returns a summary dict with counts, throughput and
+    the review file path (None when every label was coded confidently).
+    """
+    started = time.perf_counter()
+    files = family_paths(paths or [RESULTS_DIR])
+    labels = uncoded_labels(files)
+    scanned = time.perf_counter()
+
+    matcher = remote_matcher(rate) if remote else local_matcher()
+    if matcher is None and load_index() is None:
+        print("⚠️ No local MONDO index (python3 -m backend.mondo_closure build); use --remote for OLS.")
+    resolved = resolve_labels(labels, matcher, workers)
+    matched = time.perf_counter()
+
+    accepted, review = {}, []
+    for label, match in resolved.items():
+        if match and match["score"] >= accept:
+            accepted[label] = match
+        else:
+            review.append((label, match, labels[label]))
+
+    renames_by_file = {}
+    for label, match in accepted.items():
+        for path in labels[label]:
+            renames_by_file.setdefault(path, {})[f"{label} (N/A)"] = f"{label} ({match['mondo_code']})"
+    rewritten = 0
+    if not dry_run:
+        for path, renames in renames_by_file.items():
+            # Other spellings of "no code" are renamed too
+            for column in read_header(path):
+                label, code = split_column(column)
+                if label in accepted and normalize_code(code) is None:
+                    renames[column] = f"{label} ({accepted[label]['mondo_code']})"
+            rewritten += rewrite_header(path, renames) > 0
+
+    if review:
+        review_path = review_path or os.path.join(os.path.dirname(os.path.abspath(files[0])), REVIEW_FILE)
+        write_review(review_path, sorted(review, key=lambda r: r[0].lower()))
+    finished = time.perf_counter()
+
+    elapsed = finished - started
+    summary = {
+        "files": len(files),
+        "labels": len(labels),
+        "coded": len(accepted),
+        "review": len(review),
+        "files_rewritten": rewritten,
+        "dry_run": dry_run,
+        "review_path": review_path if review else None,
+        "scan_seconds": scanned - started,
+        "resolve_seconds": matched - scanned,
+        "elapsed_seconds": elapsed,
+        "labels_per_second": len(labels) / (matched - scanned) if labels and matched > scanned else 0.0,
+        "files_per_second": len(files) / elapsed if elapsed else 0.0,
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign MONDO codes to uncoded conditions in stored families.")
+    parser.add_argument("paths", nargs="*", help=f"family CSV files or directories (default {RESULTS_DIR})")
+    parser.add_argument("--remote", action="store_true", help="resolve through the OLS API instead of the local index")
+    parser.add_argument("--accept", type=float, default=ACCEPT_SCORE, help="minimum score to rewrite a code")
+    parser.add_argument("--workers", type=int, default=4, help="parallel resolver threads")
+    parser.add_argument("--rate", type=float, default=5.0, help="OLS requests per second with --remote")
+    parser.add_argument("--dry-run", action="store_true", help="resolve and write the review file only")
+    parser.add_argument("--review", help="review CSV path (default next to the first family file)")
+    args = parser.parse_args()
+
+    summary = retro_code(args.paths or None, args.remote, args.accept, args.workers, args.rate,
+                         args.dry_run, args.review)
+    print(f"✅ {summary['files']} files, {summary['labels']} uncoded labels: {summary['coded']} coded, "
+          f"{summary['review']} for review"
+          + (" (dry run, nothing rewritten)" if args.dry_run else f", {summary['files_rewritten']} files rewritten"))
+    print(f"⏱️ scan {summary['scan_seconds']:.2f}s, resolve {summary['resolve_seconds']:.2f}s "
+          f"({summary['labels_per_second']:.0f} labels/s), total {summary['elapsed_seconds']:.2f}s "
+          f"({summary['files_per_second']:.0f} files/s)")
+    if summary["review_path"]:
+        print(f"📝 Review file: {summary['review_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Local slot filling for trivial interview answers.
+
+Many turns are a bare "yes", a date, "male" or "alive". Sending those to the
+model costs a full completion with the large system prompt, so each person being
+interviewed gets a slot state (first / last name, birthday, sex, living status,
+conditions) and every user message is tried here first:
+
+    - the question the assistant just asked is recognised from its wording
+      (birthday, sex, living status, conditions, name or a confirmation);
+    - a reply that is *entirely* an answer to it ("12/03/1980", "she's female",
+      "passed away", "none", "Bob Lee") fills that slot;
+    - when the next step is obvious, a template asks for the next missing slot,
+      or shows the summary box once everything is known, and a "yes" to that
+      summary finalizes the person without a model call.
+
+Anything else (free text, corrections, conditions to look up) goes to the model
+as before; its questions keep the slot state's notion of what is pending.
+
+    state = new_slots("father")
+    observe_assistant(state, "When was your father born?")
+    turn = local_turn(state, "3 March 1955")   # {"reply": "Noted. Is he still alive?", "finalize": None}
+"""
+import re
+from datetime import datetime
+
+from tools import RELATION_SEX
+
+SLOTS = ["first_name", "last_name", "birthday", "sex", "is_dead", "conditions"]
+ASK_ORDER = ["last_name", "birthday", "sex", "is_dead", "conditions"]  # first names are left to the model
+MONTHS = {m: i + 1 for i, m in enumerate(["january", "february", "march", "april", "may", "june", "july",
+                                          "august", "september", "october", "november", "december"])}
+MONTHS.update({m[:3]: i for m, i in list(MONTHS.items())})
+MONTHS["sept"] = 9
+
+YES = {"yes", "y", "yeah", "yep", "yup", "correct", "that's correct", "thats correct", "that is correct", "right",
+       "that's right", "thats right", "all correct", "all good", "looks good", "sure", "ok", "okay", "confirmed",
+       "yes correct", "yes that's correct", "yes thats correct", "yes it is", "it is", "perfect"}
+NO = {"no", "n", "nope", "nah", "not really", "incorrect", "wrong", "no it's not", "no its not", "no it isn't"}
+MALE = {"male", "m", "man", "boy", "a man", "a boy", "a male"}
+FEMALE = {"female", "f", "woman", "girl", "a woman", "a girl", "a female"}
+ALIVE = {"alive", "living", "still alive", "still living", "alive and well", "alive and kicking"}
+DEAD = {"dead", "deceased", "passed", "passed away", "died", "he died", "she died", "they died", "no longer alive",
+        "not alive", "not living", "he passed away", "she passed away", "they passed away", "he passed", "she passed"}
+NO_CONDITIONS = {"none", "no", "nothing", "nope", "no conditions", "no medical conditions", "none that i know of",
+                 "not that i know of", "not that i know", "healthy", "perfectly healthy", "no none", "nothing at all",
+                 "no conditions at all", "none at all", "no, none", "no nothing"}
+# Words that make a short reply a hedge or a remark rather than a name ("not sure", "no thanks")
+NOT_NAME_WORDS = {"not", "sure", "unsure", "know", "dont", "don't", "idk", "unknown", "no", "yes", "none", "thanks",
+                  "thank", "you", "maybe", "forgot", "remember", "skip", "pass", "later", "ok", "okay", "please",
+                  "i", "it", "he", "she", "they", "the", "a", "is", "was", "n/a", "na", "nothing", "sorry"}
+
+# Subject prefixes dropped before matching ("she's female", "he was born on ...")
+SUBJECT = re.compile(r"^(?:(?:he|she|they|i|it|my \w+)(?:'s|'m| is| was| am| are| were)?\s+)?(?:was\s+|is\s+)?"
+                     r"(?:born\s+)?(?:on\s+|in\s+)?(?:the\s+)?")
+
+# The name confirmation the interview prompt asks for ("I've saved your full name as Kellie Lai")
+SAVED_NAME = re.compile(r"\bname (?:as|is|to) \*{0,2}([A-Z][\w'-]+)((?: [A-Z][\w'-]+){1,2})\b")
+
+# Question keywords -> slot asked about (a question matching several is left to the model)
+QUESTION_SLOTS = {
+    "confirm": re.compile(r"\b(correct|accurate|confirm|is that right|is this right|anything to (change|update))\b"),
+    "birthday": re.compile(r"\b(born|birth|birthday|date of birth)\b"),
+    "sex": re.compile(r"\b(male or female|female or male|sex|gender)\b"),
+    "is_dead": re.compile(r"\b(alive|living|passed away|deceased|died)\b"),
+    "conditions": re.compile(r"\b(conditions?|diagnos\w*|medical|health (issues|problems))\b"),
+    "last_name": re.compile(r"\b(last name|surname|family name)\b"),
+    "name": re.compile(r"\b(name)\b"),
+}
+
+ACKS = ["Got it.", "Thanks!", "Noted.", "Great, thank you.", "Perfect."]
+QUESTIONS = {
+    "last_name": "And what is {first}'s last name?",
+    "birthday": "When was {who} born?",
+    "sex": "Is {who} male or female?",
+    "is_dead": "Is {who} still alive?",
+    "conditions": "Has {who} been diagnosed with any medical conditions?",
+}
+SELF_QUESTIONS = {
+    "last_name": "And what is your last name?",
+    "birthday": "What is your date of birth?",
+    "sex": "Are you male or female?",
+    "conditions": "Have you been diagnosed with any medical conditions?",
+}
+
+
+# ================ PARSERS ================
+def clean(text):
+    """Lowercased, trimmed, trailing punctuation removed."""
+    return re.sub(r"\s+", " ", str(text or "").strip().lower()).strip(" .!?")
+
+
+def parse_confirmation(text):
+    """True for a bare yes, False for a bare no, None otherwise."""
+    text = clean(text).replace(",", "")
+    return True if text in YES else False if text in NO else None
+
+
+def _date(day, month, year):
+    try:
+        date = datetime(int(year), int(month), int(day))
+    except (TypeError, ValueError):
+        return None
+    if date.year < 1900 or date > datetime.today():
+        return None
+    return int(date.strftime("%Y%m%d"))
+
+
+DATE_PATTERNS = [
+    # 12/03/1980, 12-3-1980, 12.03.1980 (day first)
+    (re.compile(r"(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{4})"), lambda m: _date(m[1], m[2], m[3])),
+    # 1980-03-12
+    (re.compile(r"(\d{4})[/\-.](\d{1,2})[/\-.](\d{1,2})"), lambda m: _date(m[3], m[2], m[1])),
+    # 19800312
+    (re.compile(r"(\d{4})(\d{2})(\d{2})"), lambda m: _date(m[3], m[2], m[1])),
+    # 12 March 1980, 12th of march, 1980
+    (re.compile(r"(\d{1,2})(?:st|nd|rd|th)?(?: of)? ([a-z]+),? (\d{4})"),
+     lambda m: _date(m[1], MONTHS.get(m[2]), m[3])),
+    # March 12, 1980
+    (re.compile(r"([a-z]+) (\d{1,2})(?:st|nd|rd|th)?,? (\d{4})"), lambda m: _date(m[2], MONTHS.get(m[1]), m[3])),
+]
+
+
+def parse_date(text, search=False):
+    """yyyymmdd for a full date (day-first when numeric), else None. search=True finds one inside free text."""
+    text = clean(text)
+    if not search:
+        text = SUBJECT.sub("", text)
+    found = set()
+    for pattern, convert in DATE_PATTERNS:
+        if search:
+            found.update(filter(None, (convert(m) for m in pattern.finditer(text))))
+        else:
+            match = pattern.fullmatch(text)
+            if match and convert(match):
+                return convert(match)
+    # Inside free text only an unambiguous single date counts
+    return found.pop() if len(found) == 1 else None
+
+
+def parse_sex(text):
+    """'1' / '2' for a bare sex answer, else None."""
+    text = SUBJECT.sub("", clean(text))
+    return "1" if text in MALE else "2" if text in FEMALE else None
+
+
+def parse_vital_status(text, question=""):
+    """is_dead (0 alive / 1 dead) for a living-status answer; a bare yes / no is read against the question."""
+    text = clean(text)
+    stripped = SUBJECT.sub("", text)
+    if text in ALIVE or stripped in ALIVE:
+        return 0
+    if text in DEAD or stripped in DEAD:
+        return 1
+    answer = parse_confirmation(text)
+    if answer is None:
+        return None
+    asks_dead = bool(re.search(r"\b(passed away|passed|deceased|died|dead)\b", question.lower()))
+    asks_alive = bool(re.search(r"\b(alive|living)\b", question.lower()))
+    if asks_dead == asks_alive:
+        return None  # "still alive, or has he passed away?": a bare yes / no is left to the model
+    return int(answer) if asks_dead else int(not answer)
+
+
+def parse_no_conditions(text):
+    """True when the answer says there are no medical conditions."""
+    return clean(text).replace(",", "") in NO_CONDITIONS or clean(text) in NO_CONDITIONS
+
+
+def parse_name(text):
+    """(first, last) for a reply that is just a name ('Bob', 'Bob Lee', 'bob van dyke'), else None."""
+    text = str(text or "").strip().strip(".!")
+    if not re.fullmatch(r"[A-Za-z][A-Za-z'\-]*(?: [A-Za-z][A-Za-z'\-]*){0,2}", text):
+        return None
+    words = text.split()
+    if clean(text) in YES | NO | MALE | FEMALE | ALIVE | DEAD | NO_CONDITIONS:
+        return None
+    if any(word.lower() in NOT_NAME_WORDS for word in words):
+        return None
+    return words[0].capitalize(), " ".join(w.capitalize() for w in words[1:]) or None
+
+
+# ================ SLOT STATE ================
+def new_slots(relation):
+    """Empty slot state for one person; sex is implied by gendered relations, self is alive."""
+    relation = relation.replace(" ", "_")
+    state = {"relation": relation, "pending": None, "question": "", "summary_local": False, "acks": 0,
+             "free_text": False, "filled": False}
+    state.update({slot: None for slot in SLOTS})
+    state["sex"] = next((s for r, s in RELATION_SEX.items() if relation.startswith(r)), None)
+    if relation == "self":
+        state["is_dead"] = 0
+    return state
+
+
+def asked_slot(assistant_text):
+    """The slot the assistant's last question is about, or None (no question or several slots)."""
+    questions = [q for q in re.split(r"(?<=[?.!])\s+|\n", str(assistant_text or "")) if q.strip().endswith("?")]
+    if not questions:
+        return None
+    question = questions[-1].lower()
+    if QUESTION_SLOTS["confirm"].search(question):
+        return "confirm"
+    found = [slot for slot, pattern in QUESTION_SLOTS.items() if slot != "confirm" and pattern.search(question)]
+    if "last_name" in found:
+        found.remove("name")
+    return found[0] if len(found) == 1 else None
+
+
+def observe_assistant(state, text, local=False):
+    """Record what a (model or template) assistant turn asks for."""
+    state["pending"] = asked_slot(text)
+    name = SAVED_NAME.search(str(text or ""))
+    if name and not local:
+        state["first_name"], state["last_name"] = name.group(1), name.group(2).strip()
+    state["question"] = str(text or "")
+    state["summary_local"] = local and state["pending"] == "confirm"
+
+
+def observe_user(state, text):
+    """
+    Record a message that goes to the model. Free text may mention conditions only the model
+    has seen, so from then on the conditions slot (and the summary) is left to the model.
+    Unambiguous facts are still picked out (currently a single full date).
+    """
+    if not state["filled"]:
+        state["free_text"] = True
+    state["filled"] = False
+    if state["birthday"] is None:
+        state["birthday"] = parse_date(text, search=True)
+
+
+def missing(state):
+    return [slot for slot in SLOTS if state[slot] is None]
+
+
+def _who(state):
+    if state["relation"] == "self":
+        return "you"
+    if state["first_name"]:
+        return state["first_name"]
+    return "your " + re.sub(r"_\d+$", "", state["relation"]).replace("_", " ")
+
+
+def summary(state):
+    """The summary box (same content the model is asked to show), ending with the confirmation question."""
+    lines = [f"Here's what I have for {'you' if state['relation'] == 'self' else _who(state)}:",
+             f"- **Name:** {state['first_name']} {state['last_name']}",
+             f"- **Date of birth:** {datetime.strptime(str(state['birthday']), '%Y%m%d').strftime('%d/%m/%Y')}",
+             f"- **Sex:** {'Male' if state['sex'] == '1' else 'Female'}"]
+    if state["relation"] != "self":
+        lines.append(f"- **Living status:** {'Deceased' if state['is_dead'] else 'Alive'}")
+    lines.append(f"- **Medical conditions:** {', '.join(state['conditions']) or 'None'}")
+    return "\n".join(lines) + "\n\nIs everything correct?"
+
+
+def tool_args(state):
+    """store_patient_info arguments from a complete slot state."""
+    return {slot: state[slot] for slot in SLOTS} | {"relation": state["relation"]}
+
+
+def _fill(state, text):
+    """Fill the pending slot when the whole message answers it. Returns True on success."""
+    pending = state["pending"]
+    if pending == "birthday":
+        value = parse_date(text)
+    elif pending == "sex":
+        value = parse_sex(text)
+    elif pending == "is_dead":
+        value = parse_vital_status(text, state["question"])
+    elif pending == "conditions":
+        # "No" to "any other conditions?" keeps the ones the model heard, which are not in the slots
+        follow_up = re.search(r"\b(other|else|more|additional|further)\b", state["question"].lower())
+        value = [] if parse_no_conditions(text) and not follow_up else None
+    elif pending in ("name", "last_name"):
+        name = parse_name(text)
+        if name is None:
+            return False
+        if pending == "last_name" and state["first_name"]:
+            state["last_name"] = " ".join(w.capitalize() for w in text.split())
+        else:
+            state["first_name"], state["last_name"] = name[0], name[1] or state["last_name"]
+        return True
+    else:
+        return False
+    if value is None:
+        return False
+    state[pending] = value
+    return True
+
+
+def local_turn(state, text):
+    """
+    Serve a user message locally when it is trivial: {"reply": template text or None,
+    "finalize": store_patient_info args or None}. None means the model should handle it.
+    """
+    if state["pending"] == "confirm":
+        # Only a summary shown by the templates can be confirmed here: the model's may hold more
+        if state["summary_local"] and parse_confirmation(text) is True and not missing(state):
+            return {"reply": None, "finalize": tool_args(state)}
+        return None
+    if not _fill(state, text):
+        return None
+    state["filled"] = True
+
+    gaps = missing(state)
+    questions = SELF_QUESTIONS if state["relation"] == "self" else QUESTIONS
+    askable = [s for s in ASK_ORDER if s in gaps and s in questions and not (s == "last_name" and "first_name" in gaps)]
+    slot = askable[0] if askable else None
+    if gaps and (slot is None or (slot == "conditions" and state["free_text"])):
+        return None  # names are asked naturally by the model; conditions may already have been mentioned to it
+    ack = ACKS[state["acks"] % len(ACKS)]
+    state["acks"] += 1
+    if not gaps:
+        reply = f"{ack} {summary(state)}"
+    else:
+        reply = f"{ack} {questions[slot].format(who=_who(state), first=state['first_name'])}"
+    observe_assistant(state, reply, local=True)
+    return {"reply": reply, "finalize": None}
+
+
+def count_turn(counts, local):
+    """Per-session tally of turns served locally vs by the model."""
+    counts["local" if local else "llm"] = counts.get("local" if local else "llm", 0) + 1
+    return counts
@@ -0,0 +1,41 @@
+"""
+Cold-start helpers shared by the CLI and the Streamlit app.
+
+Heavy clients (OpenAI, the OLS HTTP session) are created on first use by
+their callers; this module only opens their pooled connections in the
+background so the first real request skips DNS + TLS setup.
+
+Set ROOTS_PREWARM=0 to disable pre-warming (e.g. offline runs).
+"""
+import os
+import threading
+
+PREWARM_ENABLED = os.getenv("ROOTS_PREWARM", "1") != "0"
+
+OLS_BASE_URL = "https://www.ebi.ac.uk/ols4/api"
+
+
+def _warm(http_client, url):
+    try:
+        # Any response (even 404) leaves a live keep-alive connection in the pool
+        http_client.head(url, timeout=5)
+    except Exception:
+        pass
+
+
+def prewarm_connections(targets):
+    """
+    Open connections for [(http_client, url), ...] on a daemon thread.
+    http_client is anything with .head(url, timeout=...) (requests.Session, httpx.Client).
+    Returns the thread (or None when disabled).
+    """
+    if not PREWARM_ENABLED or not targets:
+        return None
+
+    def run():
+        for http_client, url in targets:
+            _warm(http_client, url)
+
+    thread = threading.Thread(target=run, name="roots-prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,235 @@
+"""
+Per-stage strict tool schemas, a precompiled validator and deterministic repair.
+
+A store_patient_info call with the wrong relation ("sister" while interviewing
+sibling_2, "Father"), a birthday as "1990-01-01" or sex as "female" used to cost
+a whole turn: the CLI asked the user to repeat themselves and Streamlit dropped
+the call. Now:
+
+    - stage_tools(relation) compiles the tools for the relative being interviewed
+      in strict mode: store_patient_info's relation is an enum of that one label,
+      birthdays are yyyymmdd integers from 1900, sex is "1" / "2",
+      is_dead 0 / 1 and conditions an array (store_relatives_info allows every
+      interview label, with nullable details); a birthday in the future is checked at
+      call time, since the schemas are cached for the life of the process
+    - every tool call is checked locally by a validator compiled once per stage
+      (no schema library needed)
+    - what can be fixed without guessing is repaired (relation label of the same
+      kind, date strings, sex / living-status words, a condition string)
+
+schema_stats counts turns whose call was valid, recovered by a repair, or wasted.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+
+from backend.slot_filling import parse_date, parse_sex, parse_vital_status
+from tools import MULTIPLE_RELATIONS, RELATION_ORDER, RELATION_SYNONYMS, relation_base
+
+MIN_BIRTHDAY = 19000101
+MAX_NUMBERED = 12  # sibling_1 .. sibling_12 / child_1 .. child_12 in the batch enum
+PERSON_FIELDS = ["relation", "first_name", "last_name", "birthday", "sex", "is_dead", "conditions"]
+
+schema_stats = {"valid": 0, "recovered": 0, "wasted": 0}
+
+
+# ================ SCHEMAS ================
+def batch_labels():
+    """Every relation label the batch tool accepts: stages, numbered siblings / children and everyday words."""
+    labels = [r for r in RELATION_ORDER if r not in MULTIPLE_RELATIONS]
+    for base in MULTIPLE_RELATIONS:
+        labels += [f"{base}_{i}" for i in range(1, MAX_NUMBERED + 1)]
+    return labels + [word for word in RELATION_SYNONYMS if word not in labels]
+
+
+def person_parameters(relations, nullable=False):
+    """Strict JSON schema of one person; `nullable` lets the batch tool leave unknown details empty."""
+    def typed(kind):
+        return [kind, "null"] if nullable else kind
+
+    return {
+        "type": "object",
+        "properties": {
+            "relation": {"type": "string", "enum": list(relations)},
+            "first_name": {"type": typed("string")},
+            "last_name": {"type": typed("string")},
+            "birthday": {"type": typed("integer"), "minimum": MIN_BIRTHDAY,
+                         "description": "Date of birth as yyyymmdd, e.g. 19900131."},
+            "sex": {"type": typed("string"), "enum": ["1", "2"] + ([None] if nullable else []),
+                    "description": "1 for male, 2 for female."},
+            "is_dead": {"type": typed("integer"), "enum": [0, 1] + ([None] if nullable else []),
+                        "description": "0 for alive, 1 for dead."},
+            "conditions": {"type": "array", "items": {"type": "string"},
+                           "description": "Medical conditions or known diagnoses (empty when none)."},
+        },
+        "required": PERSON_FIELDS,
+        "additionalProperties": False,
+    }
+
+
+@lru_cache(maxsize=None)
+def stage_tools(relation):
+    """[store_patient_info, store_relatives_info] compiled for interviewing `relation` (cached, do not mutate)."""
+    relation = relation.replace(" ", "_")
+    person_tool = {
+        "type": "function",
+        "function": {
+            "name": "store_patient_info",
+            "description": f"Store the {relation.replace('_', ' ')} once every detail is collected and confirmed",
+            "strict": True,
+            "parameters": person_parameters([relation]),
+        },
+    }
+    relatives = {
+        "type": "function",
+        "function": {
+            "name": "store_relatives_info",
+            "description": "Store several family members at once when the user describes more than one "
+                           "relative in a message (e.g. 'my sisters Ann, 1980, and Beth, 1983')",
+            "strict": True,
+            "parameters": {
+                "type": "object",
+                "properties": {"relatives": {"type": "array",
+                                             "items": person_parameters(batch_labels(), nullable=True),
+                                             "description": "One entry per relative, each with its own relation label"}},
+                "required": ["relatives"],
+                "additionalProperties": False,
+            },
+        },
+    }
+    return [person_tool, relatives]
+
+
+# ================ VALIDATION ================
+TYPES = {"string": str, "integer": int, "array": list, "object": dict, "null": type(None)}
+
+
+def compile_validator(schema):
+    """A function args -> list of error strings for an object schema, with every check built up front."""
+    checks = []
+    for name, spec in schema["properties"].items():
+        kinds = spec["type"] if isinstance(spec["type"], list) else [spec["type"]]
+        py_types = tuple(TYPES[k] for k in kinds)
+        enum = spec.get("enum")
+        low, high = spec.get("minimum"), spec.get("maximum")
+        item_type = TYPES[spec["items"]["type"]] if "items" in spec else None
+
+        def check(args, name=name, py_types=py_types, enum=enum, low=low, high=high, item_type=item_type):
+            value = args.get(name)
+            if name not in args:
+                return f"{name} is missing"
+            if not isinstance(value, py_types) or (isinstance(value, bool) and bool not in py_types):
+                return f"{name} has the wrong type"
+            if enum is not None and value not in enum:
+                return f"{name} must be one of {enum}"
+            if value is not None and ((low is not None and value < low) or (high is not None and value > high)):
+                return f"{name} is out of range"
+            if item_type is not None and not all(isinstance(v, item_type) for v in value):
+                return f"{name} has items of the wrong type"
+            return None
+        checks.append(check)
+    allowed = set(schema["properties"])
+
+    def validate(args):
+        errors = [error for error in (check(args) for check in checks) if error]
+        birthday = args.get("birthday")
+        if isinstance(birthday, int) and birthday > int(datetime.today().strftime("%Y%m%d")):
+            errors.append("birthday is in the future")
+        errors += [f"{name} is not allowed" for name in args if name not in allowed]
+        return errors
+    return validate
+
+
+@lru_cache(maxsize=None)
+def stage_validators(relation):
+    """(current person validator, batch entry validator) for a stage, compiled once."""
+    person_tool, relatives = stage_tools(relation)
+    return (compile_validator(person_tool["function"]["parameters"]),
+            compile_validator(relatives["function"]["parameters"]["properties"]["relatives"]["items"]))
+
+
+# ================ REPAIR ================
+def repair(args, relation=None):
+    """A copy of a person's arguments with deterministic fixes, and the names of the fields changed."""
+    fixed, changed = dict(args), []
+
+    label = str(fixed.get("relation") or "")
+    if relation and label != relation:
+        base = relation_base(label)[0]
+        # Same kind of relative (or no usable label): it is the person being interviewed
+        if not label or base == relation_base(relation)[0] or base not in RELATION_ORDER:
+            fixed["relation"] = relation
+            changed.append("relation")
+
+    birthday = fixed.get("birthday")
+    if not (isinstance(birthday, int) and MIN_BIRTHDAY <= birthday):
+        parsed = parse_date(str(birthday)) if birthday not in (None, "") else None
+        if parsed:
+            fixed["birthday"] = parsed
+            changed.append("birthday")
+
+    sex = fixed.get("sex")
+    if sex not in ("1", "2") and sex is not None:
+        value = {1: "1", 2: "2"}.get(sex) if isinstance(sex, int) else parse_sex(str(sex))
+        if value:
+            fixed["sex"] = value
+            changed.append("sex")
+
+    is_dead = fixed.get("is_dead")
+    if is_dead not in (0, 1) or isinstance(is_dead, bool):
+        value = None
+        if isinstance(is_dead, bool):
+            value = int(is_dead)
+        elif isinstance(is_dead, str):
+            text = is_dead.strip().lower()
+            # "yes" / "true" answer "is dead?", unlike a yes to "is he alive?" in backend/slot_filling.py
+            value = {"0": 0, "1": 1, "true": 1, "false": 0, "yes": 1, "no": 0}.get(text, parse_vital_status(text))
+        if value is not None:
+            fixed["is_dead"] = value
+            changed.append("is_dead")
+
+    conditions = fixed.get("conditions")
+    if not isinstance(conditions, list):
+        fixed["conditions"] = ([c.strip() for c in re.split(r"[,;]", conditions) if c.strip()]
+                               if isinstance(conditions, str) and conditions.strip().lower() not in ("", "none")
+                               else [])
+        changed.append("conditions")
+    elif not all(isinstance(c, str) for c in conditions):
+        fixed["conditions"] = [str(c) for c in conditions if c is not None]
+        changed.append("conditions")
+
+    for name in ("first_name", "last_name"):
+        if isinstance(fixed.get(name), str) and fixed[name] != fixed[name].strip():
+            fixed[name] = fixed[name].strip()
+            changed.append(name)
+    return fixed, changed
+
+
+def check_people(people, relation):
+    """
+    Validate and repair the people of a reply's tool calls for the stage `relation`. A lone person
+    is taken to be the one being interviewed (their relation label may be repaired); batch entries
+    keep their labels. Returns (people, {"repaired": n, "invalid": n}) for the current relation.
+    """
+    person_valid, batch_valid = stage_validators(relation)
+    report = {"repaired": 0, "invalid": 0}
+    checked = []
+    for args in people:
+        fixed, changed = repair(args, relation if len(people) == 1 else None)
+        current = fixed.get("relation") == relation
+        errors = (person_valid if current else batch_valid)(
+            {k: v for k, v in fixed.items() if k in PERSON_FIELDS})
+        if current:
+            report["repaired"] += bool(changed)
+            report["invalid"] += bool(errors)
+            if errors:
+                print(f"⚠️ {relation} tool call still invalid after repair: {'; '.join(errors)}")
+        checked.append(fixed)
+    return checked, report
+
+
+def record_turn(stored, report):
+    """Count a tool-call turn as valid, recovered (a repair made it usable) or wasted."""
+    outcome = "wasted" if not stored else "recovered" if report["repaired"] else "valid"
+    schema_stats[outcome] += 1
+    return outcome
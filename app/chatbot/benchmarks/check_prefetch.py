@@ -0,0 +1,71 @@
+"""
+Check that a prefetched opening is used on the main interview path (backend/prefetch.py).
+
+Runs the CLI's confirm -> next relative step offline (backend/AIchatbot.py): the
+patient and the father's details are known, the father's summary is on screen (so
+the mother's opening is prefetched), the father is stored (the memory facts now
+name him) and the mother's interview starts. The opening call is replaced by a
+canned reply, so no model is called.
+
+The check fails unless the prefetched opening was taken (used == 1) and no second
+opening was sent. CSV / SVG output goes to a temporary directory, not ../results.
+
+Usage (from app/chatbot/benchmarks):
+    python3 check_prefetch.py
+
+Exits with status 1 when the check fails.
+"""
+import builtins
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [CHATBOT_DIR, os.path.join(CHATBOT_DIR, "backend")]
+
+import AIchatbot as cli
+
+FOCAL_DISEASE, PATIENT_NAME = "breast cancer", "Ann"
+openings = []  # background flag of every opening call
+
+
+def canned_opening(messages, tools, background=False):
+    openings.append(background)
+    message = SimpleNamespace(tool_calls=None, content="What can you tell me about your mother?")
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def person(relation, first_name, sex, birthday):
+    return {"relation": relation, "first_name": first_name, "last_name": "Lee", "birthday": birthday,
+            "sex": sex, "is_dead": 0, "conditions": []}
+
+
+def main():
+    # data_store writes ../results relative to the working directory
+    work = os.path.join(tempfile.mkdtemp(prefix="roots-prefetch-"), "run")
+    os.makedirs(work)
+    os.chdir(work)
+
+    cli.create_opening = canned_opening
+    cli.focal_disease = FOCAL_DISEASE
+    cli.store_people([person("self", PATIENT_NAME, "2", 19900101)], "self")
+
+    # The father's summary is on screen: the mother's opening is prefetched, then he is confirmed
+    cli.prefetch_next("father", PATIENT_NAME)
+    cli.store_people([person("father", "Bob", "1", 19600101)], "father")
+
+    builtins.input = lambda prompt="": "exit"
+    try:
+        cli.interview_person(cli.stage_context("mother", PATIENT_NAME), "mother", PATIENT_NAME)
+    except SystemExit:
+        pass
+
+    stats = cli.prefetcher.stats
+    ok = stats["used"] == 1 and openings == [True]
+    print(f"{'✅' if ok else '❌'} confirm -> next relative: {stats}, opening calls {len(openings)}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Fixture checks for stage-scoped interview prompts (backend/prompts.py).
+
+Offline (default), for every stage and every turn of a typical interview:
+
+    - the rules extraction depends on are always sent (tool calling rule, current
+      focus, summary box, focal disease, several relatives at once)
+    - each field's instructions are sent exactly while that field is missing
+    - storage formats of dropped fields are still fixed by the stage's strict tool
+      schema (backend/tool_schema.py)
+    - the scoped prompt is never larger than the unscoped one
+
+With --live, the provider-comparison cases (compare_providers.py) are also sent to
+the fast model with the unscoped prompt and with the prompt the app would send at
+that turn, and their extraction scores must match within TOLERANCE.
+
+Usage (from app/chatbot/benchmarks):
+    python3 check_prompt_fixtures.py               # offline checks
+    python3 check_prompt_fixtures.py --live 3      # plus 3 model runs per case and prompt
+
+Exits with status 1 when a check fails.
+"""
+import os
+import sys
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [CHATBOT_DIR, os.path.join(CHATBOT_DIR, "backend")]
+
+from prompts import FIELD_FRAGMENTS, SLOT_TAGS, compile_interview_prompt, unscoped_tags
+from backend.tool_schema import stage_tools
+from prompt_tokens import FOCAL_DISEASE, PATIENT_AGE, PATIENT_NAME, STAGES, stage_turns
+
+TOLERANCE = 0.1
+REQUIRED = ["**Tool Calling Rule", "Your current focus is on the {clean}.", "**Summary box:**",
+            "'{focal}'", "`store_relatives_info`", "You are interviewing the patient"]
+
+# compare_providers case -> slots still missing when its last user message is answered
+LIVE_MISSING = {"self_confirmed": [], "father_deceased": [],
+                "sibling_missing_birthday": ["first_name", "last_name", "birthday", "sex", "is_dead", "conditions"]}
+
+
+def field_sent(prompt, tag):
+    """Whether the "Information collected" line for slot group `tag` is in the prompt."""
+    text = next(text for needs, text in FIELD_FRAGMENTS if tag in needs)
+    return text in prompt
+
+
+def check_turn(relation, missing_slots):
+    """Failures (strings) for one compiled prompt."""
+    age = None if relation == "self" else PATIENT_AGE
+    prompt = compile_interview_prompt(relation, PATIENT_NAME, FOCAL_DISEASE, age, missing_slots)
+    unscoped = compile_interview_prompt(relation, PATIENT_NAME, FOCAL_DISEASE, age, tags=unscoped_tags(relation, age))
+    failures = []
+    for rule in REQUIRED:
+        rule = rule.format(clean=relation.replace("_", " "), focal=FOCAL_DISEASE)
+        if rule not in prompt:
+            failures.append(f"missing rule {rule!r}")
+    for tag, slots in SLOT_TAGS.items():
+        if tag == "is_dead" and relation == "self":
+            continue
+        expected = missing_slots is None or any(slot in missing_slots for slot in slots)
+        if field_sent(prompt, tag) != expected:
+            failures.append(f"{tag} instructions {'missing' if expected else 'sent'}")
+    if len(prompt) > len(unscoped):
+        failures.append(f"larger than unscoped ({len(prompt)} > {len(unscoped)} chars)")
+    return failures
+
+
+def check_schema(relation):
+    """The stage's tool schema still fixes the formats the dropped field instructions described."""
+    properties = stage_tools(relation)[0]["function"]["parameters"]["properties"]
+    failures = []
+    if "yyyymmdd" not in properties["birthday"].get("description", ""):
+        failures.append("birthday format not in the tool schema")
+    if properties["sex"].get("enum") != ["1", "2"]:
+        failures.append("sex codes not in the tool schema")
+    if properties["is_dead"].get("enum") != [0, 1]:
+        failures.append("living-status codes not in the tool schema")
+    return failures
+
+
+def offline():
+    failed = 0
+    for relation in STAGES:
+        for missing_slots in stage_turns(relation):
+            failures = check_turn(relation, missing_slots)
+            label = "opening" if missing_slots is None else f"missing {missing_slots}"
+            for failure in failures:
+                print(f"❌ {relation} ({label}): {failure}")
+            failed += bool(failures)
+        for failure in check_schema(relation):
+            print(f"❌ {relation} tool schema: {failure}")
+            failed += 1
+    return failed
+
+
+def live(runs):
+    """Extraction scores of the compare_providers cases, unscoped vs scoped prompt."""
+    from compare_providers import CASES, score
+    from backend.llm_provider import make_client, provider_config
+
+    client, model = make_client(os.getenv("API_KEY")), provider_config()["fast_model"]
+    failed = 0
+    for name, (relation, turns, expected) in CASES.items():
+        age = None if relation == "self" else PATIENT_AGE
+        prompts = {
+            "unscoped": compile_interview_prompt(relation, PATIENT_NAME, FOCAL_DISEASE, age,
+                                                 tags=unscoped_tags(relation, age)),
+            "scoped": compile_interview_prompt(relation, PATIENT_NAME, FOCAL_DISEASE, age, LIVE_MISSING[name]),
+        }
+        scores = {}
+        for kind, prompt in prompts.items():
+            messages = [{"role": "system", "content": prompt}] + turns
+            results = []
+            for _ in range(runs):
+                response = client.chat.completions.create(model=model, messages=messages, tools=stage_tools(relation),
+                                                          tool_choice="auto", timeout=60)
+                results.append(score(response.choices[0].message, expected))
+            scores[kind] = sum(results) / len(results)
+        ok = scores["scoped"] >= scores["unscoped"] - TOLERANCE
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {name}: unscoped {scores['unscoped']:.2f}, scoped {scores['scoped']:.2f}")
+    return failed
+
+
+def main():
+    args = sys.argv[1:]
+    failed = offline()
+    print(f"{'✅' if not failed else '❌'} offline prompt fixtures: {failed} failing")
+    if args and args[0] == "--live":
+        from dotenv import load_dotenv
+        load_dotenv()
+        failed += live(int(args[1]) if len(args) > 1 else 3)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
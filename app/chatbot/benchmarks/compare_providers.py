@@ -0,0 +1,127 @@
+"""
+Latency and extraction-quality comparison of chat-completions providers.
+
+Replays a fixed set of interview turns (below) against each provider's fast and
+strong model (backend/llm_provider.py) and scores every reply:
+
+    - a turn that should end the interview must call the tool with the expected
+      fields; the score is the share of expected fields that match
+    - a turn with missing details must be answered with a question (score 1 / 0)
+
+Latency is the wall time of each call. One JSON line per provider and model is
+appended to ../results/provider_comparison.jsonl.
+
+Usage (from app/chatbot/benchmarks):
+    python3 compare_providers.py                    # openai, 3 runs per case
+    python3 compare_providers.py openai local 5     # both providers, 5 runs per case
+
+The local provider reads ROOTS_LLM_BASE_URL / ROOTS_LLM_*_MODEL like the app does
+(set ROOTS_LLM_PROVIDER=local for those overrides to apply to it).
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [CHATBOT_DIR, os.path.join(CHATBOT_DIR, "backend")]
+RESULTS_FILE = os.path.join(CHATBOT_DIR, "results", "provider_comparison.jsonl")
+
+from prompts import compile_interview_prompt
+from tools import tool_call_people
+from backend.llm_provider import make_client, provider_config
+from backend.tool_schema import stage_tools
+
+FOCAL_DISEASE = "breast cancer"
+
+# name -> (relation, conversation after the system prompt, expected person or None when a question is expected)
+CASES = {
+    "self_confirmed": ("self", [
+        {"role": "user", "content": "I'm Ann Lee, born 1 January 1990, female, no medical conditions."},
+        {"role": "assistant", "content": "Thanks Ann! Summary: Ann Lee, born 01/01/1990, female, no conditions. "
+                                         "Is everything correct?"},
+        {"role": "user", "content": "yes"},
+    ], {"relation": "self", "first_name": "Ann", "last_name": "Lee", "birthday": 19900101, "sex": "2", "is_dead": 0}),
+    "father_deceased": ("father", [
+        {"role": "user", "content": "My dad was Bob Lee, born 3 March 1955. He passed away in 2019 and had breast cancer."},
+        {"role": "assistant", "content": "I'm sorry to hear that. Summary: Bob Lee, born 03/03/1955, male, deceased, "
+                                         "breast cancer. Is everything correct?"},
+        {"role": "user", "content": "yes that's right"},
+    ], {"relation": "father", "first_name": "Bob", "last_name": "Lee", "birthday": 19550303, "sex": "1", "is_dead": 1}),
+    "sibling_missing_birthday": ("sibling_1", [
+        {"role": "user", "content": "My sister is Cat Lee, she's alive and healthy."},
+    ], None),
+}
+
+
+def system_prompt(relation):
+    return compile_interview_prompt(relation, "Ann Lee", FOCAL_DISEASE, None if relation == "self" else 35)
+
+
+def score(reply, expected):
+    """Share of expected fields matched by the tool call (or 1 / 0 for an expected question)."""
+    people = tool_call_people(reply.tool_calls)
+    if expected is None:
+        return float(not people and "?" in (reply.content or ""))
+    person = next((p for p in people if p.get("first_name") == expected["first_name"]), people[0] if people else {})
+    return sum(str(person.get(k)) == str(v) for k, v in expected.items()) / len(expected)
+
+
+def benchmark(provider, model, runs):
+    client = make_client(os.getenv("API_KEY"), name=provider)
+    latencies, scores, errors = [], {}, 0
+    for name, (relation, turns, expected) in CASES.items():
+        messages = [{"role": "system", "content": system_prompt(relation)}] + turns
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                response = client.chat.completions.create(model=model, messages=messages, tools=stage_tools(relation),
+                                                          tool_choice="auto", timeout=60)
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ {provider}/{model} {name}: {type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - start)
+            scores.setdefault(name, []).append(score(response.choices[0].message, expected))
+
+    latencies.sort()
+    case_scores = {name: round(sum(s) / len(s), 3) for name, s in scores.items()}
+    return {
+        "provider": provider,
+        "model": model,
+        "runs": runs,
+        "errors": errors,
+        "latency_s_median": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "latency_s_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+        "quality": round(sum(case_scores.values()) / len(case_scores), 3) if case_scores else None,
+        "quality_by_case": case_scores,
+    }
+
+
+def main():
+    args = sys.argv[1:]
+    runs = int(args.pop()) if args and args[-1].isdigit() else 3
+    providers = args or ["openai"]
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+
+    stamp = datetime.now().isoformat(timespec="seconds")
+    with open(RESULTS_FILE, "a") as f:
+        for provider in providers:
+            config = provider_config(provider)
+            for model in dict.fromkeys([config["fast_model"], config["strong_model"]]):
+                record = benchmark(provider, model, runs)
+                record["tool_mode"] = config["tool_mode"]
+                record["timestamp"] = stamp
+                f.write(json.dumps(record) + "\n")
+                latency = (f"{record['latency_s_median']:.2f}s median, {record['latency_s_p95']:.2f}s p95"
+                           if record["latency_s_median"] is not None else "no successful calls")
+                print(f"⏱️ {provider}/{model}: {latency}, quality {record['quality']}, {record['errors']} errors")
+                for name, value in record["quality_by_case"].items():
+                    print(f"    {value:>5.2f}  {name}")
+
+    print(f"\nResults appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
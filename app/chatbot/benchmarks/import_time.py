@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark for the app's entry points.
+
+Runs each entry point's import in a fresh interpreter with `python -X importtime`,
+parses the per-module timings from stderr and appends one JSON line per run to
+../results/import_times.jsonl so cold-start time can be tracked over time.
+
+Usage (from app/chatbot/benchmarks):
+    python3 import_time.py            # 5 runs per entry point
+    python3 import_time.py 10         # 10 runs per entry point
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_FILE = os.path.join(CHATBOT_DIR, "results", "import_times.jsonl")
+
+# name -> (working directory, statement executed in the fresh interpreter)
+ENTRY_POINTS = {
+    "cli": (os.path.join(CHATBOT_DIR, "backend"), "import AIchatbot"),
+    # Runs the Streamlit script in bare mode (top-level code only, no server)
+    "streamlit": (os.path.join(CHATBOT_DIR, "frontend"), "import root_app"),
+}
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from `-X importtime` output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|")
+            timings[module.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return timings
+
+
+def run_once(cwd, statement):
+    env = dict(os.environ, ROOTS_PREWARM="0", PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    timings = parse_importtime(proc.stderr)
+    return wall, timings, proc.returncode
+
+
+def benchmark(name, runs):
+    cwd, statement = ENTRY_POINTS[name]
+    walls, imports, heaviest = [], [], {}
+    for _ in range(runs):
+        wall, timings, returncode = run_once(cwd, statement)
+        if returncode != 0:
+            print(f"⚠️ {name}: '{statement}' exited with {returncode}")
+        walls.append(wall)
+        imports.append(sum(self_us for self_us, _ in timings.values()) / 1e6)
+        for module, (_, cumulative_us) in timings.items():
+            heaviest[module] = max(heaviest.get(module, 0), cumulative_us)
+
+    walls.sort()
+    imports.sort()
+    top = sorted(heaviest.items(), key=lambda kv: kv[1], reverse=True)[:10]
+    return {
+        "entry_point": name,
+        "runs": runs,
+        "wall_s_median": round(walls[len(walls) // 2], 4),
+        "import_s_median": round(imports[len(imports) // 2], 4),
+        "heaviest_modules_ms": {m: round(us / 1000, 1) for m, us in top},
+    }
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+
+    previous = {}
+    if os.path.exists(RESULTS_FILE):
+        with open(RESULTS_FILE) as f:
+            for line in f:
+                record = json.loads(line)
+                previous[record["entry_point"]] = record
+
+    stamp = datetime.now().isoformat(timespec="seconds")
+    with open(RESULTS_FILE, "a") as f:
+        for name in ENTRY_POINTS:
+            record = benchmark(name, runs)
+            record["timestamp"] = stamp
+            f.write(json.dumps(record) + "\n")
+
+            delta = ""
+            if name in previous:
+                change = record["wall_s_median"] - previous[name]["wall_s_median"]
+                delta = f" ({change:+.3f}s vs {previous[name]['timestamp']})"
+            print(f"⏱️ {name}: {record['wall_s_median']:.3f}s wall, "
+                  f"{record['import_s_median']:.3f}s in imports{delta}")
+            for module, ms in record["heaviest_modules_ms"].items():
+                print(f"    {ms:>8.1f} ms  {module}")
+
+    print(f"\nResults appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
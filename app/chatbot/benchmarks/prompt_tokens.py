@@ -0,0 +1,85 @@
+"""
+System-prompt size per interview stage, with and without fragment selection.
+
+For every stage, compiles the interview instructions (backend/prompts.py) the way
+the app does over a typical interview - the opening, then as the name, birthday,
+living status and conditions are filled in, up to the confirmation turn - and
+compares them with the unscoped prompt (every fragment), which is what each turn
+used to send. Memory facts and the focal-disease pattern hint are left out: they
+are the same either way.
+
+Tokens are counted with tiktoken when it is installed, otherwise estimated at
+about 4 characters per token. One JSON line per run is appended to
+../results/prompt_tokens.jsonl.
+
+Usage (from app/chatbot/benchmarks):
+    python3 prompt_tokens.py
+"""
+import json
+import os
+import sys
+from datetime import datetime
+
+CHATBOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [CHATBOT_DIR, os.path.join(CHATBOT_DIR, "backend")]
+RESULTS_FILE = os.path.join(CHATBOT_DIR, "results", "prompt_tokens.jsonl")
+
+from prompts import compile_interview_prompt, unscoped_tags
+from backend.slot_filling import missing, new_slots
+
+STAGES = ["self", "father", "mother", "sibling_1", "partner", "child_1", "paternal_grandfather"]
+FILL_ORDER = [("first_name", "last_name"), ("birthday",), ("sex",), ("is_dead",), ("conditions",)]
+PATIENT_NAME, FOCAL_DISEASE, PATIENT_AGE = "Ann Lee", "breast cancer", 35
+
+
+def counter():
+    """(name, function text -> tokens)."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return "tiktoken o200k_base", lambda text: len(encoding.encode(text))
+    except ImportError:
+        return "estimate (chars / 4)", lambda text: len(text) // 4
+
+
+def stage_turns(relation):
+    """The missing-slot lists of a typical interview's turns: opening (None), then slot by slot."""
+    slots = new_slots(relation)
+    turns = [None]
+    for group in FILL_ORDER:
+        if any(slots[slot] is None for slot in group):
+            turns.append(missing(slots))
+            slots.update({slot: "x" for slot in group})
+    return turns + [missing(slots)]
+
+
+def measure(relation, count):
+    age = None if relation == "self" else PATIENT_AGE
+    unscoped = count(compile_interview_prompt(relation, PATIENT_NAME, FOCAL_DISEASE, age,
+                                              tags=unscoped_tags(relation, age)))
+    turns = [count(compile_interview_prompt(relation, PATIENT_NAME, FOCAL_DISEASE, age, slots))
+             for slots in stage_turns(relation)]
+    return {"unscoped": unscoped, "opening": turns[0], "confirm": turns[-1],
+            "mean_turn": round(sum(turns) / len(turns), 1),
+            "saved_pct": round(100 * (1 - sum(turns) / (len(turns) * unscoped)), 1)}
+
+
+def main():
+    method, count = counter()
+    stages = {relation: measure(relation, count) for relation in STAGES}
+
+    print(f"System prompt tokens per turn ({method}):\n")
+    print(f"{'stage':<22}{'unscoped':>10}{'opening':>10}{'confirm':>10}{'mean':>10}{'saved':>9}")
+    for relation, row in stages.items():
+        print(f"{relation:<22}{row['unscoped']:>10}{row['opening']:>10}{row['confirm']:>10}"
+              f"{row['mean_turn']:>10}{row['saved_pct']:>8}%")
+
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, "a") as f:
+        f.write(json.dumps({"timestamp": datetime.now().isoformat(timespec="seconds"), "counter": method,
+                            "stages": stages}) + "\n")
+    print(f"\nResults appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
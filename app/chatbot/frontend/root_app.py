@@ -1,14 +1,29 @@
 import streamlit as st
-from openai import OpenAI
 from datetime import datetime
 import os
+import sys
+import io
 import csv
-import json
-import requests
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import pandas as pd
-import re
+import time
+import uuid
+from streamlit.errors import StreamlitAPIException
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend import data_store
+from backend.mondo_closure import same_or_related
+from backend.llm_calls import ToolCallLedger
+from backend.llm_provider import make_client, provider_config
+from backend.model_router import chat_completion, interview_call_type
+from backend.mondo_xref import code_map_csv, format_xrefs, xrefs_for
+from backend.pedigree_svg import render_pedigree_svg
+from backend.prefetch import Prefetcher, looks_like_confirmation, opening_key
+from backend.prompts import compile_interview_prompt
+from backend.rate_scheduler import http_client, scheduler
+from backend.slot_filling import count_turn, local_turn, missing, new_slots, observe_assistant, observe_user
+from backend.startup import prewarm_connections, OLS_BASE_URL
+from backend.tool_schema import check_people, record_turn, schema_stats, stage_tools
+from tools import assign_relations, is_complete, next_index, next_relation, tool_call_people
 
 #  --- App Configuration & Title ---
 st.set_page_config(
@@ -18,195 +33,56 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for better styling - IMPROVED VERSION
-st.markdown("""
-<style>
-:root {
-    --primary: #59A52C;
-    --secondary: #6fca3a;
-    --dark: #111111;
-    --accent: #437d21;
-    --background: #f7fbfc;
-    --white: #fff;
-    --gray: #2a2a2a;
-}
-
-.main-header {
-    text-align: center;
-    padding: 1.8rem 0;
-    background: linear-gradient(
-        90deg,
-        rgba(89, 165, 44, 0.9) 0%,
-        rgba(67, 125, 33, 0.9) 100%
-    );
-    color: var(--white);
-    border-radius: 14px;
-    margin-bottom: 1.5rem;
-    font-weight: 700;
-    letter-spacing: 0.02em;
-    box-shadow: 0 4px 20px rgba(17, 17, 17, 0.08); 
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    gap: 1.2rem;
-    position: relative;
-}
-
-.chat-container {
-    background-color: #f9f9f9;
-    border-radius: 10px;
-    padding: 1rem;
-    max-height: 500px;
-    overflow-y: auto;
-    margin-bottom: 1rem;
-    box-shadow: 0 2px 6px rgba(0,0,0,0.05);
-}
-
-.user-message {
-    background: linear-gradient(135deg, #e3f2fd, #bbdefb);
-    border-radius: 18px 18px 0 18px;
-    padding: 14px 18px;
-    margin: 12px 0;
-    max-width: 80%;
-    float: right;
-    clear: both;
-    border: 1px solid #90caf9;
-    color: #1565c0;
-    font-weight: 500;
-    box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-}
-
-.assistant-message {
-    background: linear-gradient(135deg, #e8f5e9, #c8e6c9);
-    border-radius: 18px 18px 18px 0;
-    padding: 14px 18px;
-    margin: 12px 0;
-    max-width: 80%;
-    float: left;
-    clear: both;
-    border: 1px solid #a5d6a7;
-    color: var(--dark);
-    box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-}
-
-.genetic-insight {
-    background-color: #fffbe6;
-    border: 1px solid #ece7d3;
-    border-radius: 10px;
-    padding: 1.05rem;
-    margin: 1.2rem 0;
-    color: var(--gray);
-    font-weight: 500;
-}
-
-.progress-container {
-    height: 8px;
-    background-color: #e3ebde;
-    border-radius: 4px;
-    margin: 1.2rem 0;
-    overflow: hidden;
-}
-
-.progress-bar {
-    height: 100%;
-    background: linear-gradient(90deg, var(--primary), var(--secondary));
-    border-radius: 4px;
-    transition: width 0.3s;
-}
-
-.sidebar-section {
-    padding: 1.2rem;
-    background-color: var(--white);
-    border-radius: 12px;
-    margin-bottom: 1.2rem;
-    box-shadow: 0 2px 6px rgba(67, 125, 33, 0.06);
-}
-
-.empty-state {
-    text-align: center;
-    padding: 2.2rem;
-    background-color: var(--background);
-    border: 2px dashed #e3ebde;
-    border-radius: 12px;
-    color: var(--gray);
-}
-
-.status-indicator {
-    display: inline-block;
-    width: 12px;
-    height: 12px;
-    border-radius: 50%;
-    margin-right: 9px;
-}
-
-.status-active {
-    background-color: var(--primary);
-}
-
-.status-inactive {
-    background-color: #d9534f;
-}
-
-.highlight-box {
-    background: linear-gradient(135deg, var(--primary), var(--secondary));
-    color: var(--white);
-    padding: 1rem;
-    border-radius: 12px;
-    margin: 1.2rem 0;
-    font-weight: 500;
-    box-shadow: 0 2px 8px rgba(89,165,44,0.08);
-}
-
-.pedigree-container {
-    background-color: #ffffff;
-    border-radius: 12px;
-    padding: 1.5rem;
-    box-shadow: 0 4px 12px rgba(0,0,0,0.08);
-    margin-top: 1rem;
-    text-align: center;
-}
-
-/* NEW: Fix for pedigree plot display */
-.pedigree-plot {
-    max-width: 100%;
-    height: auto;
-    border-radius: 8px;
-}
-
-/* NEW: Styling for chat input */
-.chat-input-container {
-    position: sticky;
-    bottom: 0;
-    background: white;
-    padding: 1rem 0;
-    z-index: 100;
-}
-
-/* NEW: Styling for action buttons */
-.action-button {
-    margin-top: 0.5rem !important;
-    width: 100% !important;
-}
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for better styling - read once per process, re-injected on every run
+@st.cache_resource
+def load_css():
+    with open(os.path.join(os.path.dirname(__file__), "assets", "style.css")) as f:
+        return f"<style>\n{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # --- Initialization & State Management ---
 
 api_key = st.secrets.get("API_KEY")  # pulls directly from .streamlit/secrets.toml
 
-if not api_key or api_key.strip() == "" or api_key == "your-openai-api-key-here":
+# A local provider (ROOTS_LLM_PROVIDER=local, backend/llm_provider.py) needs no OpenAI key
+if provider_config()["name"] == "openai" and (
+        not api_key or api_key.strip() == "" or api_key == "your-openai-api-key-here"):
     st.error("OpenAI API key is missing or invalid. Please set it in .streamlit/secrets.toml.", icon="🚨")
     st.stop()
 
-client = OpenAI(api_key=api_key)
+# Heavy clients are created lazily, once per server process, and shared by all sessions
+@st.cache_resource
+def get_openai_client():
+    pooled = http_client()  # one keep-alive pool for every session (backend/rate_scheduler.py)
+    client = make_client(api_key, pooled)  # OpenAI or a local server (backend/llm_provider.py)
+    prewarm_connections([(pooled, str(client.base_url))])
+    return client
+
+@st.cache_resource
+def get_mondo_session():
+    import requests
+    session = requests.Session()
+    prewarm_connections([(session, OLS_BASE_URL)])
+    return session
+
+@st.cache_resource
+def warm_up():
+    """Build the shared clients off the script thread so the first real turn skips imports and TLS setup."""
+    import threading
+    thread = threading.Thread(target=lambda: (get_openai_client(), get_mondo_session(), stage_tools("self")),
+                              name="roots-warm-up", daemon=True)
+    thread.start()
+    return thread
 
 def initialize_session_state():
     required_keys = [
-        "people", "person_id_counter", "disease_columns", "disease_column_names",
+        "people", "person_id_counter", "disease_columns", "disease_column_names", "disease_xrefs",
         "focal_disease", "current_relation", "messages", "chat_input_key",
         "action_required", "action_context", "chat_history", "interview_started",
         "backend_state", "mondo_code", "interview_stage", "interview_index",
-        "awaiting_confirmation", "confirmation_type", "patient_name"
+        "awaiting_confirmation", "confirmation_type", "patient_name", "data_version", "pending_relatives",
+        "prefetcher", "slots", "prompt_slots", "turn_counts", "tool_ledger", "session_id"
     ]
     
     defaults = {
@@ -214,6 +90,7 @@ def initialize_session_state():
         "person_id_counter": 1,
         "disease_columns": {},
         "disease_column_names": {},
+        "disease_xrefs": {},
         "focal_disease": None,
         "mondo_code": None,
         "current_relation": None,
@@ -228,6 +105,14 @@ def initialize_session_state():
         "awaiting_confirmation": False,
         "confirmation_type": None,
         "patient_name": None,
+        "data_version": 0,
+        "pending_relatives": [],
+        "prefetcher": Prefetcher(),
+        "slots": None,
+        "prompt_slots": None,
+        "turn_counts": {"local": 0, "llm": 0},
+        "tool_ledger": ToolCallLedger(),
+        "session_id": uuid.uuid4().hex,
         "backend_state": {
             "people": [],
             "conversation_stage": "welcome",
@@ -319,43 +204,14 @@ def edit_person_form(person):
             
             st.session_state.editing_person_id = None
             save_all_to_csv()
+            bump_data_version()
             st.rerun()
         
         if cancel_btn:
             st.session_state.editing_person_id = None
-            st.rerun()
+            rerun_fragment()
 
 # --- Core Functions (Identical to original functionality) ---
-def get_tools():
-    return [
-        {
-            "type": "function",
-            "function": {
-                "name": "store_patient_info",
-                "description": "Extract structured patient or family member data",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "relation": {"type": "string"},
-                        "first_name": {"type": "string"},
-                        "last_name": {"type": "string"},
-                        "birthday": {"type": "integer", "description": "Patient's birthday in YYYYMMDD format."},
-                        "sex": {"type": "string", "enum": ["1", "2"], "description": "1 for male, 2 for female."},
-                        "conditions": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "Medical conditions or known diagnoses."
-                        },
-                        "is_dead": {
-                            "type": "integer", "description": "Whether the person has died. 0 for alive, 1 for dead."
-                        }
-                    },
-                    "required": ["relation", "first_name", "last_name", "birthday", "sex", "is_dead"]
-                }
-            }
-        }
-    ]
-
 def extract_mondo_code(iri):
     if iri and "MONDO_" in iri:
         return iri.split("/")[-1]
@@ -371,7 +227,7 @@ def get_mondo_matches(disease_name, max_results=3):
         "ontology": "mondo"
     }
     
-    response = requests.get(url, params=params)
+    response = get_mondo_session().get(url, params=params)
     if response.status_code != 200:
         st.warning(f"[MONDO API ERROR] Status code: {response.status_code}")
         return []
@@ -453,7 +309,7 @@ def process_medical_conditions(input_text, person_relation=""):
     for condition in conditions[:4]:
         existing_match = None
         for existing_disease in st.session_state.disease_columns.keys():
-            if condition.lower() in existing_disease.lower() or existing_disease.lower() in condition.lower():
+            if same_or_related(condition, existing_disease, st.session_state.disease_columns[existing_disease]):
                 st.session_state.action_required = 'confirm_condition'
                 st.session_state.action_context = {
                     "condition": condition,
@@ -472,6 +328,7 @@ def process_medical_conditions(input_text, person_relation=""):
             if disease_label not in st.session_state.disease_columns:
                 st.session_state.disease_columns[disease_label] = mondo_code
                 st.session_state.disease_column_names[disease_label] = f"{disease_label} ({mondo_code})"
+                st.session_state.disease_xrefs[disease_label] = xrefs_for(mondo_code)
             person_diseases[disease_label] = True
         else:
             st.session_state.action_required = 'select_mondo'
@@ -484,6 +341,38 @@ def process_medical_conditions(input_text, person_relation=""):
     
     return person_diseases
 
+def apply_family_import(people, result):
+    """Replace the session's family with an imported one (backend/family_import.py) in one step."""
+    state = st.session_state.backend_state
+    state['people'] = people
+    st.session_state.people = people
+    st.session_state.person_id_counter = max((p['id'] for p in people), default=0) + 1
+
+    for label, code in result["disease_columns"].items():
+        st.session_state.disease_columns[label] = code
+        st.session_state.disease_column_names[label] = f"{label} ({code})"
+        st.session_state.disease_xrefs[label] = xrefs_for(code)
+
+    session = result["session"]
+    if session.get("focal_disease"):
+        state['focal_disease'] = st.session_state.focal_disease = session["focal_disease"]
+    if session.get("mondo_code"):
+        state['mondo_code'] = st.session_state.mondo_code = session["mondo_code"]
+    if session.get("interview_stage"):
+        state['conversation_stage'] = 'collecting'
+        st.session_state.interview_stage = session["interview_stage"]
+        st.session_state.interview_index = session.get("interview_index", 0)
+
+    self_person = next((p for p in people if p['relation'] == 'self'), None)
+    if self_person:
+        st.session_state.patient_name = f"{self_person['first_name']} {self_person['last_name']}"
+
+    st.toast(f"✅ Loaded {len(people)} family members from CSV")
+    if session.get("interview_stage"):
+        st.toast(f"↩️ Resuming interview at: {session['interview_stage'].replace('_', ' ').title()} stage")
+    bump_data_version()
+    st.rerun()
+
 def save_all_to_csv():
     if not st.session_state.people:
         return
@@ -515,7 +404,8 @@ def save_all_to_csv():
             row["mondo_code"] = st.session_state.mondo_code
             
             writer.writerow(row)
-    st.sidebar.success("✅ Data saved to patients.csv!")
+    # Toast rather than st.sidebar: this also runs inside page fragments
+    st.toast("✅ Data saved to patients.csv!")
 
 def validate_names(tool_args):
     for field in ["first_name", "last_name"]:
@@ -592,6 +482,12 @@ def validate_relative_age(tool_args):
     
     return True
 
+def warn_pedigree_issues(person_id):
+    """Show the whole-family consistency problems that involve a newly added person."""
+    from backend.pedigree_checks import check_pedigree, issues_for
+    for issue in issues_for(check_pedigree(st.session_state.people), person_id):
+        st.warning(f"⚠️ {issue['message']}")
+
 def finalize_person(tool_args):
     relation_label = tool_args.get("relation", "").replace(' ', '_')
     tool_args["relation"] = relation_label
@@ -607,12 +503,15 @@ def finalize_person(tool_args):
         processed_conditions = process_medical_conditions(tool_args["conditions"], relation_label)
         if processed_conditions is None:
             st.session_state.action_context["tool_args"] = tool_args
+            # The user now picks a MONDO match: prepare the next relative's opening meanwhile
+            prefetch_next(relation_label, tool_args)
             return
         tool_args["conditions"] = processed_conditions
     
     normalize_is_dead(tool_args)
     
     if not validate_relative_age(tool_args):
+        prefetch_next(relation_label, tool_args)
         return
     
     tool_args["id"] = st.session_state.person_id_counter
@@ -709,156 +608,146 @@ def finalize_person(tool_args):
                 tool_args["partner_id"] = p["id"]
     
     st.success(f"✅ Extracted info for {tool_args['first_name']} {tool_args['last_name']} ({relation_label})")
+    warn_pedigree_issues(tool_args["id"])
     save_all_to_csv()
     
     # Update backend state
     st.session_state.backend_state['people'] = st.session_state.people
+    bump_data_version()
 
-def start_interview(relation_label, patient_name=None):
-    relation_label = relation_label.replace(' ', '_')
-    st.session_state.current_relation = relation_label
-    st.session_state.messages = []
-    
-    self_data = next((p for p in st.session_state.people if p["relation"] == "self"), None)
-    patient_age = compute_age_from_yyyymmdd(self_data["birthday"]) if self_data else None
-    
-    base_system_prompt_template = """
-    You are a friendly, empathetic medical assistant chatbot conducting a patient intake interview for family health history.
-
-    Your goal is to collect complete and accurate structured data using the `store_patient_info` tool.
-
-    The intro message before AI is called introduces the bot and states that we collect names, birth dates, sexes, living status (NA for self), and medical conditions - use the understanding of the user having that intro to naturally ask what the user can tell you about themselves (dont use that exact wording)
-
-    If the user doesnt answer all things then prompt for the rest of the information.
-
-    Information collected:
-    - Name - if they dont provide a first and last name prompt for the last name. give a confirmation of their name e.g. (NOT THE SAME WORDING EVERY TIME) Thank you, I've saved your full name as Kellie Lai. Don't say your first name is Kellie, and your last name is Lai.
-    - Birth dates - get their full date of birth but dont give an example of input. Store birthday in the following format: yyyymmdd
-    - Sexes - record 1 for male and 2 for female but dont give an example input
-    - Living status - skip for user, record 0 for alive and 1 for dead
-    - Medical conditions - If a condition looks misspelt ask the user if its right. If confirmed to be misspelled by the user (e.g., user says "cold", you suggest "could", user confirms "cold"), save the corrected spelling as the condition to be searched on mondo.
-
-    **Crucial Context: The current date for this entire interview is August 4th, 2025. All your calculations, age references, and mentions of 'today' or 'now' MUST be based on this date.**
-    
-    **Rule of Addressing: You are speaking to the patient, {patient_name}. Always address them by this name or as 'you'. When asking about a family member (the 'subject'), 
-    refer to them by their name (e.g., 'Dan') or their pronoun ('his'/'her'). NEVER address the patient using the subject's name.**
-
-    **Remember information already provided in the conversation history and leverage it.**
-
-    **IMPORTANT: Relation Labeling Rule** — If you are collecting information about one of multiple relatives of the same type (e.g., siblings, children, paternal siblings, maternal siblings), you MUST use the full label with a numeric suffix in the `relation` field of the tool call, such as `'sibling_1'`, `'child_2'`, `'paternal_sibling_1'`, etc. Do NOT use just `'sibling'` or `'child'` unless explicitly instructed.
-    
-    **Avoid excessive confirmation for obvious facts (e.g., if a person states their sex, do not ask them to confirm their sex).**
-    Handle "I don't know" or missing information gracefully (e.g., "Okay, we'll leave that as unknown for now").
-    
-    **If a user provides just a single name, assume it is their first name, and ask for their last name. If they provide two or more names separated by whitespace, 
-    acknowledge that they have provided their full name, and get first and last name from that.**
-    
-    **Infer Sex from Role:** If the person's role clearly implies their sex (e.g., 'biological mother', 'father'), do NOT explicitly ask for their sex. Assume it and pass it to the tool. Only ask for sex if the role is ambiguous (e.g., 'sibling', 'partner', 'child') or the user explicitly states a different sex.
-    
-    **Remember Quantities:** If the user states a specific number for siblings or children (e.g., "I have 3 sisters"), remember this and ask for each one sequentially until that number is reached, without asking redundant "Do you have any other X?" questions.
-    
-    **Redirecting:** If the user veers off-topic, politely but firmly steer the conversation back to collecting the required family history information. For example, "That's interesting, but could we get back to collecting your family's health history?"
-    
-    **Tool Calling Rule: You MUST call the `store_patient_info` tool only when you have successfully collected ALL of the following fields for the current person AND the person has confirmed
-    that the following information is all correct: 
-    first name, last name, birthday, sex, and living status (`is_dead`).
-
-    ** Do not move on to the next family member until the tool has been called for the current one. If you are 
-    missing a field, you MUST ask for it. 
-
-    Your current focus is on the {relation_label_clean}.
-
-    **Summary box:** Please add a little summary box on the information extracted from the chat and ask the user if everything's is correct.
-
-    **The main reason for this visit, or the focal disease being investigated, is: '{focal_disease}'.**
-    When asking about medical conditions for family members, keep this focal disease in mind. 
-    If a patient describes a condition known to be associated with the focal disease, you MUST acknowledge this connection directly. 
-    Your goal is to inform the user naturally, without sounding repetitive.
-    
-    **Vary your phrasing and tone based on the context. Here are some principles and examples:**
-    *   **For less severe or common conditions (like nearsightedness):** Be informative and conversational.
-        *   *Example 1:* "Thanks for mentioning that. I'm noting it down, as nearsightedness can sometimes be linked to {focal_disease}."
-        *   *Example 2:* "Interesting that you mention that. It's helpful to know, since [the mentioned condition] is one of the things we look for with {focal_disease}."
-
-    *   **For more significant conditions (like an aortic aneurysm):** Be more direct and empathetic.
-        *   *Example 1:* "Thank you, that's a very important piece of information. As you may know, [the mentioned condition] is a primary concern we monitor with {focal_disease}."
-        *   *Example 2:* "I appreciate you sharing that. We'll pay close attention to that, as there's a strong connection between [the mentioned condition] and {focal_disease}."
-
-    **Crucial Rule: You MUST NOT use the exact same phrasing for this acknowledgement multiple times in the interview.** After acknowledging the connection, continue the interview by asking for any other conditions or moving to the next required question."
+def finalize_pending():
+    """
+    Finalize queued relatives in order. Stops at the first one that needs the user (condition or
+    age confirmation); handle_actions resumes the queue once it is answered. Returns the relations handled.
+    """
+    handled = []
+    while st.session_state.pending_relatives and not st.session_state.action_required:
+        tool_args = st.session_state.pending_relatives.pop(0)
+        finalize_person(tool_args)
+        handled.append(tool_args["relation"])
+    return handled
+
+def store_tool_calls(tool_calls):
+    """
+    Queue everyone in a reply's tool calls (store_patient_info and store_relatives_info): the
+    person being interviewed plus every other relative whose details are complete, then finalize them.
+    Returns True when the current relation was stored (or is queued behind a confirmation).
+    """
+    people = tool_call_people(st.session_state.tool_ledger.new_calls(tool_calls))
+    # Checked against the stage's strict schema and repaired where possible (backend/tool_schema.py)
+    people, report = check_people(people, st.session_state.current_relation)
+    stored = store_people(people)
+    record_turn(stored, report)
+    return stored
+
+def store_people(people):
     """
+    store_tool_calls for person argument dicts (also used for slots filled locally). People already
+    applied by an earlier (retried) turn are skipped, see backend/llm_calls.py.
+    """
+    current = st.session_state.current_relation
+    known = st.session_state.people + st.session_state.pending_relatives
+    st.session_state.pending_relatives.extend(st.session_state.tool_ledger.new_people(
+        tool_args for tool_args in assign_relations(people, known, current)
+        if tool_args["relation"] == current or is_complete(tool_args)))
+    handled = finalize_pending()
+    return (current in handled or any(a["relation"] == current for a in st.session_state.pending_relatives)
+            or any(p["relation"] == current for p in st.session_state.people))
+
+def skip_completed_stages():
+    """Move interview_index past single-person stages already recorded (e.g. given along with another relative)."""
+    recorded = {p["relation"] for p in st.session_state.people}
+    recorded |= {a["relation"] for a in st.session_state.pending_relatives}
+    while (st.session_state.interview_index < len(INTERVIEW_STAGES)
+           and INTERVIEW_STAGES[st.session_state.interview_index] in recorded):
+        st.session_state.interview_index += 1
+
+def interview_prompt(relation_label, patient_name=None, missing_slots=None, patient_age=None, context=True):
+    """
+    System prompt for interviewing one relative (memory, stage-scoped rules from backend/prompts.py,
+    focal disease guidance). `missing_slots` None compiles the opening prompt. `patient_age` defaults
+    to the stored patient's; context=False leaves out the memory facts and the pattern hint.
+    """
+    if patient_age is None:
+        self_data = next((p for p in st.session_state.people if p["relation"] == "self"), None)
+        patient_age = compute_age_from_yyyymmdd(self_data["birthday"]) if self_data else None
+    if not context:
+        return compile_interview_prompt(relation_label, patient_name, st.session_state.focal_disease,
+                                        patient_age, missing_slots)
 
-    relation_label_clean = relation_label.replace('_', ' ')
-    if relation_label == "self":
-        role_specific_prompt  = (
-            "You're a friendly medical interviewer chatbot named ROOTS. Your job is to guide a person through an informal conversation to collect important health and family background information."
-            "You are interviewing the patient (self)."
-            "Start the conversation in a warm, relaxed, and open-ended way. Instead of asking directly for things like name or birth date, ask general questions like: - 'What can you tell me about yourself to get started?'"
-            "Your goal is to make it feel like a natural conversation, not a questionnaire. Use emojis and encouragement. Let the user speak freely first — then ask clarifying questions to collect details like full name, date of birth, sex, and health conditions only if the user doesn't provide them up front."
-            "NEVER start by asking directly for information. Let the user share what feels natural first."
-            "While asking for medical conditions, if patient says that they have a condition, always ask if the patient has any other conditions. If patient implies that they do not have a condition, proceed to the next required question. Prompt for more conditions even after the patient made a mistake and just corrected it"
-            "Patient is always alive (`is_dead` is `0`). Do NOT ask them to confirm this."
-            "Do not ask for height or weight. "
-            "Once all fields are collected and confirmed, use the `store_patient_info` tool."
-            "Summary box: Please add a little summary box on the information extracted from the chat and ask the user if everything's is correct."
-        )
-    else:
-        role_specific_prompt = (
-            f"You are interviewing the patient's {relation_label_clean}."
-            f"naturally ask what the user can tell you about {relation_label_clean} (dont use that exact wording but keep it open ended rather thank asking for specific details)"
-            "Try to ask questions open-endedly with multiple possible fields answered in one question rather than in a rigid q&a structure but if they dont answer everything ask for the following conversationally; full name (first and last), birth date, sex (record 1 if they  say male, or 2 if they say female (dont accept other), living status (record 1 for dead and 0 for alive) and medical conditions."
-            "**Infer Sex from Role**: If the person's role clearly implies their sex (e.g., 'biological mother', 'father'), do NOT explicitly ask for their sex. Assume it and pass it to the tool. **Always** ask for sex if the role is ambiguous (e.g., 'sibling', 'partner', 'child')"
-            f"While asking for medical conditions, if patient implies that their {relation_label_clean} has at least a condition, always ask if the patient's {relation_label_clean} has any other conditions. If patient implies that their {relation_label_clean} do not have a condition, proceed to the next required question. Prompt for more conditions even after the patient made a mistake and just corrected it"
-            f" The patient is {patient_age} years old. Use this to assess if the patient's {relation_label_clean} age is biologically plausible. "
-            "If an age seems implausible (parents too young to have kids of certain age), gently ask for confirmation or correction, otherwise continue with the next question without mentioning it"
-            "Then ask if they are alive"
-            "Do not ask for height or weight. "
-            f"Once all fields specific to the the patient's {relation_label_clean} are collected and confirmed, use the `store_patient_info` tool."
-            "IMPORTANT: if the individuals condition is already in the CSV, ask whether it is the same condition rather than calling the mondo search again"
-            "Summary box: Please add a little summary box on the information extracted from the chat and ask the user if everything's is correct."
-        )
-    
     memory = seed_memory_from_csv()
-    combined_prompt = (
-        memory + "\n\n" +
-        base_system_prompt_template.format(
-            relation_label_clean=relation_label_clean,
-            focal_disease=st.session_state.focal_disease,
-            patient_name=patient_name if patient_name else "the patient"
-        ) +
-        role_specific_prompt
+    from backend.inheritance_scan import focal_disease_guidance
+    return memory + "\n\n" + compile_interview_prompt(
+        relation_label, patient_name, st.session_state.focal_disease, patient_age, missing_slots,
+        focal_disease_guidance(st.session_state.people, st.session_state.focal_disease, disease_codes())
     )
-    
-    st.session_state.messages.append({
-        "role": "system",
-        "content": combined_prompt
-    })
-    
-    # Get the first assistant message
-    response = client.chat.completions.create(
-        model="gpt-4o-mini-2024-07-18",
-        messages=st.session_state.messages,
-        tools=get_tools(),
+
+def opening_request_key(relation_label, patient_name, patient_age=None):
+    """
+    Prefetch key of `relation_label`'s opening: the relation and its instructions. Memory facts and the
+    pattern hint are left out: they change as soon as the confirmed relative is stored, and the live
+    system prompt carries them from the first answer on.
+    """
+    instructions = interview_prompt(relation_label, patient_name, patient_age=patient_age, context=False)
+    return opening_key(relation_label, [{"role": "system", "content": instructions}])
+
+def create_opening(client, messages, tools, session_id=None, background=False):
+    """The first assistant turn of an interview (runs on the prefetch pool too, so no session state here)."""
+    return chat_completion(
+        client, "opening", session=session_id, background=background,
+        messages=messages,
+        tools=tools,
         tool_choice="auto"
     )
+
+def prefetch_opening(relation_label, patient_name=None, patient_age=None):
+    """Generate `relation_label`'s first question in the background (see backend/prefetch.py)."""
+    if not relation_label or any(p["relation"] == relation_label for p in st.session_state.people):
+        return
+    messages = [{"role": "system", "content": interview_prompt(relation_label, patient_name, patient_age=patient_age)}]
+    st.session_state.prefetcher.submit(opening_request_key(relation_label, patient_name, patient_age), create_opening,
+                                       get_openai_client(), messages, stage_tools(relation_label),
+                                       st.session_state.session_id, background=True)
+
+def prefetch_next(relation_label, pending=None):
+    """
+    Prefetch the opening of the stage expected after `relation_label`. `pending` is the person being
+    confirmed: while it is the patient, their name and age are taken from it, as they will be once stored.
+    """
+    patient_name, patient_age = st.session_state.patient_name, None
+    if relation_label == "self":
+        first, last, birthday = ((pending or {}).get(field) for field in ("first_name", "last_name", "birthday"))
+        if not (first and last and birthday):
+            return
+        patient_name = f"{str(first).capitalize()} {str(last).capitalize()}"
+        patient_age = compute_age_from_yyyymmdd(birthday)
+    relations = {p["relation"] for p in st.session_state.people} | {relation_label}
+    prefetch_opening(next_relation(relation_label, relations), patient_name, patient_age)
+
+def start_interview(relation_label, patient_name=None):
+    relation_label = relation_label.replace(' ', '_')
+    st.session_state.current_relation = relation_label
+    st.session_state.slots = new_slots(relation_label)
+    st.session_state.prompt_slots = None
+    st.session_state.messages = [{"role": "system", "content": interview_prompt(relation_label, patient_name)}]
+    
+    # Get the first assistant message: prefetched while the previous relative was confirmed, or now
+    response = st.session_state.prefetcher.take(opening_request_key(relation_label, patient_name))
+    if response is None:
+        response = create_opening(get_openai_client(), st.session_state.messages, stage_tools(relation_label),
+                                  st.session_state.session_id)
     reply = response.choices[0].message
     
     if reply.tool_calls:
-        for tool_call in reply.tool_calls:
-            tool_args = json.loads(tool_call.function.arguments)
-            tool_relation = tool_args.get("relation", "").replace(' ', '_')
-            if tool_relation != relation_label:
-                continue
-            finalize_person(tool_args)
+        if store_tool_calls(reply.tool_calls):
             st.session_state.current_relation = None
             return
     else:
         assistant_message = reply.content.strip()
         st.session_state.messages.append({"role": "assistant", "content": assistant_message})
         # FIXED: Only add to chat_history once here
-        st.session_state.chat_history.append({
-            'role': 'assistant',
-            'content': assistant_message
-        })
+        append_chat_message('assistant', assistant_message)
+        observe_assistant(st.session_state.slots, assistant_message)
 
 def interview_multiple(relation_base, patient_name=None):
     st.session_state.awaiting_confirmation = True
@@ -870,178 +759,110 @@ def process_user_message(user_input):
     if st.session_state.awaiting_confirmation:
         st.session_state.awaiting_confirmation = False
         if user_input.lower() in ("yes", "y", "yeah", "i do"):
+            # Numbered after the ones already stored (several may have come in one message)
+            relations = {p["relation"] for p in st.session_state.people}
+            st.session_state.multiple_relation_index = next_index(st.session_state.confirmation_type, relations)
             relation_label = f"{st.session_state.confirmation_type}_{st.session_state.multiple_relation_index}"
-            st.session_state.multiple_relation_index += 1
             start_interview(relation_label, st.session_state.patient_name)
             return "Starting interview for new family member..."
         else:
             # Move to next stage
             st.session_state.interview_index += 1
+            skip_completed_stages()
             return "Moving to next family member..."
     
     # Add user message to history
     st.session_state.messages.append({"role": "user", "content": user_input})
     # FIXED: Add user message to chat_history here
-    st.session_state.chat_history.append({
-        'role': 'user',
-        'content': user_input
-    })
-    
-    # Get assistant response
-    response = client.chat.completions.create(
-        model="gpt-4o-mini-2024-07-18",
-        messages=st.session_state.messages,
-        tools=get_tools(),
-        tool_choice="auto"
-    )
+    append_chat_message('user', user_input)
+    
+    # Trivial answers (a date, "male", "alive", "yes" to a template summary) are served locally
+    slots = st.session_state.slots
+    if slots is None or slots["relation"] != st.session_state.current_relation:
+        slots = st.session_state.slots = new_slots(st.session_state.current_relation)
+    asked = missing(slots)  # the system prompt is scoped to what was missing when the user answered
+    local = local_turn(slots, user_input)
+    count_turn(st.session_state.turn_counts, local is not None)
+    if local and local["finalize"]:
+        tool_relation = st.session_state.current_relation
+        if store_people([local["finalize"]]):
+            return current_relation_stored(tool_relation)
+    elif local:
+        st.session_state.messages.append({"role": "assistant", "content": local["reply"]})
+        append_chat_message('assistant', local["reply"])
+        if slots["summary_local"]:
+            prefetch_next(st.session_state.current_relation, slots)
+        return local["reply"]
+    observe_user(slots, user_input)
+    if asked != st.session_state.prompt_slots and st.session_state.messages[0]["role"] == "system":
+        st.session_state.messages[0]["content"] = interview_prompt(st.session_state.current_relation,
+                                                                   st.session_state.patient_name, asked)
+        st.session_state.prompt_slots = asked
+    
+    # Get assistant response (retried / rerouted in backend/llm_calls.py until the deadline)
+    try:
+        response = chat_completion(
+            get_openai_client(), interview_call_type(slots), session=st.session_state.session_id,
+            messages=st.session_state.messages,
+            tools=stage_tools(st.session_state.current_relation),
+            tool_choice="auto"
+        )
+    except Exception as e:
+        # Keep the conversation consistent: the unanswered message is dropped so it can be sent again
+        st.session_state.messages.pop()
+        assistant_message = "Sorry, I couldn't get a reply just now. Could you please send that again?"
+        append_chat_message('assistant', assistant_message)
+        st.warning(f"⚠️ The model call for this turn failed ({type(e).__name__}): {e}")
+        return assistant_message
     reply = response.choices[0].message
     
-    # Check for tool calls
+    # Check for tool calls (every relative in the reply is stored in one pass)
     if reply.tool_calls:
-        for tool_call in reply.tool_calls:
-            tool_args = json.loads(tool_call.function.arguments)
-            tool_relation = tool_args.get("relation", "").replace(' ', '_')
-            if tool_relation != st.session_state.current_relation:
-                continue
-            finalize_person(tool_args)
-            st.session_state.current_relation = None
-            
-            # Handle multiple relations after storing
-            if tool_relation.startswith("sibling") or tool_relation.startswith("child"):
-                st.session_state.awaiting_confirmation = True
-                st.session_state.confirmation_type = tool_relation.split('_')[0]
-                return "Family member stored. Do you have another one to add? (yes/no)"
-            
-            # Move to next interview stage
-            st.session_state.interview_index += 1
-            return "Family member stored. Moving to next family member..."
+        tool_relation = st.session_state.current_relation
+        stored_before = len(st.session_state.people)
+        if store_tool_calls(reply.tool_calls):
+            return current_relation_stored(tool_relation)
+        if len(st.session_state.people) > stored_before:
+            # Other relatives were stored; keep collecting the current one
+            assistant_message = (f"Thanks, I've saved those details. Now, back to your "
+                                 f"{tool_relation.replace('_', ' ')} - what else can you tell me?")
+            st.session_state.messages.append({"role": "assistant", "content": assistant_message})
+            append_chat_message('assistant', assistant_message)
+            observe_assistant(slots, assistant_message)
+            return assistant_message
     else:
         assistant_message = reply.content.strip()
         st.session_state.messages.append({"role": "assistant", "content": assistant_message})
         # FIXED: Only add to chat_history once here, removed duplicate
-        st.session_state.chat_history.append({
-            'role': 'assistant',
-            'content': assistant_message
-        })
+        append_chat_message('assistant', assistant_message)
+        observe_assistant(slots, assistant_message)
+        # While the user checks the summary, the next relative's first question is generated
+        if looks_like_confirmation(assistant_message):
+            prefetch_next(st.session_state.current_relation, slots)
         return assistant_message
 
+def current_relation_stored(tool_relation):
+    """Advance the interview once the relative being interviewed has been stored."""
+    st.session_state.current_relation = None
+    
+    # Handle multiple relations after storing
+    if tool_relation.startswith("sibling") or tool_relation.startswith("child"):
+        st.session_state.awaiting_confirmation = True
+        st.session_state.confirmation_type = tool_relation.split('_')[0]
+        return "Family member stored. Do you have another one to add? (yes/no)"
+    
+    # Move to next interview stage, past any that were filled in along the way
+    st.session_state.interview_index += 1
+    skip_completed_stages()
+    return "Family member stored. Moving to next family member..."
+
 def store_family_member_data(person_data):
     # This function would store the person data in the backend state
     st.session_state.backend_state['people'].append(person_data)
     # Update other state variables as needed
     st.session_state.backend_state['conversation_stage'] = 'collecting'
 
-# ================ PEDIGREE FUNCTIONS ================
-def draw_pedigree(people_data, focal_disease=None):
-    """Draw family pedigree chart"""
-    fig, ax = plt.subplots(figsize=(12, 8))
-    ax.set_aspect('equal')
-    ax.axis('off')
-    
-    if not people_data:
-        ax.text(0.5, 0.5, 'No family data to display', 
-                transform=ax.transAxes, ha='center', va='center', fontsize=16)
-        return fig
-    
-    # Create positions for family members
-    positions = {}
-    generation_y = {0: 3, 1: 2, 2: 1, 3: 0}  # Y positions by generation
-    
-    # Assign positions based on relation
-    relation_positions = {
-        'paternal_grandfather': (0, 3),
-        'paternal_grandmother': (1, 3),
-        'maternal_grandfather': (3, 3),
-        'maternal_grandmother': (4, 3),
-        'father': (0.5, 2),
-        'mother': (3.5, 2),
-        'self': (2, 1),
-        'sibling_1': (1, 1),
-        'sibling_2': (3, 1),
-        'child_1': (1.5, 0),
-        'child_2': (2.5, 0)
-    }
-    
-    # Plot family members
-    for person in people_data:
-        relation = person.get('relation', '')
-        pos = relation_positions.get(relation, (len(positions), 1))
-        positions[person['id']] = pos
-        
-        x, y = pos
-        
-        # Determine if person has focal disease
-        has_focal_disease = False
-        conditions = person.get('conditions', {})
-        if focal_disease and isinstance(conditions, dict):
-            for condition in conditions:
-                if focal_disease.lower() in condition.lower():
-                    has_focal_disease = True
-                    break
-        
-        # Draw shape based on sex
-        if person.get('sex') == '1':  # Male - square
-            color = 'red' if has_focal_disease else 'lightblue'
-            rect = patches.Rectangle((x-0.2, y-0.2), 0.4, 0.4, 
-                                   facecolor=color, edgecolor='black', linewidth=2)
-            ax.add_patch(rect)
-        else:  # Female - circle
-            color = 'red' if has_focal_disease else 'pink'
-            circle = patches.Circle((x, y), 0.2, facecolor=color, 
-                                  edgecolor='black', linewidth=2)
-            ax.add_patch(circle)
-        
-        # Add deceased marking
-        if person.get('is_dead'):
-            ax.plot([x-0.2, x+0.2], [y-0.2, y+0.2], 'k-', lw=3)
-        
-        # Add name
-        name = person.get('name', '').split()[0] if person.get('name') else relation
-        ax.text(x, y-0.4, name, ha='center', va='top', fontsize=8, weight='bold')
-    
-    # Draw family connections
-    # Parent-child lines
-    for person in people_data:
-        x, y = positions.get(person['id'], (0, 0))
-        
-        # Connect to parents
-        dad_id = person.get('dad_id')
-        mom_id = person.get('mom_id')
-        
-        if dad_id and dad_id in [p['id'] for p in people_data]:
-            dad_pos = positions.get(dad_id)
-            if dad_pos:
-                ax.plot([x, dad_pos[0]], [y+0.2, dad_pos[1]-0.2], 'k-', alpha=0.6)
-        
-        if mom_id and mom_id in [p['id'] for p in people_data]:  
-            mom_pos = positions.get(mom_id)
-            if mom_pos:
-                ax.plot([x, mom_pos[0]], [y+0.2, mom_pos[1]-0.2], 'k-', alpha=0.6)
-    
-    # Set plot limits
-    if positions:
-        x_coords = [pos[0] for pos in positions.values()]
-        y_coords = [pos[1] for pos in positions.values()]
-        ax.set_xlim(min(x_coords) - 0.5, max(x_coords) + 0.5)
-        ax.set_ylim(min(y_coords) - 0.5, max(y_coords) + 0.5)
-    
-    # Add title and legend
-    title = f'Family Pedigree'
-    if focal_disease:
-        title += f' - {focal_disease}'
-    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-    
-    # Legend
-    legend_elements = [
-        patches.Rectangle((0, 0), 1, 1, facecolor='lightblue', edgecolor='black', label='Male'),
-        patches.Circle((0, 0), 0.5, facecolor='pink', edgecolor='black', label='Female'),
-        patches.Rectangle((0, 0), 1, 1, facecolor='red', edgecolor='black', label='Affected')
-    ]
-    ax.legend(handles=legend_elements, loc='upper right', fontsize=8)
-    
-    return fig
-
-def standardize_focal_disease(raw_input):
+def llm_standardize_focal_disease(raw_input):
     """Standardize the focal disease input using GPT"""
     standardization_messages = [
         {"role": "system", "content": (
@@ -1060,8 +881,8 @@ def standardize_focal_disease(raw_input):
     ]
     
     try:
-        standardization_response = client.chat.completions.create(
-            model="gpt-4o-mini-2024-07-18",
+        standardization_response = chat_completion(
+            get_openai_client(), "standardization", session=st.session_state.session_id,
             messages=standardization_messages,
             max_tokens=30,
             temperature=0.2
@@ -1069,11 +890,603 @@ def standardize_focal_disease(raw_input):
         return standardization_response.choices[0].message.content.strip()
     except Exception as e:
         st.error(f"Error during focal disease standardization: {str(e)}")
-        return raw_input
+        return None
+
+def standardize_focal_disease(raw_input):
+    """{"label", "mondo_code", "source"}: cached result, local MONDO match, or GPT (backend/focal_cache.py)."""
+    from backend.focal_cache import standardize
+    return standardize(raw_input, llm_standardize_focal_disease)
+
+# ================ PAGE FRAGMENTS ================
+# Each panel reruns on its own; a full app rerun is only needed when the shared data changes.
+
+INTERVIEW_STAGES = [
+    "self", "father", "mother", "siblings", 
+    "partner", "children", "paternal_grandfather", 
+    "paternal_grandmother", "maternal_grandfather", 
+    "maternal_grandmother"
+]
+
+def bump_data_version():
+    """Mark the family data as changed so version-keyed panels rebuild."""
+    st.session_state.data_version = st.session_state.get("data_version", 0) + 1
+
+def disease_codes():
+    """Disease label -> MONDO code for every recorded disease plus the focal disease."""
+    return data_store.disease_codes(st.session_state.disease_columns,
+                                    st.session_state.backend_state.get('focal_disease'),
+                                    st.session_state.backend_state.get('mondo_code'))
+
+def data_snapshot():
+    """State shared across panels; if it changes, the whole page must rerun."""
+    return (
+        st.session_state.get("data_version", 0),
+        st.session_state.interview_stage,
+        st.session_state.action_required,
+        st.session_state.focal_disease,
+    )
+
+def rerun_fragment():
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # Fragment-scoped reruns are only allowed while a fragment is rerunning on its own
+        st.rerun()
+
+def rerun_after(before):
+    """Rerun just the current fragment, or the whole app if shared state changed."""
+    if data_snapshot() != before:
+        st.rerun()
+    rerun_fragment()
+
+def version_cached(name, build):
+    """Memoize build() until the family data, disease columns or focal disease (or its code) change."""
+    key = (
+        st.session_state.get("data_version", 0),
+        st.session_state.backend_state.get('focal_disease'),
+        st.session_state.backend_state.get('mondo_code'),
+        tuple(st.session_state.disease_column_names.items()),
+    )
+    cache = st.session_state.setdefault("render_cache", {})
+    if name not in cache or cache[name][0] != key:
+        cache[name] = (key, build())
+    return cache[name][1]
+
+# ================ CHAT TRANSCRIPT ================
+CHAT_WINDOW = 20  # most recent messages always shown; older ones load a page at a time
+
+def render_chat_message(role, content):
+    """HTML for one transcript bubble (built once, when the message is added)."""
+    if role == 'user':
+        return f'<div class="user-message">\n<strong>You:</strong> {content}\n</div>'
+    # Check for genetic reasoning in message
+    css_class = "genetic-insight" if "🧬" in content or "genetic" in content.lower() else "assistant-message"
+    return f'<div class="{css_class}">\n<strong>ROOTS:</strong> {content}\n</div>'
+
+def append_chat_message(role, content):
+    st.session_state.chat_history.append({
+        'role': role,
+        'content': content,
+        'html': render_chat_message(role, content)
+    })
+
+def transcript_html(messages):
+    blocks = []
+    for message in messages:
+        if message['role'] not in ('user', 'assistant'):
+            continue
+        if 'html' not in message:
+            # Messages restored from older sessions are memoized on first render
+            message['html'] = render_chat_message(message['role'], message['content'])
+        blocks.append(message['html'])
+    return "\n\n".join(blocks)
+
+def render_transcript():
+    """Show the last CHAT_WINDOW messages; earlier pages stay collapsed until requested."""
+    history = st.session_state.chat_history
+    window_start = max(len(history) - CHAT_WINDOW, 0)
+    pages_loaded = st.session_state.get("chat_pages_loaded", 0)
+    oldest_loaded = max(window_start - pages_loaded * CHAT_WINDOW, 0)
+
+    if oldest_loaded > 0:
+        if st.button(f"⬆️ Load earlier messages ({oldest_loaded} hidden)", key="load_earlier_messages"):
+            st.session_state.chat_pages_loaded = pages_loaded + 1
+            rerun_fragment()
+
+    for page in range(pages_loaded, 0, -1):
+        page_start = max(window_start - page * CHAT_WINDOW, 0)
+        page_end = window_start - (page - 1) * CHAT_WINDOW
+        if page_end <= page_start:
+            continue
+        with st.expander(f"Messages {page_start + 1}–{page_end}"):
+            st.markdown(transcript_html(history[page_start:page_end]), unsafe_allow_html=True)
+
+    if len(history) > window_start:
+        st.markdown(transcript_html(history[window_start:]), unsafe_allow_html=True)
+
+def record_fragment_timing(name, started):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    st.session_state.setdefault("fragment_timings", {})[name] = elapsed_ms
+    if st.session_state.get("show_timings"):
+        st.caption(f"⏱️ {name} rendered in {elapsed_ms:.1f} ms")
+
+def build_export_csv():
+    base_columns = ["id", "relation", "first_name", "last_name", "birthday", "sex", "is_dead", "dad_id", "mom_id", "partner_id"]
+    disease_cols = sorted(st.session_state.disease_column_names.values())
+    all_columns = base_columns + disease_cols
+    
+    csv_data = []
+    for person in st.session_state.people:
+        row = {col: person.get(col, 0) for col in base_columns}
+        
+        person_conditions = person.get("conditions", {})
+        for disease_label, col_name in st.session_state.disease_column_names.items():
+            if isinstance(person_conditions, dict):
+                row[col_name] = 1 if person_conditions.get(disease_label, False) else 0
+            else:
+                row[col_name] = 0
+        
+        csv_data.append(row)
+    
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=all_columns)
+    writer.writeheader()
+    writer.writerows(csv_data)
+    return buffer.getvalue()
+
+def build_export_gedcom():
+    from backend.interchange import write_gedcom
+    buffer = io.StringIO()
+    write_gedcom(st.session_state.people, buffer, disease_codes())
+    return buffer.getvalue()
+
+def build_export_fam():
+    """PLINK .fam with the focal disease as the affection status."""
+    from backend.interchange import DEFAULT_DISEASE, write_ped
+    buffer = io.StringIO()
+    focal_disease = st.session_state.backend_state.get('focal_disease') or DEFAULT_DISEASE
+    write_ped((("1", p) for p in st.session_state.people), buffer, focal_disease, disease_codes())
+    return buffer.getvalue()
+
+@st.fragment
+def family_list_fragment():
+    started = time.perf_counter()
+    before = data_snapshot()
+    state = st.session_state.backend_state
+    # Display collected family members - FIXED: Handle missing people
+    people = state.get('people', [])
+    if people:
+        st.markdown("""
+        <div class="sidebar-section">
+            <h4>Family Members Collected</h4>
+        """, unsafe_allow_html=True)
+        
+        for person in people:
+            relation = person.get('relation', '').replace('_', ' ').title()
+            first_name = person.get('first_name', '')
+            last_name = person.get('last_name', '')
+            name = f"{first_name} {last_name}" if first_name or last_name else relation
+            
+            if st.session_state.editing_person_id == person['id']:
+                edit_person_form(person)
+            else:
+                with st.expander(f"{relation}: {name}"):
+                    # FIXED: Compute age safely
+                    birthday = person.get('birthday')
+                    age = None
+                    if birthday:
+                        try:
+                            birth_year = int(str(birthday)[:4])
+                            current_year = datetime.now().year
+                            age = current_year - birth_year
+                        except:
+                            pass
+                    
+                    st.write(f"**Sex:** {'Male' if person.get('sex') == '1' else 'Female'}")
+                    st.write(f"**Age:** {age if age else 'Unknown'}")
+                    
+                    conditions = person.get('conditions', {})
+                    if st.button("✏️ Edit", key=f"edit_{person['id']}", 
+                            use_container_width=True):
+                        st.session_state.editing_person_id = person['id']
+                        rerun_after(before)
+                    if conditions and isinstance(conditions, dict):
+                        st.write("**Medical Conditions:**")
+                        for condition in conditions:
+                            if conditions.get(condition):
+                                st.write(f"• {condition}")
+                    else:
+                        st.write("**Medical Conditions:** None reported")
+        st.markdown("</div>", unsafe_allow_html=True)
+    else:
+        st.info("No family members collected yet")
+    record_fragment_timing("family list", started)
+
+@st.fragment
+def chat_fragment():
+    started = time.perf_counter()
+    before = data_snapshot()
+    st.markdown("""
+    <div class="main-header">
+        <h4 style="margin:0;">💬 Genetic Counseling Chat</h4>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Focal disease collection - FIXED: Add clearer instructions
+    if st.session_state.interview_stage == "focal_disease":
+        st.markdown("""
+        <div class="empty-state">
+            <h3>Welcome to Your Genetic Counseling Session</h3>
+            <p>To begin, please tell us:</p>
+            <p><strong>What brings you to genetic counseling today?</strong></p>
+            <p>Is there a specific health condition you're concerned about?</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        focal_input = st.text_input(
+            "e.g., 'concern about breast cancer', 'family history of heart disease'", 
+            key="focal_input",
+            placeholder="Enter your primary health concern here..."
+        )
+        
+        if st.button("Submit Reason", key="submit_reason", use_container_width=True):
+            if focal_input:
+                result = standardize_focal_disease(focal_input)
+                standardized = result["label"]
+                st.session_state.focal_disease = standardized
+                st.session_state.mondo_code = result["mondo_code"]
+                st.session_state.backend_state['focal_disease'] = standardized
+                st.session_state.backend_state['mondo_code'] = result["mondo_code"]
+                st.session_state.interview_stage = "self"
+                append_chat_message('user', focal_input)
+                append_chat_message('assistant', f"Thank you. We'll focus our discussion on: **{standardized}**.")
+                rerun_after(before)
+            else:
+                st.warning("Please provide a reason for the visit to continue.")
+    
+    # Start interview for current stage
+    if st.session_state.interview_stage in INTERVIEW_STAGES:
+        # (not while one of them is being interviewed, or the next answer is taken as the yes/no)
+        if st.session_state.interview_stage == "siblings":
+            if not st.session_state.awaiting_confirmation and st.session_state.current_relation is None:
+                interview_multiple("sibling", st.session_state.patient_name)
+                rerun_after(before)
+        elif st.session_state.interview_stage == "children":
+            if not st.session_state.awaiting_confirmation and st.session_state.current_relation is None:
+                interview_multiple("child", st.session_state.patient_name)
+                rerun_after(before)
+        else:
+            if st.session_state.current_relation is None:
+                start_interview(st.session_state.interview_stage, st.session_state.patient_name)
+                rerun_after(before)
+    
+    # Chat container - FIXED: Improve chat display
+    st.markdown("### Conversation")
+    chat_container = st.container()
+    with chat_container:
+        render_transcript()
+    
+    # Chat input - FIXED: Position at bottom
+    if st.session_state.interview_stage != "focal_disease" and st.session_state.interview_stage != "complete":
+        st.markdown('<div class="chat-input-container">', unsafe_allow_html=True)
+        user_input = st.chat_input("Type your message here...", key="chat_input")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        if user_input:
+            # Process message and get response
+            with st.spinner("🤔 Analyzing and responding..."):
+                try:
+                    response = process_user_message(user_input)
+                    
+                    # Update patient name if self interview is complete
+                    if st.session_state.interview_stage == "self" and st.session_state.current_relation is None:
+                        self_person = next((p for p in st.session_state.people if p["relation"] == "self"), None)
+                        if self_person:
+                            st.session_state.patient_name = f"{self_person['first_name']} {self_person['last_name']}"
+                    
+                    # Move to next stage if appropriate
+                    if response and "Moving to next family member" in response:
+                        if st.session_state.interview_index < len(INTERVIEW_STAGES):
+                            st.session_state.interview_stage = INTERVIEW_STAGES[st.session_state.interview_index]
+                        else:
+                            st.session_state.interview_stage = "complete"
+                            st.session_state.backend_state['conversation_stage'] = 'complete'
+                    
+                except Exception as e:
+                    st.error(f"Error processing message: {str(e)}")
+
+            rerun_after(before)
+    elif st.session_state.interview_stage == "complete":
+        st.info("✅ Pedigree collection completed. You can start a new session or download your report below.")
+    record_fragment_timing("chat", started)
+
+@st.fragment
+def pedigree_fragment():
+    started = time.perf_counter()
+    # Pedigree container - FIXED: Improve display
+    with st.container():
+        st.markdown('<div class="pedigree-container">', unsafe_allow_html=True)
+        
+        # Generate and display pedigree
+        people = st.session_state.backend_state.get('people', [])
+        focal_disease = st.session_state.backend_state.get('focal_disease')
+        
+        if len(people) > 0:
+            try:
+                # SVG is rasterised by the browser, no server-side plotting
+                svg = version_cached("pedigree_svg", lambda: render_pedigree_svg(people, focal_disease, disease_codes()))
+                st.markdown(svg, unsafe_allow_html=True)
+            except Exception as e:
+                st.error(f"Error generating pedigree: {str(e)}")
+                st.info("Displaying family data in table format instead")
+                
+                # Fallback to table display
+                family_data = []
+                for person in people:
+                    family_data.append({
+                        'Relation': person.get('relation', '').replace('_', ' ').title(),
+                        'Name': f"{person.get('first_name', '')} {person.get('last_name', '')}",
+                        'Sex': 'Male' if person.get('sex') == '1' else 'Female',
+                        'Age': compute_age_from_yyyymmdd(person.get('birthday')) or 'Unknown',
+                        'Status': 'Deceased' if person.get('is_dead') == 1 else 'Alive'
+                    })
+                
+                st.dataframe(family_data, height=300)
+        else:
+            st.markdown("""
+            <div class="empty-state">
+                <h4>👋 Pedigree Preview</h4>
+                <p>Your family pedigree will appear here as you add family members</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+    record_fragment_timing("pedigree", started)
+
+@st.fragment
+def exports_fragment():
+    started = time.perf_counter()
+    # Export options - FIXED: Improve button styling
+    if st.session_state.backend_state.get('people'):
+        st.subheader("📤 Export Options")
+        
+        # Download family data as CSV (rebuilt only when the family data changes)
+        st.download_button(
+            label="💾 Download Family Data (CSV)",
+            data=version_cached("export_csv", build_export_csv),
+            file_name=f"family_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True,
+            on_click="ignore",
+            key="download_csv"
+        )
+
+        st.download_button(
+            label="🏷️ Download Code Map (CSV)",
+            data=version_cached("code_map_csv", lambda: code_map_csv(
+                st.session_state.disease_columns, st.session_state.disease_xrefs)),
+            file_name=f"disease_codes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True,
+            on_click="ignore",
+            key="download_code_map"
+        )
+
+        # Interchange formats for genealogy software and linkage / association tools
+        st.download_button(
+            label="🧬 Download Pedigree (GEDCOM)",
+            data=version_cached("export_gedcom", build_export_gedcom),
+            file_name=f"family_pedigree_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ged",
+            mime="text/plain",
+            use_container_width=True,
+            on_click="ignore",
+            key="download_gedcom"
+        )
+
+        st.download_button(
+            label="🧬 Download Pedigree (PLINK .fam)",
+            data=version_cached("export_fam", build_export_fam),
+            file_name=f"family_pedigree_{datetime.now().strftime('%Y%m%d_%H%M%S')}.fam",
+            mime="text/plain",
+            use_container_width=True,
+            on_click="ignore",
+            key="download_fam"
+        )
+
+        st.download_button(
+            label="🌳 Download Pedigree (SVG)",
+            data=version_cached("pedigree_svg", lambda: render_pedigree_svg(
+                st.session_state.backend_state['people'],
+                st.session_state.backend_state.get('focal_disease'),
+                disease_codes())),
+            file_name=f"family_pedigree_{datetime.now().strftime('%Y%m%d_%H%M%S')}.svg",
+            mime="image/svg+xml",
+            use_container_width=True,
+            on_click="ignore",
+            key="download_svg"
+        )
+        
+        # Single-locus model used for the carrier / affection probabilities in the report
+        with st.expander("🧮 Risk Model", expanded=False):
+            st.selectbox("Inheritance", ["dominant", "recessive", "x_linked"], key="risk_mode",
+                         format_func=lambda m: {"dominant": "Autosomal dominant",
+                                                "recessive": "Autosomal recessive",
+                                                "x_linked": "X-linked recessive"}[m])
+            st.number_input("Penetrance", 0.0, 1.0, 0.8, 0.05, key="risk_penetrance")
+            st.number_input("Disease allele frequency", 0.0, 0.5, 0.001, 0.001, format="%.4f", key="risk_allele_freq")
+
+        # Generate summary report
+        if st.button("📄 Generate Summary Report", use_container_width=True, key="generate_report"):
+            with st.spinner("Generating report... This may take a moment"):
+                # Create summary header
+                summary = []
+                summary.append(f"# Family Health History Report")
+                summary.append(f"**Generated:** {datetime.now().strftime('%B %d, %Y at %I:%M %p')}")
+                
+                # Add focal disease info
+                if st.session_state.backend_state.get('focal_disease'):
+                    disease_info = st.session_state.backend_state['focal_disease']
+                    mondo_code = st.session_state.backend_state.get('mondo_code', 'N/A')
+                    if mondo_code and mondo_code != 'N/A':
+                        disease_info += f" (MONDO:{mondo_code})"
+                    summary.append(f"**Primary Concern:** {disease_info}")
+                    focal_xrefs = format_xrefs(xrefs_for(mondo_code))
+                    if focal_xrefs:
+                        summary.append(f"**Mapped Codes:** {focal_xrefs}")
+                
+                # Add family members section
+                summary.append(f"\n## Family Members ({len(st.session_state.backend_state['people'])})")
+                
+                for person in st.session_state.backend_state['people']:
+                    relation = person.get('relation', '').replace('_', ' ').title()
+                    first_name = person.get('first_name', '')
+                    last_name = person.get('last_name', '')
+                    name = f"{first_name} {last_name}" if first_name or last_name else relation
+                    
+                    summary.append(f"\n### {relation}: {name}")
+                    
+                    # Calculate age
+                    birthday = person.get('birthday')
+                    age = None
+                    if birthday:
+                        try:
+                            birth_year = int(str(birthday)[:4])
+                            current_year = datetime.now().year
+                            age = current_year - birth_year
+                        except:
+                            pass
+                    
+                    summary.append(f"- **Age:** {age if age else 'Unknown'}")
+                    summary.append(f"- **Sex:** {'Male' if person.get('sex') == '1' else 'Female'}")
+                    summary.append(f"- **Status:** {'Deceased' if person.get('is_dead') else 'Living'}")
+                    
+                    conditions = person.get('conditions', {})
+                    if conditions and isinstance(conditions, dict):
+                        summary.append("- **Medical Conditions:**")
+                        for condition, has_condition in conditions.items():
+                            if has_condition:
+                                xrefs = format_xrefs(st.session_state.disease_xrefs.get(condition) or {})
+                                summary.append(f"  - {condition}" + (f" ({xrefs})" if xrefs else ""))
+                    else:
+                        summary.append("- **Medical Conditions:** None reported")
+                
+                # Add genetic insights
+                summary.append("\n## Genetic Insights")
+                summary.append("Based on the collected family history, here are potential genetic patterns:")
+
+                # Affected relatives by degree, from the kinship coefficients of the family graph
+                from backend.kinship import affected_relative_counts
+                try:
+                    relative_counts = affected_relative_counts(st.session_state.backend_state['people'],
+                                                               disease_codes=disease_codes())
+                except ValueError as e:
+                    relative_counts = {}
+                    summary.append(f"- ⚠️ Relatedness could not be computed: {e}")
+                for disease, counts in relative_counts.items():
+                    summary.append(f"- **{disease}:** {counts['first_degree']} first-degree, "
+                                   f"{counts['second_degree']} second-degree affected relative(s)")
+
+                # Transmission pattern per recorded disease
+                from backend.inheritance_scan import PATTERNS, scan_diseases
+                try:
+                    scans = scan_diseases(st.session_state.backend_state['people'], disease_codes=disease_codes())
+                except ValueError:
+                    scans = {}
+                if scans:
+                    summary.append("\n### Inheritance patterns")
+                for disease, scan in scans.items():
+                    if scan['best'] is None:
+                        summary.append(f"- **{disease}:** not enough affected relatives to suggest a pattern")
+                        continue
+                    evidence = "; ".join(e[2:] for e in scan['patterns'][scan['best']]['evidence'] if e.startswith("+"))
+                    summary.append(f"- **{disease}:** most consistent with {PATTERNS[scan['best']].lower()} "
+                                   f"inheritance ({evidence})")
+
+                # Carrier / affection probabilities for the focal disease (exact peeling)
+                focal_disease = st.session_state.backend_state.get('focal_disease')
+                if focal_disease:
+                    from backend.peeling import carrier_probabilities, make_model
+                    from backend.gene_drop import estimate_carrier_probabilities, kinship_permutation_test
+                    people = st.session_state.backend_state['people']
+                    method = "exact peeling"
+                    try:
+                        model = make_model(st.session_state.risk_mode,
+                                           penetrance=st.session_state.risk_penetrance,
+                                           allele_freq=st.session_state.risk_allele_freq)
+                        try:
+                            probabilities = carrier_probabilities(people, focal_disease, model, disease_codes())
+                        except ValueError:
+                            # Loops in the pedigree: fall back to a gene-dropping estimate
+                            simulation = estimate_carrier_probabilities(people, focal_disease, model,
+                                                                        n_replicates=50_000, seed=0,
+                                                                        disease_codes=disease_codes())
+                            probabilities = simulation['people']
+                            method = f"gene dropping, {simulation['replicates']:,} replicates"
+                    except ValueError as e:
+                        probabilities = []
+                        summary.append(f"- ⚠️ Carrier probabilities could not be computed: {e}")
+
+                    try:
+                        clustering = kinship_permutation_test(people, focal_disease, n_replicates=10_000, seed=0,
+                                                              disease_codes=disease_codes())
+                    except ValueError:
+                        clustering = {'p_value': None}
+                    if clustering['p_value'] is not None:
+                        summary.append(f"- **Clustering of {focal_disease}:** kinship among the {clustering['affected']} "
+                                       f"affected relatives is {clustering['statistic']:.3f} "
+                                       f"(expected {clustering['expected']:.3f} by chance, "
+                                       f"permutation p = {clustering['p_value']:.3g})")
+
+                    if probabilities:
+                        summary.append(f"\n### {focal_disease}: carrier and affection probabilities")
+                        summary.append(f"*Model: {model['mode'].replace('_', '-')}, penetrance {model['penetrance']:.0%}, "
+                                       f"allele frequency {model['allele_freq']:g} ({method})*")
+                        for person, result in zip(people, probabilities):
+                            relation = person.get('relation', '').replace('_', ' ').title()
+                            name = person.get('first_name') or relation
+                            status = {1: "affected", 0: "unaffected", -1: "status unknown"}[result['phenotype']]
+                            summary.append(f"- {relation} ({name}, {status}): carrier {result['carrier']:.1%}, "
+                                           f"affected {result['affected']:.1%}")
+
+                # Family-history referral criteria met by this family
+                from backend.referral_rules import evaluate_family
+                try:
+                    criteria = evaluate_family(st.session_state.backend_state['people'],
+                                               disease_codes=disease_codes())
+                except ValueError as e:
+                    criteria = []
+                    summary.append(f"\n⚠️ Referral criteria could not be evaluated: {e}")
+                summary.append("\n## Referral Criteria")
+                if criteria:
+                    for criterion in criteria:
+                        summary.append(f"- ✅ {criterion['description']} ({criterion['count']} matching)")
+                else:
+                    summary.append("- No family-history referral criteria met")
+
+                # Add testing recommendations
+                summary.append("\n## Genetic Testing Recommendations")
+                summary.append("- Comprehensive genetic testing based on family history")
+                summary.append("- Carrier screening for recessive conditions")
+                summary.append("- Predictive testing for at-risk family members")
+                summary.append("- Consultation with a certified genetic counselor")
+                
+                summary_text = "\n".join(summary)
+
+                st.download_button(
+                    label="📋 Download Summary Report",
+                    data=summary_text,
+                    file_name=f"genetic_counseling_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+                    mime="text/markdown",
+                    use_container_width=True,
+                    on_click="ignore",
+                    key="download_report"
+                )
+    record_fragment_timing("exports", started)
 
 # ================ STREAMLIT FRONTEND ================
 def main():
     initialize_session_state()
+    warm_up()
     
     # Header - FIXED: Use styled header instead of image
     st.markdown("""
@@ -1143,162 +1556,60 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
-        # Display collected family members - FIXED: Handle missing people
-        people = state.get('people', [])
-        if people:
-            st.markdown("""
-            <div class="sidebar-section">
-                <h4>Family Members Collected</h4>
-            """, unsafe_allow_html=True)
-            
-            for person in people:
-                relation = person.get('relation', '').replace('_', ' ').title()
-                first_name = person.get('first_name', '')
-                last_name = person.get('last_name', '')
-                name = f"{first_name} {last_name}" if first_name or last_name else relation
-                
-                if st.session_state.editing_person_id == person['id']:
-                    edit_person_form(person)
-                else:
-                    with st.expander(f"{relation}: {name}"):
-                        # FIXED: Compute age safely
-                        birthday = person.get('birthday')
-                        age = None
-                        if birthday:
-                            try:
-                                birth_year = int(str(birthday)[:4])
-                                current_year = datetime.now().year
-                                age = current_year - birth_year
-                            except:
-                                pass
-                        
-                        st.write(f"**Sex:** {'Male' if person.get('sex') == '1' else 'Female'}")
-                        st.write(f"**Age:** {age if age else 'Unknown'}")
-                        
-                        conditions = person.get('conditions', {})
-                        if st.button("✏️ Edit", key=f"edit_{person['id']}", 
-                                use_container_width=True):
-                            st.session_state.editing_person_id = person['id']
-                            st.rerun()
-                        if conditions and isinstance(conditions, dict):
-                            st.write("**Medical Conditions:**")
-                            for condition in conditions:
-                                if conditions.get(condition):
-                                    st.write(f"• {condition}")
-                        else:
-                            st.write("**Medical Conditions:** None reported")
-            st.markdown("</div>", unsafe_allow_html=True)
-        else:
-            st.info("No family members collected yet")
-        
+        family_list_fragment()
+
+        # Per-panel render timings (each panel also shows its own caption when enabled)
+        with st.expander("⏱️ Render Timings"):
+            st.checkbox("Show timing under each panel", key="show_timings")
+            for name, elapsed_ms in st.session_state.get("fragment_timings", {}).items():
+                st.write(f"**{name.title()}:** {elapsed_ms:.1f} ms")
+            prefetch_stats = st.session_state.prefetcher.stats
+            st.write(f"**Prefetched openings:** {prefetch_stats['used']} used / {prefetch_stats['submitted']} started")
+            turn_counts = st.session_state.turn_counts
+            st.write(f"**Turns answered locally:** {turn_counts['local']} of "
+                     f"{turn_counts['local'] + turn_counts['llm']}")
+            from backend.model_router import model_stats
+            for model, stats in model_stats().items():
+                latency = f"{stats['latency'] * 1000:.0f} ms" if stats["latency"] is not None else "n/a"
+                st.write(f"**{model}:** {latency}, {stats['errors']} errors in {stats['calls']} calls")
+            from backend.llm_calls import call_stats
+            st.write(f"**Model calls:** {call_stats['retries']} retried, {call_stats['timeouts']} timed out, "
+                     f"{call_stats['hedged']} hedged ({call_stats['hedge_wins']} won by the hedge)")
+            st.write(f"**Tool calls:** {schema_stats['valid']} valid, {schema_stats['recovered']} repaired, "
+                     f"{schema_stats['wasted']} unusable")
+            queue = scheduler().metrics()
+            st.write(f"**Rate-limit queue (all sessions):** {queue['depth']} waiting (max {queue['max_depth']}), "
+                     f"wait {queue['mean_wait'] * 1000:.0f} ms mean / {queue['p95_wait'] * 1000:.0f} ms p95")
+
         # Quick upload option - FIXED: Improve UX
         st.subheader("⚡ Quick Upload")
-        with st.expander("Upload CSV"):
-            uploaded_file = st.file_uploader("Upload existing family history CSV", type=['csv'], label_visibility="collapsed")
+        with st.expander("Upload CSV / GEDCOM / PLINK"):
+            uploaded_file = st.file_uploader("Upload existing family history (CSV, GEDCOM, PLINK .fam/.ped, LINKAGE .pre)",
+                                             type=['csv', 'ged', 'fam', 'ped', 'pre'], label_visibility="collapsed")
             
-            # In the sidebar upload section:
+            # Each upload is parsed once (keyed by its content hash), not on every rerun
             if uploaded_file is not None:
-                try:
-                    df = pd.read_csv(uploaded_file)
-                    
-                    # Process uploaded data
-                    state = st.session_state.backend_state
-                    state['people'] = []
-                    
-                    # Reset ID counter
-                    max_id = 0
-                    
-                    # Extract session state from first row
-                    first_row = df.iloc[0]
-                    interview_stage = first_row.get("interview_stage", "focal_disease")
-                    interview_index = first_row.get("interview_index", 0)
-                    focal_disease = first_row.get("focal_disease", None)
-                    mondo_code = first_row.get("mondo_code", None)
-                    
-                    for idx, row in df.iterrows():
-                        # Create person data from CSV row
-                        person_data = {
-                            'id': int(row.get('id', idx + 1)),
-                            'relation': str(row.get('relation', '')).lower(),
-                            'first_name': str(row.get('first_name', '')),
-                            'last_name': str(row.get('last_name', '')),
-                            'birthday': int(row.get('birthday', 0)),
-                            'sex': str(row.get('sex', '')),
-                            'is_dead': int(row.get('is_dead', 0)),
-                            'dad_id': int(row.get('dad_id', 0)),
-                            'mom_id': int(row.get('mom_id', 0)),
-                            'partner_id': int(row.get('partner_id', 0)),
-                        }
-                        
-                        # Track max ID
-                        if person_data['id'] > max_id:
-                            max_id = person_data['id']
-                        
-                        # Collect conditions
-                        conditions = {}
-                        for col in df.columns:
-                            if col not in ['id', 'relation', 'first_name', 'last_name', 
-                                        'birthday', 'sex', 'is_dead', 'dad_id', 'mom_id', 'partner_id',
-                                        'interview_stage', 'interview_index', 'focal_disease', 'mondo_code']:
-                                # Check if the value indicates the condition is present
-                                if row[col] in [1, "1", "True", True]:
-                                    conditions[col] = True
-                                else:
-                                    conditions[col] = False
-                        
-                        person_data['conditions'] = conditions
-                        
-                        # Add to state
-                        state['people'].append(person_data)
-                    
-                    # Update ID counter
-                    st.session_state.person_id_counter = max_id + 1
-                    
-                    # Set focal disease if available
-                    if focal_disease and not pd.isna(focal_disease):
-                        state['focal_disease'] = focal_disease
-                        st.session_state.focal_disease = focal_disease
-                    
-                    # Set MONDO code if available
-                    if mondo_code and not pd.isna(mondo_code):
-                        state['mondo_code'] = mondo_code
-                        st.session_state.mondo_code = mondo_code
-                    
-                    # Set interview stage
-                    if interview_stage and not pd.isna(interview_stage):
-                        state['conversation_stage'] = 'collecting'
-                        st.session_state.interview_stage = interview_stage
-                        st.session_state.interview_index = int(interview_index)
-                    
-                    # Set backend people
-                    st.session_state.people = state['people']
-                    
-                    # Set patient name from self record
-                    self_person = next((p for p in state['people'] if p['relation'] == 'self'), None)
-                    if self_person:
-                        st.session_state.patient_name = f"{self_person['first_name']} {self_person['last_name']}"
-                    
-                    # Update disease columns
-                    for col in df.columns:
-                        if col not in base_columns + ['interview_stage', 'interview_index', 'focal_disease', 'mondo_code']:
-                            # Extract disease name and MONDO code from column name
-                            match = re.match(r"(.*?)\s*\((MONDO:\w+)\)", col)
-                            if match:
-                                disease_name = match.group(1)
-                                mondo = match.group(2)
-                                st.session_state.disease_columns[disease_name] = mondo
-                                st.session_state.disease_column_names[disease_name] = col
-                            else:
-                                st.session_state.disease_columns[col] = "N/A"
-                                st.session_state.disease_column_names[col] = col
-                    
-                    st.success(f"✅ Loaded {len(state['people'])} family members from CSV")
-                    st.success(f"↩️ Resuming interview at: {interview_stage.replace('_', ' ').title()} stage")
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Error processing uploaded file: {str(e)}")
-                    
+                from backend.family_import import content_hash, format_report, import_family_csv
+                data = uploaded_file.getvalue()
+                digest = content_hash(data)
+                if st.session_state.get("upload_import", {}).get("hash") != digest:
+                    if uploaded_file.name.lower().endswith(".csv"):
+                        result = import_family_csv(data)
+                    else:
+                        from backend.interchange import import_pedigree_file
+                        result = import_pedigree_file(data, uploaded_file.name,
+                                                      st.session_state.backend_state.get('focal_disease') or "affected")
+                    st.session_state.upload_import = result
+                    if len(result["families"]) == 1 and not result["report"]["errors"]:
+                        apply_family_import(next(iter(result["families"].values())), result)
+
+                result = st.session_state.upload_import
+                st.markdown("\n".join(format_report(result["report"])))
+                if len(result["families"]) > 1 or (result["families"] and result["report"]["errors"]):
+                    family_id = st.selectbox("Family", list(result["families"]), key="upload_family")
+                    if st.button("📥 Load family", key="load_uploaded_family"):
+                        apply_family_import(result["families"][family_id], result)
+
         # Reset button - FIXED: Improve button styling
         if st.button("🔄 Start New Session", use_container_width=True, key="reset_session", 
                     help="Clear all current session data and start fresh"):
@@ -1311,135 +1622,7 @@ def main():
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.markdown("""
-        <div class="main-header">
-            <h4 style="margin:0;">💬 Genetic Counseling Chat</h4>
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Focal disease collection - FIXED: Add clearer instructions
-        if st.session_state.interview_stage == "focal_disease":
-            st.markdown("""
-            <div class="empty-state">
-                <h3>Welcome to Your Genetic Counseling Session</h3>
-                <p>To begin, please tell us:</p>
-                <p><strong>What brings you to genetic counseling today?</strong></p>
-                <p>Is there a specific health condition you're concerned about?</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            focal_input = st.text_input(
-                "e.g., 'concern about breast cancer', 'family history of heart disease'", 
-                key="focal_input",
-                placeholder="Enter your primary health concern here..."
-            )
-            
-            if st.button("Submit Reason", key="submit_reason", use_container_width=True):
-                if focal_input:
-                    standardized = standardize_focal_disease(focal_input)
-                    st.session_state.focal_disease = standardized
-                    st.session_state.mondo_code = "N/A"
-                    st.session_state.backend_state['focal_disease'] = standardized
-                    st.session_state.interview_stage = "self"
-                    st.session_state.chat_history.append({
-                        'role': 'user',
-                        'content': focal_input
-                    })
-                    st.session_state.chat_history.append({
-                        'role': 'assistant',
-                        'content': f"Thank you. We'll focus our discussion on: **{standardized}**."
-                    })
-                    st.rerun()
-                else:
-                    st.warning("Please provide a reason for the visit to continue.")
-        
-        # Interview stages
-        interview_stages = [
-            "self", "father", "mother", "siblings", 
-            "partner", "children", "paternal_grandfather", 
-            "paternal_grandmother", "maternal_grandfather", 
-            "maternal_grandmother"
-        ]
-        
-        # Start interview for current stage
-        if st.session_state.interview_stage in interview_stages:
-            if st.session_state.interview_stage == "siblings":
-                if not st.session_state.awaiting_confirmation:
-                    interview_multiple("sibling", st.session_state.patient_name)
-                    st.rerun()
-            elif st.session_state.interview_stage == "children":
-                if not st.session_state.awaiting_confirmation:
-                    interview_multiple("child", st.session_state.patient_name)
-                    st.rerun()
-            else:
-                if st.session_state.current_relation is None:
-                    start_interview(st.session_state.interview_stage, st.session_state.patient_name)
-                    st.rerun()
-        
-        # Chat container - FIXED: Improve chat display
-        st.markdown("### Conversation")
-        chat_container = st.container()
-        with chat_container:
-            st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-            
-            # Display chat history
-            for message in st.session_state.chat_history:
-                if message['role'] == 'user':
-                    st.markdown(f"""
-                    <div class="user-message">
-                        <strong>You:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
-                elif message['role'] == 'assistant':
-                    # Check for genetic reasoning in message
-                    content = message['content']
-                    if "🧬" in content or "genetic" in content.lower():
-                        st.markdown(f"""
-                        <div class="genetic-insight">
-                            <strong>ROOTS:</strong> {content}
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.markdown(f"""
-                        <div class="assistant-message">
-                            <strong>ROOTS:</strong> {content}
-                        </div>
-                        """, unsafe_allow_html=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Chat input - FIXED: Position at bottom
-        if st.session_state.interview_stage != "focal_disease" and st.session_state.interview_stage != "complete":
-            st.markdown('<div class="chat-input-container">', unsafe_allow_html=True)
-            user_input = st.chat_input("Type your message here...", key="chat_input")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            if user_input:
-                # Process message and get response
-                with st.spinner("🤔 Analyzing and responding..."):
-                    try:
-                        response = process_user_message(user_input)
-                        
-                        # Update patient name if self interview is complete
-                        if st.session_state.interview_stage == "self" and st.session_state.current_relation is None:
-                            self_person = next((p for p in st.session_state.people if p["relation"] == "self"), None)
-                            if self_person:
-                                st.session_state.patient_name = f"{self_person['first_name']} {self_person['last_name']}"
-                        
-                        # Move to next stage if appropriate
-                        if response and "Moving to next family member" in response:
-                            if st.session_state.interview_index < len(interview_stages):
-                                st.session_state.interview_stage = interview_stages[st.session_state.interview_index]
-                            else:
-                                st.session_state.interview_stage = "complete"
-                                st.session_state.backend_state['conversation_stage'] = 'complete'
-                        
-                    except Exception as e:
-                        st.error(f"Error processing message: {str(e)}")
-
-                st.rerun()
-        elif st.session_state.interview_stage == "complete":
-            st.info("✅ Pedigree collection completed. You can start a new session or download your report below.")
+        chat_fragment()
     
     with col2:
         st.markdown("""
@@ -1448,154 +1631,8 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
-        # Pedigree container - FIXED: Improve display
-        with st.container():
-            st.markdown('<div class="pedigree-container">', unsafe_allow_html=True)
-            
-            # Generate and display pedigree
-            people = st.session_state.backend_state.get('people', [])
-            focal_disease = st.session_state.backend_state.get('focal_disease')
-            
-            if len(people) > 0:
-                try:
-                    fig = draw_pedigree(people, focal_disease)
-                    
-                    # FIXED: Use proper method to display matplotlib figure
-                    st.pyplot(fig)
-                    plt.close(fig)  # Prevent memory leaks
-                except Exception as e:
-                    st.error(f"Error generating pedigree: {str(e)}")
-                    st.info("Displaying family data in table format instead")
-                    
-                    # Fallback to table display
-                    family_data = []
-                    for person in people:
-                        family_data.append({
-                            'Relation': person.get('relation', '').replace('_', ' ').title(),
-                            'Name': f"{person.get('first_name', '')} {person.get('last_name', '')}",
-                            'Sex': 'Male' if person.get('sex') == '1' else 'Female',
-                            'Age': compute_age_from_yyyymmdd(person.get('birthday')) or 'Unknown',
-                            'Status': 'Deceased' if person.get('is_dead') == 1 else 'Alive'
-                        })
-                    
-                    st.dataframe(pd.DataFrame(family_data), height=300)
-            else:
-                st.markdown("""
-                <div class="empty-state">
-                    <h4>👋 Pedigree Preview</h4>
-                    <p>Your family pedigree will appear here as you add family members</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Export options - FIXED: Improve button styling
-        if st.session_state.backend_state.get('people'):
-            st.subheader("📤 Export Options")
-            
-            # Download family data as CSV
-            # FIXED: Create proper CSV data
-            base_columns = ["id", "relation", "first_name", "last_name", "birthday", "sex", "is_dead", "dad_id", "mom_id", "partner_id"]
-            disease_cols = sorted(st.session_state.disease_column_names.values())
-            all_columns = base_columns + disease_cols
-            
-            csv_data = []
-            for person in st.session_state.people:
-                row = {col: person.get(col, 0) for col in base_columns}
-                
-                person_conditions = person.get("conditions", {})
-                for disease_label, col_name in st.session_state.disease_column_names.items():
-                    if isinstance(person_conditions, dict):
-                        row[col_name] = 1 if person_conditions.get(disease_label, False) else 0
-                    else:
-                        row[col_name] = 0
-                
-                csv_data.append(row)
-            
-            df = pd.DataFrame(csv_data)
-            csv = df.to_csv(index=False)
-            
-            st.download_button(
-                label="💾 Download Family Data (CSV)",
-                data=csv,
-                file_name=f"family_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                use_container_width=True,
-                key="download_csv"
-            )
-            
-            # Generate summary report
-            if st.button("📄 Generate Summary Report", use_container_width=True, key="generate_report"):
-                with st.spinner("Generating report... This may take a moment"):
-                    # Create summary header
-                    summary = []
-                    summary.append(f"# Family Health History Report")
-                    summary.append(f"**Generated:** {datetime.now().strftime('%B %d, %Y at %I:%M %p')}")
-                    
-                    # Add focal disease info
-                    if st.session_state.backend_state.get('focal_disease'):
-                        disease_info = st.session_state.backend_state['focal_disease']
-                        mondo_code = st.session_state.backend_state.get('mondo_code', 'N/A')
-                        if mondo_code and mondo_code != 'N/A':
-                            disease_info += f" (MONDO:{mondo_code})"
-                        summary.append(f"**Primary Concern:** {disease_info}")
-                    
-                    # Add family members section
-                    summary.append(f"\n## Family Members ({len(st.session_state.backend_state['people'])})")
-                    
-                    for person in st.session_state.backend_state['people']:
-                        relation = person.get('relation', '').replace('_', ' ').title()
-                        first_name = person.get('first_name', '')
-                        last_name = person.get('last_name', '')
-                        name = f"{first_name} {last_name}" if first_name or last_name else relation
-                        
-                        summary.append(f"\n### {relation}: {name}")
-                        
-                        # Calculate age
-                        birthday = person.get('birthday')
-                        age = None
-                        if birthday:
-                            try:
-                                birth_year = int(str(birthday)[:4])
-                                current_year = datetime.now().year
-                                age = current_year - birth_year
-                            except:
-                                pass
-                        
-                        summary.append(f"- **Age:** {age if age else 'Unknown'}")
-                        summary.append(f"- **Sex:** {'Male' if person.get('sex') == '1' else 'Female'}")
-                        summary.append(f"- **Status:** {'Deceased' if person.get('is_dead') else 'Living'}")
-                        
-                        conditions = person.get('conditions', {})
-                        if conditions and isinstance(conditions, dict):
-                            summary.append("- **Medical Conditions:**")
-                            for condition, has_condition in conditions.items():
-                                if has_condition:
-                                    summary.append(f"  - {condition}")
-                        else:
-                            summary.append("- **Medical Conditions:** None reported")
-                    
-                    # Add genetic insights
-                    summary.append("\n## Genetic Insights")
-                    summary.append("Based on the collected family history, here are potential genetic patterns:")
-                    
-                    # Add testing recommendations
-                    summary.append("\n## Genetic Testing Recommendations")
-                    summary.append("- Comprehensive genetic testing based on family history")
-                    summary.append("- Carrier screening for recessive conditions")
-                    summary.append("- Predictive testing for at-risk family members")
-                    summary.append("- Consultation with a certified genetic counselor")
-                    
-                    summary_text = "\n".join(summary)
-
-                    st.download_button(
-                        label="📋 Download Summary Report",
-                        data=summary_text,
-                        file_name=f"genetic_counseling_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                        mime="text/markdown",
-                        use_container_width=True,
-                        key="download_report"
-                    )
+        pedigree_fragment()
+        exports_fragment()
 
 # Handle action states
 def handle_actions():
@@ -1628,9 +1665,11 @@ def handle_actions():
                 
                 st.session_state.action_required = None
                 finalize_person(tool_args)
+                finalize_pending()
                 st.rerun()
             else:
                 st.session_state.action_required = None
+                finalize_pending()
                 st.rerun()
     
     elif st.session_state.action_required == 'select_mondo':
@@ -1650,6 +1689,7 @@ def handle_actions():
             if disease_label not in st.session_state.disease_columns:
                 st.session_state.disease_columns[disease_label] = mondo_code
                 st.session_state.disease_column_names[disease_label] = f"{disease_label} ({mondo_code})"
+                st.session_state.disease_xrefs[disease_label] = xrefs_for(mondo_code)
             
             tool_args = st.session_state.action_context.get("tool_args", {})
             if not isinstance(tool_args.get("conditions"), dict):
@@ -1658,6 +1698,7 @@ def handle_actions():
             
             st.session_state.action_required = None
             finalize_person(tool_args)
+            finalize_pending()
             st.rerun()
     
     elif st.session_state.action_required == 'validate_age':
@@ -1668,10 +1709,13 @@ def handle_actions():
             if confirm == "Yes":
                 st.session_state.action_required = None
                 finalize_person(context["tool_args"])
+                finalize_pending()
                 st.rerun()
             else:
                 st.session_state.action_required = None
+                st.session_state.tool_ledger.forget(context["tool_args"])
                 st.session_state.messages = []  # Reset conversation for this person
+                finalize_pending()
                 st.rerun()
 
 # Run the app
@@ -1,35 +1,132 @@
-# 🔧 Tool schema for patient and family info extraction
-def get_tools():
-    return [
-        {
-            "type": "function",
-            "function": {
-                "name": "store_patient_info",
-                "description": "Extract structured patient or family member data",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "relation": {"type": "string"},
-                        "first_name": {"type": "string"},
-                        "last_name": {"type": "string"},
-                        "birthday": {"type": "integer"},
-                        "sex": {"type": "string", "enum": ["1", "2"]},
-                        # remove height and weight here
-                        # "height_cm": {"type": "number"},
-                        # "weight_kg": {"type": "number"},
-                        "conditions": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "Medical conditions or known diagnoses"
-                        },
-                        "is_dead": {
-                            "type": "integer",
-                            "description": "Whether the person has died"
-                        }
-                    },
-                    # removed height and weight here
-                    "required": ["relation", "first_name", "last_name", "birthday", "sex", "is_dead"]
-                }
-            }
-        }
-    ]
+import json
+import re
+
+# Fields a person needs before they can be finalized
+REQUIRED_FIELDS = ["relation", "first_name", "last_name", "birthday", "sex", "is_dead"]
+
+# Interview order: relatives stored together are finalized in this order so that links resolve
+# (parents before siblings, partner before children, father / mother before grandparents)
+RELATION_ORDER = ["self", "father", "mother", "sibling", "partner", "child",
+                  "paternal_grandfather", "paternal_grandmother", "maternal_grandfather", "maternal_grandmother"]
+MULTIPLE_RELATIONS = ("sibling", "child")
+
+# Everyday words -> (relation base, implied sex)
+RELATION_SYNONYMS = {
+    "me": ("self", None), "myself": ("self", None), "patient": ("self", None),
+    "dad": ("father", "1"), "mom": ("mother", "2"), "mum": ("mother", "2"),
+    "brother": ("sibling", "1"), "sister": ("sibling", "2"), "siblings": ("sibling", None),
+    "son": ("child", "1"), "daughter": ("child", "2"), "children": ("child", None),
+    "husband": ("partner", "1"), "wife": ("partner", "2"), "spouse": ("partner", None),
+}
+
+# Relations that determine sex (matched as a prefix, so "brother_2" counts)
+RELATION_SEX = {
+    "father": "1", "mother": "2",
+    "paternal_grandfather": "1", "paternal_grandmother": "2",
+    "maternal_grandfather": "1", "maternal_grandmother": "2",
+    "brother": "1", "sister": "2", "son": "1", "daughter": "2",
+    "uncle": "1", "aunt": "2", "husband": "1", "wife": "2",
+}
+
+
+# Tool schemas live in backend/tool_schema.py (compiled per interview stage)
+
+
+# ================ TOOL CALL HANDLING ================
+def tool_call_people(tool_calls):
+    """Person argument dicts from every store_patient_info / store_relatives_info call of a reply, in order."""
+    people = []
+    for tool_call in tool_calls or []:
+        try:
+            args = json.loads(tool_call.function.arguments)
+        except (TypeError, ValueError):
+            continue
+        if tool_call.function.name == "store_relatives_info":
+            people.extend(p for p in args.get("relatives", []) if isinstance(p, dict))
+        elif isinstance(args, dict):
+            people.append(args)
+    return people
+
+
+def is_complete(args):
+    """True when every required field is present (an unknown condition list is fine)."""
+    return all(args.get(field) not in (None, "") for field in REQUIRED_FIELDS)
+
+
+def relation_base(relation):
+    """('sibling', 2) for 'sibling_2' / 'Sister 2'; (base, None) without a number."""
+    label = re.sub(r"[\s\-]+", "_", str(relation or "").strip().lower())
+    match = re.fullmatch(r"(.*?)_?(\d+)", label)
+    label, number = (match.group(1), int(match.group(2))) if match else (label, None)
+    return RELATION_SYNONYMS.get(label, (label, None))[0], number
+
+
+def next_index(base, relations):
+    """First free number for a multiple relation ('sibling' -> 3 when sibling_1 and sibling_2 exist)."""
+    index = 1
+    while f"{base}_{index}" in relations:
+        index += 1
+    return index
+
+
+def person_identity(args):
+    """(first name, last name, birthday) of a person, lower-cased; None when any is missing."""
+    first, last = str(args.get("first_name") or "").strip().lower(), str(args.get("last_name") or "").strip().lower()
+    birthday = str(args.get("birthday") or "").strip()
+    return (first, last, birthday) if first and last and birthday else None
+
+
+def assign_relations(people, known, current=None):
+    """
+    Give each person of a batch an app relation label ('sister' -> sibling_N, 'dad' -> father),
+    numbering siblings / children after the ones already in `known` (stored person dicts). People
+    already in `known` (same name and birthday), re-sent by the model, are dropped before numbering.
+    The relation currently being interviewed is used for the first unnumbered match. Sex implied by
+    the word is filled in when missing. Relations the interview does not cover are dropped; the rest
+    are returned in interview order (see RELATION_ORDER).
+    """
+    taken = {p["relation"] for p in known}
+    seen = {person_identity(p) for p in known} - {None}
+    labelled = []
+    for args in people:
+        if person_identity(args) in seen:
+            continue
+        raw = re.sub(r"[\s\-]+", "_", str(args.get("relation", "")).strip().lower())
+        base, number = relation_base(raw)
+        implied_sex = RELATION_SYNONYMS.get(re.sub(r"_?\d+$", "", raw), (None, None))[1]
+        if base not in RELATION_ORDER:
+            continue
+        if base in MULTIPLE_RELATIONS:
+            if number is None or f"{base}_{number}" in taken:
+                if current and current.startswith(base + "_") and current not in taken:
+                    label = current
+                else:
+                    label = f"{base}_{next_index(base, taken)}"
+            else:
+                label = f"{base}_{number}"
+        else:
+            label = base
+        taken.add(label)
+        if person_identity(args):
+            seen.add(person_identity(args))
+        args = dict(args, relation=label)
+        if implied_sex and args.get("sex") not in ("1", "2"):
+            args["sex"] = implied_sex
+        labelled.append(args)
+    return sorted(labelled, key=lambda args: RELATION_ORDER.index(relation_base(args["relation"])[0]))
+
+
+def next_relation(relation, relations):
+    """
+    The relation most likely interviewed after `relation`: the next stage of RELATION_ORDER not yet
+    in `relations`. None after the last, and when the next stage is siblings / children: whether
+    there is one is asked first (yes / no), so it cannot be predicted.
+    """
+    base = relation_base(relation)[0]
+    start = RELATION_ORDER.index(base) + 1 if base in RELATION_ORDER else 0
+    for stage in RELATION_ORDER[start:]:
+        if stage in MULTIPLE_RELATIONS:
+            return None
+        if stage not in relations:
+            return stage
+    return None
@@ -224,11 +224,17 @@ def finalize_person(tool_args, relation_label):
                 p["partner_id"] = tool_args["id"]
                 tool_args["partner_id"] = p["id"]
 
+    # 🧪 Step 10.1: Whole-family consistency problems involving this person
+    from backend.pedigree_checks import check_pedigree, issues_for
+    for issue in issues_for(check_pedigree(data_store.people), tool_args["id"]):
+        print(f"⚠️ {issue['message']}")
+
     # ✅ Step 11: Show extracted info and save to CSV
     print("\n✅ Extracted info:")
     for key, value in tool_args.items():
         print(f"  {key}: {value}")
     data_store.save_all_to_csv()
+    data_store.save_pedigree_svg()
     print("📌 Data saved.")
 
 